@@ -0,0 +1,299 @@
+"""
+ANSWER TABLE
+
+Precomputed recommendation rankings for the finite emotion-state space.
+
+parse_emotion only produces 7 emotions x intensity count/3 (0, 1/3, 2/3, 1),
+desired-state queries always target DESIRED_INTENSITY, and neutral queries
+have no parameters, so every unfiltered ranking the chatbot can ask for is
+known after the KB is built. This build step (run after generate_kb /
+enrich_movie_data) stores each full ranking once, in a compact JSON file
+beside the TTL (movie-emotions.answers.json), tagged with the KB version.
+
+RecommendationEngine serves those rankings without touching the graph;
+exclusion and paging are applied while reading them, so results are the
+same as the live queries. Anything else (facets, similar-to, other
+intensities, a stale table) falls back to live SPARQL.
+
+The same step writes a small warm-start table (movie-emotions.warm.json):
+only the first WARM_TOP_K movies of each ranking, for ProgressiveEngine to
+serve from right after launch; its size does not grow with the catalog.
+
+Usage:
+    python answer_table.py [path/to/movie-emotions.ttl]
+"""
+
+import json
+import os
+import sys
+from typing import Dict, Iterator, List, Optional
+
+
+ANSWERS_FORMAT_VERSION = 1
+
+# Intensities parse_emotion can produce (min(1, count / 3))
+ANSWER_INTENSITIES = [0.0, 1 / 3, 2 / 3, 1.0]
+
+NEUTRAL_KEY = "neutral"
+
+WARM_FORMAT_VERSION = 1
+
+# Movies kept per ranking in the warm-start table
+WARM_TOP_K = 100
+
+
+def answers_path(ttl_path: str) -> str:
+    """movie-emotions.ttl -> movie-emotions.answers.json"""
+    root, _ = os.path.splitext(ttl_path)
+    return f"{root}.answers.json"
+
+
+def warm_path(ttl_path: str) -> str:
+    """movie-emotions.ttl -> movie-emotions.warm.json"""
+    root, _ = os.path.splitext(ttl_path)
+    return f"{root}.warm.json"
+
+
+def answer_key(emotion: Optional[str] = None, target: Optional[float] = None) -> str:
+    """Key of an emotion ranking scored against a target intensity (no emotion = neutral)."""
+    if emotion is None:
+        return NEUTRAL_KEY
+    return f"{emotion}:{float(target)!r}"
+
+
+class AnswerTable:
+    """
+    Full rankings per (emotion, target intensity), plus the neutral ranking.
+
+    Movies are stored once ([movie_id, title, director, cast]); a ranking is a
+    list of [movie position, intensity, confidence] rows (neutral:
+    [movie position, confidence]) in rank order, one row per movie.
+    """
+
+    def __init__(self, kb_version: str, targets: List[float], movies: List[List], answers: Dict[str, List[List]]):
+        self.kb_version = kb_version
+        self.targets = targets
+        self.movies = movies
+        self.answers = answers
+
+    def ranking(self, emotion: Optional[str] = None, target: Optional[float] = None) -> Optional[Iterator[Dict]]:
+        """
+        Lazily rebuilt movie dicts of a ranking, best first (None if not covered).
+
+        Emotion rankings carry the same fields as SPARQLRecommender.get_movies_by_emotion
+        (without 'score'); neutral ones those of get_top_movies_overall.
+        """
+        rows = self.answers.get(answer_key(emotion, target))
+        if rows is None:
+            return None
+        if emotion is None:
+            return self._iter_neutral(rows)
+        return self._iter_emotion(rows, emotion)
+
+    def _iter_emotion(self, rows: List[List], emotion: str) -> Iterator[Dict]:
+        for position, intensity, confidence in rows:
+            movie_id, title, director, cast = self.movies[position]
+            yield {
+                'movie_id': movie_id,
+                'title': title,
+                'director': director,
+                'cast': list(cast),
+                'emotion': emotion,
+                'intensity': intensity,
+                'confidence': confidence
+            }
+
+    def _iter_neutral(self, rows: List[List]) -> Iterator[Dict]:
+        for position, confidence in rows:
+            yield {
+                'movie_id': self.movies[position][0],
+                'title': self.movies[position][1],
+                'confidence': confidence
+            }
+
+    @classmethod
+    def build(cls, engine, targets: Optional[List[float]] = None) -> 'AnswerTable':
+        """Compute every covered ranking live from an engine's graph."""
+        from recommendation_engine import DESIRED_INTENSITY
+
+        if targets is None:
+            targets = sorted(set(ANSWER_INTENSITIES + [DESIRED_INTENSITY]))
+
+        movies = []
+        positions = {}
+
+        def position(movie: Dict) -> int:
+            if movie['movie_id'] not in positions:
+                positions[movie['movie_id']] = len(movies)
+                movies.append([
+                    movie['movie_id'],
+                    movie['title'],
+                    movie.get('director', 'Unknown'),
+                    movie.get('cast', [])
+                ])
+            return positions[movie['movie_id']]
+
+        answers = {}
+        for emotion in engine.emotion_list:
+            for target in targets:
+                answers[answer_key(emotion, target)] = [
+                    [position(movie), movie['intensity'], movie['confidence']]
+                    for movie in engine._iter_by_emotion(emotion, target, None)
+                ]
+
+        answers[NEUTRAL_KEY] = [
+            [position(movie), movie['confidence']]
+            for movie in engine.recommender.get_top_movies_overall(limit=None)
+        ]
+
+        return cls(engine.recommender.kb_version, targets, movies, answers)
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "format": ANSWERS_FORMAT_VERSION,
+                "kb_version": self.kb_version,
+                "targets": self.targets,
+                "movies": self.movies,
+                "answers": self.answers
+            }, f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str, kb_version: Optional[str] = None) -> Optional['AnswerTable']:
+        """Read a saved table; None if missing, of another format, or built for another KB version."""
+        if not os.path.exists(path):
+            return None
+
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+
+        if saved.get("format") != ANSWERS_FORMAT_VERSION:
+            return None
+        if kb_version is not None and saved.get("kb_version") != kb_version:
+            print(f"♻️  Ignoring stale precomputed answers in {path} (rebuild with answer_table.py)")
+            return None
+
+        return cls(saved["kb_version"], saved["targets"], saved["movies"], saved["answers"])
+
+
+class WarmTable(AnswerTable):
+    """
+    Head (first top_k movies) of every ranking of an AnswerTable, for warm starts.
+
+    Besides the rankings it records what a server needs before the graph is
+    loaded: each stored movie's internal id (keys, SPARQLRecommender.movie_ids
+    order) and the catalog size, so exclusion sets stay valid once it is;
+    the full length of each ranking (sizes), to know when a page runs past
+    the head; and the KB file size, a cheap staleness check before the
+    recorded kb_version can be verified.
+    """
+
+    def __init__(
+        self,
+        kb_version: str,
+        targets: List[float],
+        movies: List[List],
+        answers: Dict[str, List[List]],
+        keys: List[int],
+        sizes: Dict[str, int],
+        catalog_size: int,
+        kb_size: int
+    ):
+        super().__init__(kb_version, targets, movies, answers)
+        self.keys = keys
+        self.sizes = sizes
+        self.catalog_size = catalog_size
+        self.kb_size = kb_size
+
+    def truncated(self, emotion: Optional[str] = None, target: Optional[float] = None) -> bool:
+        """Whether the full ranking goes on past the stored head."""
+        key = answer_key(emotion, target)
+        return self.sizes.get(key, 0) > len(self.answers.get(key, ()))
+
+    @classmethod
+    def from_table(cls, table: AnswerTable, catalog: List[str], kb_size: int, top_k: int = WARM_TOP_K) -> 'WarmTable':
+        catalog_index = {movie_id: i for i, movie_id in enumerate(catalog)}
+        movies, keys = [], []
+        positions = {}
+
+        def position(old: int) -> int:
+            if old not in positions:
+                positions[old] = len(movies)
+                movies.append(table.movies[old])
+                keys.append(catalog_index.get(table.movies[old][0]))
+            return positions[old]
+
+        answers = {
+            key: [[position(row[0])] + row[1:] for row in rows[:top_k]]
+            for key, rows in table.answers.items()
+        }
+        sizes = {key: len(rows) for key, rows in table.answers.items()}
+        return cls(table.kb_version, table.targets, movies, answers, keys, sizes, len(catalog), kb_size)
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "format": WARM_FORMAT_VERSION,
+                "kb_version": self.kb_version,
+                "kb_size": self.kb_size,
+                "catalog_size": self.catalog_size,
+                "targets": self.targets,
+                "movies": self.movies,
+                "keys": self.keys,
+                "answers": self.answers,
+                "sizes": self.sizes
+            }, f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str, kb_version: Optional[str] = None) -> Optional['WarmTable']:
+        """
+        Read a saved warm table; None if missing or of another format.
+
+        Without kb_version the recorded version is trusted (checked later, see
+        ProgressiveEngine), so no KB file is read here.
+        """
+        if not os.path.exists(path):
+            return None
+
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+
+        if saved.get("format") != WARM_FORMAT_VERSION:
+            return None
+        if kb_version is not None and saved.get("kb_version") != kb_version:
+            return None
+
+        return cls(
+            saved["kb_version"], saved["targets"], saved["movies"], saved["answers"],
+            saved["keys"], saved["sizes"], saved["catalog_size"], saved["kb_size"]
+        )
+
+
+def precompute_answers(ttl_path: str, output_path: Optional[str] = None) -> AnswerTable:
+    """Build and write the answer table of a KB (after its derived graph is written), and its warm-start table."""
+    from recommendation_engine import RecommendationEngine
+
+    engine = RecommendationEngine(ttl_path)
+    engine.answers = None
+
+    table = AnswerTable.build(engine)
+    output_path = output_path or answers_path(ttl_path)
+    table.save(output_path)
+
+    rows = sum(len(ranking) for ranking in table.answers.values())
+    print(f"[OK] Precomputed {len(table.answers)} rankings ({rows} rows) to {output_path}")
+
+    warm = WarmTable.from_table(table, engine.recommender.movie_ids, os.path.getsize(ttl_path))
+    warm.save(warm_path(ttl_path))
+    print(f"[OK] Wrote the warm-start table (top {WARM_TOP_K} per ranking) to {warm_path(ttl_path)}")
+    return table
+
+
+# ===== ENTRY POINT =====
+if __name__ == "__main__":
+    ttl_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "movie-emotions.ttl")
+
+    if os.path.exists(ttl_path):
+        precompute_answers(ttl_path)
+    else:
+        print(f"❌ TTL file not found at {ttl_path}")
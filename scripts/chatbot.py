@@ -5,40 +5,179 @@ Main chatbot class that orchestrates the entire recommendation pipeline.
 Handles conversation flow and user interactions.
 """
 
-from emotion_state_parser import parse_emotion, get_emotion_message
-from recommendation_engine import RecommendationEngine
-from typing import Dict, Optional
+from emotion_state_parser import (
+    parse_emotion, get_emotion_message, is_more_request, extract_facets, extract_title_reference
+)
+from recommendation_engine import RecommendationEngine, DESIRED_INTENSITY
+from progressive_engine import ProgressiveEngine
+from request_budget import (
+    Deadline, ServingPolicy, policy_for, SERVED_CACHE, SERVED_TOP_LIST, SERVED_SHED
+)
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
 import os
 
 
+# Recommendations computed per turn, and how many of them the response shows
+NUM_RECOMMENDATIONS = 10
+NUM_DISPLAYED = 5
+
+MORE_MESSAGE = "Here are more movies along the same lines..."
+
+# Shown instead of the usual footer when a turn is shed with nothing cheap to serve
+BUSY_MESSAGE = " I'm handling a lot of requests right now. Please try again in a moment."
+
+# Prepended to the footer when the emotion's top list stood in for a narrower query
+TOP_LIST_NOTE = "(Quick picks for this mood; ask again in a moment for a closer match.)\n\n"
+
+# Turns kept per conversation (only the latest is ever read back)
+MAX_HISTORY = 50
+
+
 class EmotionChatbot:
     """Interactive chatbot for emotion-based movie recommendations."""
     
-    def __init__(self, ttl_path: str):
-        """Initialize chatbot with knowledge base."""
-        self.engine = RecommendationEngine(ttl_path)
-        self.conversation_history = []
+    def __init__(
+        self,
+        ttl_path: str,
+        engine: Optional[RecommendationEngine] = None,
+        progressive: bool = False,
+        policy: Optional[ServingPolicy] = None
+    ):
+        """
+        Initialize chatbot with knowledge base.
+        
+        Pass an existing engine to run many conversations over one loaded KB
+        (each chatbot keeps its own conversation state). progressive starts
+        answering from the precomputed rankings while the KB loads
+        (see ProgressiveEngine). policy sets the per-turn budget, admission
+        limit and fallback cache (see request_budget.py); by default every
+        chatbot of an engine shares that engine's policy.
+        """
+        if engine is None:
+            engine = ProgressiveEngine(ttl_path) if progressive else RecommendationEngine(ttl_path)
+        self.engine = engine
+        self.policy = policy if policy is not None else policy_for(engine)
+        self._people = self.engine.people_lookup()
+        # A progressive engine only knows its warm movies' people until loaded
+        self._people_complete = self.engine.ready
+        self.conversation_history = deque(maxlen=MAX_HISTORY)
         self.user_context = {
             'last_emotion': None,
             'watched_movies': set(),
+            'excluded': self.engine.new_exclusion_set(),
+            'cursor': None,
             'preferences': {}
         }
     
-    def handle_user_input(self, user_message: str) -> Dict:
+    def mark_watched(self, movie_id: str):
+        """Record a watched movie so it is never recommended again this session."""
+        self.user_context['watched_movies'].add(movie_id)
+        self._exclude(movie_id)
+    
+    def _exclude(self, movie_id: str):
+        key = self.engine.movie_key(movie_id)
+        if key is not None:
+            self.user_context['excluded'].add(key)
+    
+    def handle_user_input(self, user_message: str, budget: Optional[float] = None) -> Dict:
         """
         Process user input and generate recommendations.
         
+        budget: seconds for this turn (default: the policy's budget)
+        
         Returns:
         {
             'response': str (conversational response),
             'recommendations': List[Dict] (movie recommendations),
             'reasoning': str (explanation),
-            'emotion_state': Dict (parsed emotion)
+            'emotion_state': Dict (parsed emotion),
+            'tier': str (engine tier when the turn ended, "precomputed" or "full"),
+            'served_by': str (path that served the turn, see request_budget.py),
+            'degraded': str or None ("deadline" or "overload" when a fallback served it),
+            'stages': Dict (seconds per stage)
+        }
+        """
+        
+        events = list(self.stream_user_input(user_message, budget))
+        footer = events[-1]
+        
+        return {
+            'response': "".join(event['text'] for event in events),
+            'recommendations': [event['movie'] for event in events if event['event'] == 'recommendation'],
+            'reasoning': footer['reasoning'],
+            'emotion_state': events[0]['emotion_state'],
+            'acknowledgment': events[0]['text'],
+            'tier': footer['tier'],
+            'served_by': footer['served_by'],
+            'degraded': footer['degraded'],
+            'stages': footer['stages']
         }
+    
+    def stream_user_input(self, user_message: str, budget: Optional[float] = None) -> Iterator[Dict]:
         """
+        Process user input incrementally, for progressive rendering (SSE, chunked JSON).
+        
+        Yields, in order:
+            {'event': 'acknowledgment', 'text', 'emotion_state'}  - before any graph work
+            {'event': 'title', 'text'}                            - "something like <title>" resolved
+            {'event': 'recommendation', 'rank', 'movie', 'text'}  - as each rank is final
+            {'event': 'footer', 'text', 'reasoning', 'total', 'tier', 'served_by', 'degraded', 'stages'}
         
-        # Parse emotion from input
-        emotion_state = parse_emotion(user_message)
+        Concatenating every event's 'text' gives the handle_user_input response.
+        
+        With a budget (seconds; default the policy's, none unless set) the
+        turn runs against a deadline: if the engine is not expected to
+        answer in the remaining time, a cached page or the emotion's
+        precomputed top list is served instead, and a page the engine is
+        producing stops early once the deadline passes ("more" continues it).
+        Turns shed because too many are in flight get the same fallbacks.
+        """
+        
+        policy = self.policy
+        deadline = Deadline(policy.budget if budget is None else budget)
+        admitted = policy.admission.try_enter()
+        try:
+            yield from self._serve(user_message, deadline, admitted)
+        finally:
+            if admitted:
+                policy.admission.leave()
+    
+    def _serve(self, user_message: str, deadline: Deadline, admitted: bool) -> Iterator[Dict]:
+        """stream_user_input for an admitted (or shed) turn."""
+        
+        excluded = self.user_context['excluded']
+        cursor = self.user_context['cursor']
+        
+        if not self._people_complete and self.engine.ready:
+            self._people = self.engine.people_lookup()
+            self._people_complete = True
+        
+        # A follow-up naming a director / actor / year or a title is a new
+        # query ("more Hitchcock please"), not a page of the previous one
+        facets = extract_facets(user_message, self._people)
+        reference = extract_title_reference(user_message)
+        more = (
+            cursor is not None and is_more_request(user_message)
+            and reference is None and not any(value is not None for value in facets.values())
+        )
+        
+        if more:
+            # "More": continue the previous ranking instead of re-querying,
+            # unless the KB changed since, in which case re-run that query
+            if not cursor.is_current():
+                cursor = self.engine.open_cursor(cursor.emotion_state, excluded)
+            emotion_state = cursor.emotion_state
+            acknowledgment = MORE_MESSAGE
+        else:
+            # Parse emotion (and director/actor/year facets) from input
+            emotion_state = parse_emotion(user_message)
+            emotion_state['facets'] = facets
+            if reference is None:
+                acknowledgment = get_emotion_message(emotion_state)
+            else:
+                acknowledgment = f"Let me look up \"{reference}\"..."
         
         # Store in history
         self.conversation_history.append({
@@ -47,114 +186,248 @@ class EmotionChatbot:
         })
         
         # Acknowledge user's emotion
-        acknowledgment = get_emotion_message(emotion_state)
+        yield {'event': 'acknowledgment', 'text': acknowledgment, 'emotion_state': emotion_state}
+        deadline.mark('parsing')
         
-        # Generate recommendations based on query type
-        recommendations = self._get_recommendations(emotion_state)
+        # The fuzzy title lookup runs after the first event is out
+        if reference is not None:
+            yield {'event': 'title', 'text': " " + self._resolve_title_reference(reference, emotion_state)}
         
-        # Format response
-        response = self._format_response(acknowledgment, recommendations, emotion_state)
+        if not more:
+            cursor = self.engine.open_cursor(emotion_state, excluded)
+        self.user_context['cursor'] = cursor
         
-        return {
-            'response': response,
-            'recommendations': recommendations,
-            'emotion_state': emotion_state,
-            'acknowledgment': acknowledgment
+        # Pick the path before any graph work: the engine if it should answer in time
+        estimates = self.policy.estimates
+        route = 'more' if more else 'precomputed' if self._top_list(emotion_state, exact=True) is not None else 'live'
+        degraded = None
+        if not admitted:
+            degraded = 'overload'
+        elif not estimates.fits(route, deadline, estimates.estimate('formatting')):
+            estimates.skip(route)
+            degraded = 'deadline'
+        elif not self.engine.ready and route != 'precomputed':
+            # The precomputed tier cannot answer this; wait for the full one while it fits
+            if not self.engine.wait_ready(max(0.0, deadline.remaining() - estimates.estimate(route))):
+                degraded = 'deadline'
+        
+        if degraded is None:
+            ranked = cursor.next_page(NUM_RECOMMENDATIONS)
+        else:
+            fallback, served_by = self._fallback_page(emotion_state, excluded)
+            ranked = iter(fallback)
+        
+        # Generate recommendations based on query type, one rank at a time;
+        # watched and already-shown movies are skipped inside the top-k selection
+        page = []
+        for rank, movie in enumerate(ranked, 1):
+            page.append(movie)
+            if rank == 1:
+                deadline.mark('retrieval')
+            text = ""
+            if rank == 1:
+                text += "\n\nHere are my recommendations:\n\n"
+            if rank <= NUM_DISPLAYED:
+                text += self._format_movie(rank, movie)
+            yield {'event': 'recommendation', 'rank': rank, 'movie': movie, 'text': text}
+            # Out of time: the rest of the engine's page stays in the cursor for "more"
+            if degraded is None and deadline.expired():
+                break
+        deadline.mark('retrieval' if not page else 'scoring')
+        
+        # Read after the page: queries the precomputed tier cannot answer wait for the full one
+        tier = self.engine.tier
+        
+        total = len(page)
+        shown = [movie['movie_id'] for movie in page[:NUM_DISPLAYED]]
+        if degraded is None:
+            served_by = tier
+            estimates.observe(route, deadline.stages.get('retrieval', 0.0) + deadline.stages.get('scoring', 0.0))
+            if not more:
+                self.policy.cache.put(self._cache_key(emotion_state), page)
+            # Undisplayed movies stay at the front of the cursor for the next "more"
+            cursor.unread(page[NUM_DISPLAYED:])
+        
+        # Shown titles are not repeated in later turns
+        for movie_id in shown:
+            self._exclude(movie_id)
+        
+        if served_by == SERVED_SHED:
+            footer = BUSY_MESSAGE
+        elif served_by == SERVED_TOP_LIST and route == 'live':
+            footer = TOP_LIST_NOTE + self._format_footer(total)
+        else:
+            footer = self._format_footer(total)
+        estimates.observe('formatting', deadline.mark('formatting'))
+        
+        yield {
+            'event': 'footer',
+            'text': footer,
+            'reasoning': self._get_reasoning(emotion_state),
+            'total': total,
+            'tier': tier,
+            'served_by': served_by,
+            'degraded': degraded,
+            'stages': dict(deadline.stages)
         }
     
-    def _get_recommendations(self, emotion_state: Dict) -> list:
-        """Get movie recommendations based on parsed emotion state."""
+    def _fallback_page(self, emotion_state: Dict, excluded) -> Tuple[List[Dict], str]:
+        """Cheapest available page for a turn the engine cannot serve in time: (movies, served_by)."""
+        
+        cached = self.policy.cache.get(self._cache_key(emotion_state))
+        if cached is not None:
+            movies = [dict(movie) for movie in cached if not self._is_excluded_id(movie['movie_id'], excluded)]
+            if movies:
+                return movies, SERVED_CACHE
+        
+        ranked = self._top_list(emotion_state)
+        if ranked is not None:
+            unexcluded = (movie for movie in ranked if not self._is_excluded_id(movie['movie_id'], excluded))
+            return list(islice(unexcluded, NUM_RECOMMENDATIONS)), SERVED_TOP_LIST
+        
+        return [], SERVED_SHED
+    
+    def _top_list(self, emotion_state: Dict, exact: bool = False) -> Optional[Iterator[Dict]]:
+        """
+        Precomputed ranking (answer table) of a turn's emotion, scored like the
+        engine's, or None without a current table.
+        
+        exact: only if it is the turn's true ranking (no facets, not "similar",
+        target intensity covered); otherwise facets / similar-to are ignored
+        and the nearest covered target is used.
+        """
+        answers = getattr(self.engine, 'answers', None)
+        if answers is None or answers.kb_version != self.engine.kb_version:
+            return None
+        
+        facets = emotion_state.get('facets') or {}
+        narrowed = any(value is not None for value in facets.values()) or (
+            emotion_state['query_type'] == 'similar' and emotion_state.get('similar_to')
+        )
+        if exact and narrowed:
+            return None
         
         query_type = emotion_state['query_type']
         emotion = emotion_state['emotion']
-        intensity = emotion_state['intensity']
+        if query_type not in ('current_state', 'desired_state') or emotion not in self.engine.emotion_list:
+            return answers.ranking()
         
-        if query_type == 'neutral':
-            # Random recommendation
-            recommendations = self.engine.recommend_neutral(num_results=10)
-            reasoning = "These are highly-rated movies you might enjoy."
+        target = emotion_state['intensity'] if query_type == 'current_state' else DESIRED_INTENSITY
+        if target not in answers.targets:
+            if exact:
+                return None
+            target = min(answers.targets, key=lambda covered: abs(covered - target))
+        ranked = answers.ranking(emotion, target)
+        return None if ranked is None else self._scored(ranked, target)
+    
+    @staticmethod
+    def _scored(ranked: Iterator[Dict], target: float) -> Iterator[Dict]:
+        for movie in ranked:
+            RecommendationEngine._score_movie(movie, target)
+            yield movie
+    
+    def _cache_key(self, emotion_state: Dict) -> tuple:
+        """Page cache key of a turn's query (same KB version and parsed state)."""
+        facets = emotion_state.get('facets') or {}
+        similar_to = emotion_state.get('similar_to') or {}
+        return (
+            self.engine.kb_version,
+            emotion_state['query_type'],
+            emotion_state['emotion'],
+            emotion_state['intensity'],
+            tuple(sorted((name, value) for name, value in facets.items() if value is not None)),
+            similar_to.get('movie_id')
+        )
+    
+    def _is_excluded_id(self, movie_id: str, excluded) -> bool:
+        key = self.engine.movie_key(movie_id)
+        return key is not None and key in excluded
+    
+    def _resolve_title_reference(self, reference: str, emotion_state: Dict) -> str:
+        """Turn "something like <title>" into a similar-movies query; returns the reply to it."""
+        matches = self.engine.resolve_title(reference, limit=1)
+        if not matches:
+            return f"I couldn't find \"{reference}\" in my catalog. " + get_emotion_message(emotion_state)
+        
+        emotion_state['query_type'] = 'similar'
+        emotion_state['similar_to'] = {'movie_id': matches[0]['movie_id'], 'title': matches[0]['title']}
+        return get_emotion_message(emotion_state)
+    
+    def explain_recommendation(self, movie_id: str) -> Dict:
+        """
+        Explain a recommendation from the latest turn (e.g. when a card is expanded).
+        
+        Delegates to RecommendationEngine.explain, which is lazy and memoized.
+        """
+        emotion_state = self.conversation_history[-1]['emotion_state'] if self.conversation_history else parse_emotion("")
+        return self.engine.explain(movie_id, emotion_state)
+    
+    def _get_reasoning(self, emotion_state: Dict) -> str:
+        """Short explanation of which strategy served a parsed emotion state."""
         
+        query_type = emotion_state['query_type']
+        emotion = emotion_state['emotion']
+        
+        if query_type == 'neutral':
+            return "These are highly-rated movies you might enjoy."
+        elif query_type == 'similar':
+            return f"Because you liked {emotion_state['similar_to']['title']}: these share its emotional feel, director or cast."
         elif query_type == 'current_state':
-            # Match current emotion
             if emotion:
-                recommendations = self.engine.recommend_current_state(
-                    emotion, 
-                    user_intensity=intensity,
-                    num_results=10
-                )
-                reasoning = f"These movies capture {emotion} like you're feeling."
-            else:
-                recommendations = self.engine.recommend_neutral(num_results=10)
-                reasoning = "Here are some recommended movies for you."
-        
+                return f"These movies capture {emotion} like you're feeling."
+            return "Here are some recommended movies for you."
         elif query_type == 'desired_state':
-            # Match desired emotion
             if emotion:
-                recommendations = self.engine.recommend_desired_state(
-                    emotion,
-                    num_results=10
-                )
-                reasoning = f"These movies should make you feel {emotion}."
-            else:
-                recommendations = self.engine.recommend_neutral(num_results=10)
-                reasoning = "Here are some uplifting movies."
+                return f"These movies should make you feel {emotion}."
+            return "Here are some uplifting movies."
         
-        else:
-            # Fallback
-            recommendations = self.engine.recommend_neutral(num_results=10)
-            reasoning = "Here are some movies I think you'd enjoy."
-        
-        return recommendations
-    
-    def _format_response(
-        self, 
-        acknowledgment: str, 
-        recommendations: list,
-        emotion_state: Dict
-    ) -> str:
-        """Format chatbot response with recommendations."""
-        
-        if not recommendations:
-            return acknowledgment + " Sorry, I couldn't find any matching movies."
-        
-        response = acknowledgment + "\n\n"
-        response += "Here are my recommendations:\n\n"
-        
-        for i, movie in enumerate(recommendations[:5], 1):  # Show top 5
-            title = movie['title']
-            movie_id = movie.get('movie_id', '?')
-            director = movie.get('director', 'Unknown')
-            cast = movie.get('cast', [])
-            
-            # Add emotion info
-            details = []
-            if 'emotion' in movie:
-                details.append(f"emotion: {movie['emotion'].upper()}")
-            if 'intensity' in movie:
-                intensity = movie['intensity']
-                intensity_label = "strong" if intensity > 0.7 else "moderate" if intensity > 0.4 else "subtle"
-                details.append(f"intensity: {intensity_label} ({intensity:.2f})")
-            if 'confidence' in movie:
-                details.append(f"confidence: {movie['confidence']:.2%}")
-            
-            detail_str = f" [{', '.join(details)}]" if details else ""
-            imdb_link = f"(IMDb: tt{movie_id})"
-            
-            # Format cast list
-            cast_str = ", ".join(cast) if cast else "N/A"
-            
-            response += f"{i}. **{title}** {imdb_link}\n"
-            response += f"   Director: {director}\n"
-            response += f"   Cast: {cast_str}\n"
-            response += f"   {detail_str}\n\n"
-        
-        if len(recommendations) > 5:
-            response += f"... and {len(recommendations) - 5} more recommendations available\n\n"
-        
-        response += "💡 Tip: You can search for these movies using the IMDb IDs (e.g., search 'tt0042674' on IMDb)\n\n"
-        response += "Would you like more details or different recommendations?"
-        
-        return response
+        # Fallback
+        return "Here are some movies I think you'd enjoy."
+    
+    def _format_movie(self, rank: int, movie: Dict) -> str:
+        """Format one ranked movie of the response."""
+        
+        title = movie['title']
+        movie_id = movie.get('movie_id', '?')
+        director = movie.get('director', 'Unknown')
+        cast = movie.get('cast', [])
+        
+        # Add emotion info
+        details = []
+        if 'emotion' in movie:
+            details.append(f"emotion: {movie['emotion'].upper()}")
+        if 'intensity' in movie:
+            intensity = movie['intensity']
+            intensity_label = "strong" if intensity > 0.7 else "moderate" if intensity > 0.4 else "subtle"
+            details.append(f"intensity: {intensity_label} ({intensity:.2f})")
+        if 'confidence' in movie:
+            details.append(f"confidence: {movie['confidence']:.2%}")
+        
+        detail_str = f" [{', '.join(details)}]" if details else ""
+        imdb_link = f"(IMDb: tt{movie_id})"
+        
+        # Format cast list
+        cast_str = ", ".join(cast) if cast else "N/A"
+        
+        text = f"{rank}. **{title}** {imdb_link}\n"
+        text += f"   Director: {director}\n"
+        text += f"   Cast: {cast_str}\n"
+        text += f"   {detail_str}\n\n"
+        return text
+    
+    def _format_footer(self, total: int) -> str:
+        """Format the closing part of the response given the number of recommendations."""
+        
+        if not total:
+            return " Sorry, I couldn't find any matching movies."
+        
+        footer = ""
+        if total > NUM_DISPLAYED:
+            footer += f"... and {total - NUM_DISPLAYED} more recommendations available\n\n"
+        
+        footer += "💡 Tip: You can search for these movies using the IMDb IDs (e.g., search 'tt0042674' on IMDb)\n\n"
+        footer += "Would you like more details or different recommendations?"
+        return footer
     
     def ask_follow_up(self) -> str:
         """Generate a follow-up question to continue conversation."""
@@ -183,10 +456,12 @@ class EmotionChatbot:
     
     def reset_conversation(self):
         """Reset conversation history."""
-        self.conversation_history = []
+        self.conversation_history = deque(maxlen=MAX_HISTORY)
         self.user_context = {
             'last_emotion': None,
             'watched_movies': set(),
+            'excluded': self.engine.new_exclusion_set(),
+            'cursor': None,
             'preferences': {}
         }
 
@@ -195,7 +470,7 @@ class EmotionChatbot:
 def run_chatbot_interactive(ttl_path: str):
     """Run interactive chatbot session."""
     
-    chatbot = EmotionChatbot(ttl_path)
+    chatbot = EmotionChatbot(ttl_path, progressive=True)
     
     print("=" * 60)
     print("🎬 EMOTION-BASED MOVIE RECOMMENDATION CHATBOT 🎬")
@@ -219,11 +494,11 @@ def run_chatbot_interactive(ttl_path: str):
             print("\nConversation reset. Start fresh!\n")
             continue
         
-        # Get recommendation
-        result = chatbot.handle_user_input(user_input)
-        
-        # Display response
-        print(f"\nChatbot: {result['response']}\n")
+        # Stream the response as it is produced
+        print("\nChatbot: ", end="", flush=True)
+        for event in chatbot.stream_user_input(user_input):
+            print(event['text'], end="", flush=True)
+        print("\n")
 
 
 # ===== TEST =====
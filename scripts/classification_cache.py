@@ -0,0 +1,148 @@
+"""
+CLASSIFICATION CACHE
+
+On-disk (SQLite) cache of classify_emotion results, keyed by
+(sha256 of the review text, classifier version).
+
+- Lookups and inserts are batched (one query per chunk, one transaction per write)
+- The classifier version comes from emotion_classifier.model_version(), so a
+  new lexicon, tokenizer or trained model invalidates old entries; they are
+  purged when the cache is opened with a different version
+- Hit / miss statistics are kept per cache instance
+
+Used by run/run_emotions_analysis.py so re-runs only classify new or edited reviews.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from emotion_classifier import classify_emotions, model_version
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, "..", "classification_cache.sqlite")
+
+# Keys per SELECT ... IN (...) (stays under SQLite's bound-parameter limit)
+LOOKUP_BATCH_SIZE = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """SQLite-backed map of (text hash, classifier version) -> classification."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, version: Optional[str] = None):
+        self.path = path
+        self.version = version if version is not None else model_version()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "purged": 0}
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS classifications ("
+            " text_hash TEXT NOT NULL,"
+            " version TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " PRIMARY KEY (text_hash, version)"
+            ") WITHOUT ROWID"
+        )
+        self._purge_stale()
+
+    def _purge_stale(self):
+        """Drop entries written by any other classifier version."""
+        with self.conn:
+            cursor = self.conn.execute("DELETE FROM classifications WHERE version != ?", (self.version,))
+        self.stats["purged"] = cursor.rowcount
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, Dict]:
+        """Cached results for the given text hashes (missing ones are left out)."""
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+            batch = hashes[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT text_hash, result FROM classifications "
+                f"WHERE version = ? AND text_hash IN ({placeholders})",
+                [self.version, *batch]
+            )
+            for key, result in rows:
+                found[key] = json.loads(result)
+
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(hashes) - len(found)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, Dict]]):
+        """Store (text hash, result) pairs in one transaction."""
+        rows = [(key, self.version, json.dumps(result)) for key, result in items]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO classifications (text_hash, version, result) VALUES (?, ?, ?)",
+                rows
+            )
+        self.stats["writes"] += len(rows)
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def classify_with_cache(texts: List[str], cache: ClassificationCache, model=None) -> List[Dict]:
+    """
+    classify_emotions(texts) that only classifies texts missing from the cache.
+
+    Misses are classified in one batch and written back in one transaction.
+    """
+    hashes = [text_hash(text) for text in texts]
+    cached = cache.get_many(hashes)
+
+    missing = {}
+    for key, text in zip(hashes, texts):
+        if key not in cached:
+            missing.setdefault(key, text)
+
+    if missing:
+        results = classify_emotions(list(missing.values()), model=model)
+        fresh = dict(zip(missing.keys(), results))
+        cache.put_many(fresh.items())
+        cached.update(fresh)
+
+    return [cached[key] for key in hashes]
+
+
+# ===== TEST =====
+if __name__ == "__main__":
+    import tempfile
+
+    reviews = ["An amazing, wonderful film!", "Boring and dull.", "An amazing, wonderful film!"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite")
+
+        with ClassificationCache(path) as cache:
+            first = classify_with_cache(reviews, cache)
+            second = classify_with_cache(reviews + ["Terrifying."], cache)
+            assert first == second[:3]
+            print(f"[OK] {len(cache)} cached, stats: {cache.stats}, hit rate {cache.hit_rate():.0%}")
+
+        with ClassificationCache(path, version="lexicon:changed") as cache:
+            print(f"[OK] New version purged {cache.stats['purged']} stale entries")
@@ -0,0 +1,242 @@
+"""
+COMPACT STORE
+
+Read-only rdflib Store for serving the knowledge base.
+
+rdflib's default Memory store keeps three nested dict indexes plus context
+maps per triple. Serving only ever reads the graph, so this store interns
+every IRI / literal / blank node once into an integer id and keeps the
+triples as int32 arrays (sorted with NumPy) in SPO, POS and OSP order:
+
+- the leading term of each order is found through CSR offsets (term id ->
+  first row), so "all triples of ?s" is two array reads
+- a second bound term is found by binary search inside that run
+- a fully bound pattern is a membership test on the SPO run of its subject
+
+It plugs in as a normal rdflib Graph store, so SPARQL and the Graph API
+(triples, objects, value, ...) work unchanged:
+
+    graph = load_compact_graph("movie-emotions.ttl")
+
+While parsing, triples are appended to flat integer buffers (no Memory
+graph in between); freeze() sorts them and the store becomes read-only.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterator, Tuple
+
+import numpy as np
+from rdflib import Graph
+from rdflib.store import Store
+
+
+# Column order of each permutation index, as positions in (s, p, o)
+ORDERS = {
+    "spo": (0, 1, 2),
+    "pos": (1, 2, 0),
+    "osp": (2, 0, 1),
+}
+
+
+def _int_array(values: np.ndarray) -> array:
+    packed = array("i")
+    packed.frombytes(values.astype(np.int32).tobytes())
+    return packed
+
+
+class CompactStore(Store):
+    """
+    Interned, sorted-permutation triple store (read-only once frozen).
+
+    Single graph, no contexts; add() is only accepted until freeze().
+    """
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, configuration=None, identifier=None):
+        super().__init__(configuration, identifier)
+        self.terms = []
+        self.ids = {}
+        self._buffers = [array("i"), array("i"), array("i")]
+        self._indexes = {}
+        self._count = 0
+        self.frozen = False
+        self._namespace = {}
+        self._prefix = {}
+
+    # ---------- Building ----------
+
+    def _intern(self, term) -> int:
+        term_id = self.ids.get(term)
+        if term_id is None:
+            term_id = len(self.terms)
+            self.ids[term] = term_id
+            self.terms.append(term)
+        return term_id
+
+    def add(self, triple, context, quoted=False):
+        if self.frozen:
+            raise TypeError("CompactStore is read-only once frozen")
+        for column, term in zip(self._buffers, triple):
+            column.append(self._intern(term))
+
+    def addN(self, quads):
+        for s, p, o, _ in quads:
+            self.add((s, p, o), None)
+
+    def remove(self, triple, context=None):
+        raise TypeError("CompactStore is read-only")
+
+    def batch(self) -> Tuple[list, np.ndarray]:
+        """(terms, n x 3 int32 term ids) of the triples parsed so far, for shipping between processes."""
+        if self.frozen:
+            raise TypeError("batch() is only available before freeze()")
+        triples = np.stack([np.frombuffer(column, dtype=np.int32) for column in self._buffers], axis=1)
+        return self.terms, triples
+
+    def add_batch(self, terms: list, triples: np.ndarray):
+        """Merge a batch() from another store, re-interning its terms into this one."""
+        if self.frozen:
+            raise TypeError("CompactStore is read-only once frozen")
+        remap = np.array([self._intern(term) for term in terms], dtype=np.int32)
+        ids = remap[triples] if len(triples) else triples
+        for k, column in enumerate(self._buffers):
+            column.frombytes(np.ascontiguousarray(ids[:, k]).tobytes())
+
+    def freeze(self) -> 'CompactStore':
+        """De-duplicate the parsed triples and build the sorted permutation indexes."""
+        if self.frozen:
+            return self
+
+        triples = np.stack([np.frombuffer(column, dtype=np.int32) for column in self._buffers], axis=1)
+        triples = np.unique(triples, axis=0) if len(triples) else triples.reshape(0, 3)
+        self._buffers = None
+        self._count = len(triples)
+
+        n_terms = len(self.terms)
+        for name, order in ORDERS.items():
+            rows = triples[:, order]
+            rows = rows[np.lexsort((rows[:, 2], rows[:, 1], rows[:, 0]))]
+            # offsets[t]..offsets[t + 1] is the run of rows whose leading term is t
+            offsets = np.searchsorted(rows[:, 0], np.arange(n_terms + 1), side="left")
+            # Served from stdlib arrays: indexing and bisect on them avoid
+            # NumPy's per-call overhead, which dominates these short runs
+            self._indexes[name] = (_int_array(rows[:, 1]), _int_array(rows[:, 2]), _int_array(offsets))
+
+        self.frozen = True
+        return self
+
+    # ---------- Reading ----------
+
+    def __len__(self, context=None) -> int:
+        if not self.frozen:
+            return len(self._buffers[0])
+        return self._count
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def triples(self, triple_pattern, context=None):
+        for triple in self._match(triple_pattern):
+            yield triple, iter(())
+
+    def _match(self, pattern) -> Iterator[Tuple]:
+        if not self.frozen:
+            self.freeze()
+
+        ids = []
+        for term in pattern:
+            if term is None:
+                ids.append(None)
+                continue
+            term_id = self.ids.get(term)
+            if term_id is None:
+                return
+            ids.append(term_id)
+        s, p, o = ids
+
+        # Pick the permutation whose leading columns are the bound terms
+        if s is not None:
+            if o is not None and p is None:
+                name, first, second = "osp", o, s
+            else:
+                name, first, second = "spo", s, p
+        elif p is not None:
+            name, first, second = "pos", p, o
+        elif o is not None:
+            name, first, second = "osp", o, None
+        else:
+            yield from self._scan()
+            return
+
+        col1, col2, offsets = self._indexes[name]
+        start, end = offsets[first], offsets[first + 1]
+        if second is not None:
+            start, end = bisect_left(col1, second, start, end), bisect_right(col1, second, start, end)
+
+        terms = self.terms
+        lead = terms[first]
+
+        if name == "spo":
+            for i in range(start, end):
+                if o is None or col2[i] == o:
+                    yield lead, terms[col1[i]], terms[col2[i]]
+        elif name == "pos":
+            for i in range(start, end):
+                yield terms[col2[i]], lead, terms[col1[i]]
+        else:
+            for i in range(start, end):
+                if p is None or col2[i] == p:
+                    yield terms[col1[i]], terms[col2[i]], lead
+
+    def _scan(self) -> Iterator[Tuple]:
+        col1, col2, offsets = self._indexes["spo"]
+        terms = self.terms
+        for sid in range(len(offsets) - 1):
+            for i in range(offsets[sid], offsets[sid + 1]):
+                yield terms[sid], terms[col1[i]], terms[col2[i]]
+
+    # ---------- Namespaces ----------
+
+    def bind(self, prefix, namespace, override=True):
+        bound_namespace = self._namespace.get(prefix)
+        bound_prefix = self._prefix.get(namespace)
+        if bound_prefix is None and bound_namespace is not None:
+            bound_prefix = self._prefix.get(bound_namespace)
+        if not override and (bound_prefix is not None or bound_namespace is not None):
+            return
+        if bound_prefix is not None:
+            del self._namespace[bound_prefix]
+        if bound_namespace is not None:
+            del self._prefix[bound_namespace]
+        self._prefix[namespace] = prefix
+        self._namespace[prefix] = namespace
+
+    def namespace(self, prefix):
+        return self._namespace.get(prefix)
+
+    def prefix(self, namespace):
+        return self._prefix.get(namespace)
+
+    def namespaces(self):
+        yield from self._namespace.items()
+
+    def query(self, *args, **kwargs):
+        # Let rdflib's SPARQL engine evaluate over triples()
+        raise NotImplementedError
+
+    def update(self, *args, **kwargs):
+        raise TypeError("CompactStore is read-only")
+
+
+def load_compact_graph(path: str, format: str = "turtle") -> Graph:
+    """Parse an RDF file straight into a frozen CompactStore-backed Graph."""
+    graph = Graph(store=CompactStore())
+    graph.parse(path, format=format)
+    graph.store.freeze()
+    return graph
+
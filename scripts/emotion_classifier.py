@@ -1,6 +1,11 @@
+import hashlib
 import json
 import math
+import os
+import zlib
 from collections import defaultdict
+import numpy as np
+from tokenizer import VOCABULARY, WORD_PATTERN, tokenize
 from sklearn.metrics import accuracy_score, classification_report
 
 # ===============================
@@ -64,23 +69,182 @@ for emotion, words in emotion_lexicon.items():
         count = 1 if word in words else 0
         likelihoods[emotion][word] = (count + 1) / (total_words + VOCAB_SIZE)
 
+# Array form over the shared token ids (tokenizer.VOCABULARY):
+# column = token id, row = emotion; tokens outside the lexicon contribute 0
+LEXICON_IDS = VOCABULARY.intern_phrases(sorted(vocab))
+LOG_PRIORS = np.log([priors[e] for e in EMOTIONS])
+LOG_LIKELIHOODS = np.zeros((len(EMOTIONS), len(VOCABULARY)))
+LEXICON_HITS = np.zeros((len(EMOTIONS), len(VOCABULARY)), dtype=np.int32)
+for row, emotion in enumerate(EMOTIONS):
+    for word, token_id in LEXICON_IDS.items():
+        LOG_LIKELIHOODS[row, token_id] = math.log(likelihoods[emotion][word])
+        LEXICON_HITS[row, token_id] = word in emotion_lexicon[emotion]
+
+# ===============================
+# Trained Model (optional)
+# ===============================
+# A model written by train_emotion_model.py is a pair of files:
+#   emotion_model.json - header (emotions, log priors, hashing params, version)
+#   emotion_model.npy  - float32 log P(feature | emotion) matrix, one row per emotion
+# The matrix is memory-mapped, so loading costs a header read regardless of size.
+MODEL_FORMAT = "emotion-nb-hashed"
+MODEL_FORMAT_VERSION = 2  # 2: features hash tokenizer.tokenize() tokens
+DEFAULT_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "emotion_model.json"
+)
+
+_model = None
+_model_loaded = False
+
+
+def hash_tokens(tokens, n_features):
+    """Map tokens to feature columns with a process-stable hash (crc32)."""
+    return np.fromiter(
+        (zlib.crc32(t.encode("utf-8")) % n_features for t in tokens),
+        dtype=np.int64,
+        count=len(tokens)
+    )
+
+
+def load_model(path=DEFAULT_MODEL_PATH):
+    """Load a trained model header and memory-map its log-prob matrix."""
+    with open(path, "r", encoding="utf-8") as f:
+        header = json.load(f)
+
+    if header.get("format") != MODEL_FORMAT or header.get("formatVersion") != MODEL_FORMAT_VERSION:
+        raise ValueError(f"Unsupported emotion model format in {path}")
+
+    matrix_path = os.path.join(os.path.dirname(os.path.abspath(path)), header["matrix"])
+    log_probs = np.load(matrix_path, mmap_mode="r")
+
+    if log_probs.shape != (len(header["emotions"]), header["nFeatures"]):
+        raise ValueError(f"Model matrix shape {log_probs.shape} does not match header in {path}")
+
+    return {
+        "version": header["modelVersion"],
+        "emotions": header["emotions"],
+        "logPriors": np.asarray(header["logPriors"], dtype=np.float64),
+        "nFeatures": header["nFeatures"],
+        "logProbs": log_probs
+    }
+
+
+def get_model():
+    """
+    Return the active trained model, or None to use the keyword lexicon.
+
+    The model is looked up once, at EMOTION_MODEL_PATH or DEFAULT_MODEL_PATH.
+    """
+    global _model, _model_loaded
+    if not _model_loaded:
+        path = os.environ.get("EMOTION_MODEL_PATH", DEFAULT_MODEL_PATH)
+        _model = load_model(path) if os.path.exists(path) else None
+        _model_loaded = True
+    return _model
+
+
+def set_model(model):
+    """Override the active model (None forces the keyword lexicon)."""
+    global _model, _model_loaded
+    _model = model
+    _model_loaded = True
+
+
+def model_version(model=None):
+    """
+    Identifier of what classify_emotion currently computes.
+
+    The trained model's version, or a digest of the lexicon and tokenizer;
+    changes whenever cached classifications must be recomputed.
+    """
+    model = model if model is not None else get_model()
+    if model is not None:
+        return f"model:{model['version']}"
+
+    digest = hashlib.sha1(
+        json.dumps([emotion_lexicon, WORD_PATTERN.pattern], sort_keys=True).encode("utf-8")
+    )
+    return f"lexicon:{digest.hexdigest()[:16]}"
+
+
 # ===============================
 # Emotion Classification
 # ===============================
-def classify_emotion(text):
-    words = text.lower().split()
-    log_scores = {}
-    emotion_word_counts = defaultdict(int)
-
-    for emotion in EMOTIONS:
-        log_prob = math.log(priors[emotion])
-        for word in words:
-            if word in vocab:
-                log_prob += math.log(likelihoods[emotion][word])
-                if word in emotion_lexicon[emotion]:
-                    emotion_word_counts[emotion] += 1
-        log_scores[emotion] = log_prob
+def classify_emotion(text, model=None):
+    model = model if model is not None else get_model()
+    if model is not None:
+        return _classify_with_model(text, model)
+
+    ids = _lexicon_ids(text)
+    return _build_lexicon_result(
+        LOG_PRIORS + LOG_LIKELIHOODS[:, ids].sum(axis=1),
+        LEXICON_HITS[:, ids].sum(axis=1)
+    )
+
+
+def classify_emotions(texts, model=None):
+    """
+    Classify a batch of texts.
+
+    All texts are scored with one gather over the score matrix: the
+    memory-mapped trained model, or the lexicon over shared token ids.
+    """
+    model = model if model is not None else get_model()
+    if model is None:
+        id_arrays = [_lexicon_ids(text) for text in texts]
+        log_scores = LOG_PRIORS + _gather_sums(id_arrays, LOG_LIKELIHOODS)
+        counts = _gather_sums(id_arrays, LEXICON_HITS)
+        return [_build_lexicon_result(row, hits) for row, hits in zip(log_scores, counts)]
+
+    buckets = [hash_tokens(tokenize(text), model["nFeatures"]) for text in texts]
+    log_scores = model["logPriors"] + _gather_sums(buckets, model["logProbs"])
+    return [_build_model_result(row, model) for row in log_scores]
 
+
+def _lexicon_ids(text):
+    """Shared-vocabulary ids of text, limited to those the lexicon matrices cover."""
+    ids = VOCABULARY.encode(text)
+    return ids[ids < LOG_LIKELIHOODS.shape[1]]
+
+
+def _gather_sums(id_arrays, matrix):
+    """Per text, the sum of matrix columns at its ids (one gather + reduceat)."""
+    lengths = np.array([len(ids) for ids in id_arrays], dtype=np.int64)
+    sums = np.zeros((len(id_arrays), matrix.shape[0]))
+
+    if lengths.sum():
+        columns = np.concatenate(id_arrays)
+        gathered = np.asarray(matrix[:, columns], dtype=np.float64)
+        non_empty = np.flatnonzero(lengths)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))[non_empty]
+        sums[non_empty] = np.add.reduceat(gathered, offsets, axis=1).T
+
+    return sums
+
+
+def _classify_with_model(text, model):
+    columns = hash_tokens(tokenize(text), model["nFeatures"])
+    log_scores = model["logPriors"] + np.asarray(
+        model["logProbs"][:, columns], dtype=np.float64
+    ).sum(axis=1)
+    return _build_model_result(log_scores, model)
+
+
+def _build_model_result(log_scores, model):
+    scores = dict(zip(model["emotions"], (float(v) for v in log_scores)))
+    dominant = max(scores, key=scores.get)
+    # A trained model has no per-word lexicon hits; each review votes once
+    # for its dominant emotion so aggregate_emotions keeps working.
+    return _build_result(scores, {dominant: 1})
+
+
+def _build_lexicon_result(log_scores, hits):
+    scores = dict(zip(EMOTIONS, (float(v) for v in log_scores)))
+    counts = {e: int(c) for e, c in zip(EMOTIONS, hits) if c}
+    return _build_result(scores, counts)
+
+
+def _build_result(log_scores, emotion_word_counts):
     dominant_emotion = max(log_scores, key=log_scores.get)
 
     max_log = max(log_scores.values())
@@ -103,25 +267,93 @@ def classify_emotion(text):
 # ===============================
 # Aggregate emotions per movie
 # ===============================
-def aggregate_emotions(classifications):
-    votes = defaultdict(int)
-    intensity_sum = 0
-    confidence_sum = 0
+class EmotionAggregate:
+    """
+    Mergeable per-movie aggregation state.
 
-    for c in classifications:
-        for e, count in c["emotionWordCounts"].items():
-            votes[e] += count
-        intensity_sum += c["intensity"]
-        confidence_sum += c["confidence"]
+    Holds vote counts plus count / mean / M2 (Welford) of intensity and
+    confidence, so new reviews are folded in with add() in O(new reviews),
+    and states built on separate shards combine with merge() (Chan et al.).
+    Ties between equally voted emotions go to the earlier one in EMOTIONS,
+    which keeps the result independent of the order states are merged in.
+    """
 
-    aggregated = max(votes, key=votes.get) if votes else "neutral"
+    def __init__(self):
+        self.votes = defaultdict(int)
+        self.count = 0
+        self.moments = {"intensity": [0.0, 0.0], "confidence": [0.0, 0.0]}  # [mean, M2]
 
-    return {
-        "aggregatedEmotion": aggregated,
-        "allVotes": dict(votes),
-        "averageIntensity": round(intensity_sum / len(classifications), 2),
-        "averageConfidence": round(confidence_sum / len(classifications), 2)
-    }
+    def add(self, classification):
+        for e, count in classification["emotionWordCounts"].items():
+            self.votes[e] += count
+        self.count += 1
+        for field, moment in self.moments.items():
+            delta = classification[field] - moment[0]
+            moment[0] += delta / self.count
+            moment[1] += delta * (classification[field] - moment[0])
+        return self
+
+    def update(self, classifications):
+        for c in classifications:
+            self.add(c)
+        return self
+
+    def merge(self, other):
+        """New state equal to aggregating both states' reviews together."""
+        merged = EmotionAggregate()
+        for state in (self, other):
+            for e, count in state.votes.items():
+                merged.votes[e] += count
+        merged.count = self.count + other.count
+
+        for field, moment in merged.moments.items():
+            (mean_a, m2_a), (mean_b, m2_b) = self.moments[field], other.moments[field]
+            if merged.count:
+                delta = mean_b - mean_a
+                moment[0] = mean_a + delta * other.count / merged.count
+                moment[1] = m2_a + m2_b + delta * delta * self.count * other.count / merged.count
+        return merged
+
+    __add__ = merge
+
+    def result(self):
+        """Aggregation dict (aggregate_emotions format)."""
+        votes = {e: self.votes[e] for e in sorted(self.votes, key=_emotion_order) if self.votes[e]}
+        aggregated = max(votes, key=votes.get) if votes else "neutral"
+        total_votes = sum(votes.values())
+
+        return {
+            "aggregatedEmotion": aggregated,
+            "votePercentage": round(votes[aggregated] / total_votes * 100) if votes else 0,
+            "allVotes": votes,
+            "averageIntensity": round(self.moments["intensity"][0], 2),
+            "averageConfidence": round(self.moments["confidence"][0], 2),
+            "intensityStdDev": round(self._stddev("intensity"), 2),
+            "confidenceStdDev": round(self._stddev("confidence"), 2),
+            "reviewsAggregated": self.count
+        }
+
+    def _stddev(self, field):
+        return math.sqrt(self.moments[field][1] / self.count) if self.count else 0.0
+
+    def to_dict(self):
+        return {"votes": dict(self.votes), "count": self.count, "moments": self.moments}
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.votes.update(data["votes"])
+        state.count = data["count"]
+        state.moments = {field: list(moment) for field, moment in data["moments"].items()}
+        return state
+
+
+def _emotion_order(emotion):
+    return EMOTIONS.index(emotion) if emotion in EMOTIONS else len(EMOTIONS)
+
+
+def aggregate_emotions(classifications):
+    return EmotionAggregate().update(classifications).result()
 
 # ===============================
 # ACCURACY EVALUATION (CONTROLLED)
@@ -6,7 +6,9 @@ Maps user emotions to NRC emotion categories (joy, sadness, fear, anger, disgust
 """
 
 import re
+import numpy as np
 from typing import Dict, List, Optional, Tuple
+from tokenizer import VOCABULARY, lookup_table
 
 
 # ===== EMOTION LEXICON =====
@@ -24,7 +26,7 @@ EMOTION_KEYWORDS = {
     "fear": [
         "scared", "fear", "afraid", "frightened", "terrified", "anxious",
         "nervous", "worried", "panic", "dread", "horror", "creepy", "eerie",
-        "tension", "suspense", "scary", "dangerous", "threat"
+        "tension", "tense", "suspense", "scary", "dangerous", "threat"
     ],
     "anger": [
         "angry", "anger", "furious", "mad", "rage", "hostile", "irritated",
@@ -53,6 +55,13 @@ for emotion, keywords in EMOTION_KEYWORDS.items():
     for keyword in keywords:
         EMOTION_MAP[keyword.lower()] = emotion
 
+# Array form over the shared token ids (tokenizer.VOCABULARY): token id -> emotion index
+EMOTIONS = list(EMOTION_KEYWORDS.keys())
+KEYWORD_IDS = VOCABULARY.intern_phrases(EMOTION_MAP)
+EMOTION_OF_ID = lookup_table({
+    token_id: EMOTIONS.index(EMOTION_MAP[keyword]) for keyword, token_id in KEYWORD_IDS.items()
+})
+
 
 # ===== QUERY TYPE DETECTION =====
 CURRENT_STATE_MARKERS = [
@@ -72,6 +81,130 @@ NEUTRAL_MARKERS = [
 ]
 
 
+MORE_MARKERS = [
+    "more", "next", "another", "other ones", "others", "keep going", "what else"
+]
+
+
+# A bare follow-up: a marker, optionally with a polite lead-in ("ok, show me")
+# and a plain tail ("ones", "please", "like that"); nothing else
+MORE_PATTERN = re.compile(
+    r"^(?:(?:ok(?:ay)?|yes|yeah|sure|please|and|so|cool|great|thanks)\s+)*"
+    r"(?:(?:show|give|get|send)\s+(?:me\s+)?|(?:can|could)\s+(?:i|you)\s+(?:have|get|see|show\s+me|give\s+me)\s+|i\s+want\s+)?"
+    r"(?:some\s+|a\s+few\s+)?"
+    r"(?:" + "|".join(re.escape(marker).replace(r"\ ", r"\s+") for marker in MORE_MARKERS) + r")"
+    r"(?:\s+(?:one|ones|movies?|films?|recommendations?|suggestions?|options?|of\s+(?:those|these|them)"
+    r"|like\s+(?:that|this|those|these|them)|please|then|too|again))*$"
+)
+
+
+def is_more_request(text: str) -> bool:
+    """
+    Detect a follow-up asking for more of the previous recommendations.
+    
+    Only bare follow-ups count ("more", "show me more please", "another one");
+    a message saying anything else ("more joy please", "I have no more
+    energy") is a new query instead.
+    """
+    normalized = " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+    return MORE_PATTERN.match(normalized) is not None
+
+
+# ===== TITLE REFERENCES =====
+TITLE_REFERENCE_PATTERN = re.compile(
+    r"\b(?:(?:something|anything|movies?|films?|ones?|stuff)\s+(?:like|similar\s+to)|similar\s+to|in\s+the\s+vein\s+of)"
+    r"\s+(?P<title>.+)$"
+)
+TITLE_STOP_PATTERN = re.compile(r"\s+(?:from|in\s+the|before|after|since|but|please|starring|directed)\b.*$")
+
+
+def extract_title_reference(text: str) -> Optional[str]:
+    """
+    Extract the title from "something like Vertigo" / "movies similar to the godfather".
+    
+    Returns the raw title text (resolved later against TitleIndex), or None.
+    """
+    match = TITLE_REFERENCE_PATTERN.search(text.lower().strip())
+    if not match:
+        return None
+    
+    title = TITLE_STOP_PATTERN.sub("", match.group('title'))
+    title = title.strip(" \t\"'“”‘’?!.,")
+    return title or None
+
+
+# ===== FACET EXTRACTION =====
+ACTOR_CUES = {"starring", "with", "featuring"}
+DIRECTOR_CUES = {"by", "director", "directed"}
+
+DECADE_PATTERN = re.compile(r"(?<![\w'])(?:(1[89]|20)(\d)0|'?(\d)0)'?s\b")
+YEAR_RANGE_PATTERN = re.compile(r"\b(?:between\s+)?(1[89]\d\d|20\d\d)\s*(?:-|–|to|and)\s*(1[89]\d\d|20\d\d)\b")
+YEAR_BOUND_PATTERN = re.compile(r"\b(before|after|since)\s+(1[89]\d\d|20\d\d)\b")
+YEAR_PATTERN = re.compile(r"\b(1[89]\d\d|20\d\d)\b")
+
+
+def extract_facets(text: str, people: Optional[Dict[str, Dict[str, str]]] = None) -> Dict:
+    """
+    Extract director, actor and release-year facets from text.
+    
+    Args:
+        people: normalized full name or surname -> {role: display name},
+                e.g. FacetIndex.people_lookup(); without it no people are found
+    
+    Returns:
+    {
+        'director': str or None,
+        'actor': str or None,
+        'year_range': (start, end) or None
+    }
+    """
+    text_lower = text.lower()
+    facets = {'director': None, 'actor': None, 'year_range': None}
+    
+    # Years: "1950s" / "the 50s", "1940-1960", "before 1960", "in 1948"
+    decade = DECADE_PATTERN.search(text_lower)
+    year_range = YEAR_RANGE_PATTERN.search(text_lower)
+    year_bound = YEAR_BOUND_PATTERN.search(text_lower)
+    year = YEAR_PATTERN.search(text_lower)
+    if year_range:
+        start, end = sorted(int(y) for y in year_range.groups())
+        facets['year_range'] = (start, end)
+    elif year_bound:
+        bound = int(year_bound.group(2))
+        facets['year_range'] = (0, bound - 1) if year_bound.group(1) == "before" else (bound, 9999)
+    elif decade:
+        century, tens, short_tens = decade.groups()
+        if century:
+            start = int(century) * 100 + int(tens) * 10
+        else:
+            start = (2000 if short_tens in "01" else 1900) + int(short_tens) * 10
+        facets['year_range'] = (start, start + 9)
+    elif year:
+        facets['year_range'] = (int(year.group(1)), int(year.group(1)))
+    
+    # People: longest word n-gram found in the lookup wins
+    if people:
+        words = [w[:-2] if w.endswith("'s") else w for w in re.findall(r"[\w'.-]+", text_lower)]
+        i = 0
+        while i < len(words):
+            for n in (3, 2, 1):
+                roles = people.get(" ".join(words[i:i + n])) if i + n <= len(words) else None
+                if roles:
+                    break
+            else:
+                i += 1
+                continue
+            
+            cue = words[i - 1] if i else ""
+            if 'actor' in roles and (cue in ACTOR_CUES or 'director' not in roles):
+                facets['actor'] = facets['actor'] or roles['actor']
+            elif 'director' in roles and (cue in DIRECTOR_CUES or facets['director'] is None):
+                facets['director'] = facets['director'] or roles['director']
+            i += n
+    
+    return facets
+
+
 def parse_emotion(text: str) -> Dict:
     """
     Parse user input and extract emotion information.
@@ -159,18 +292,16 @@ def extract_emotions(text: str) -> List[Tuple[str, int]]:
     
     Returns: List of (emotion_name, count) tuples sorted by count descending
     """
-    emotion_counts = {}
-    
-    # Find all emotion keywords
-    words = re.findall(r'\b\w+\b', text)
-    for word in words:
-        word_lower = word.lower()
-        if word_lower in EMOTION_MAP:
-            emotion = EMOTION_MAP[word_lower]
-            emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-    
-    # Sort by count descending
-    sorted_emotions = sorted(emotion_counts.items(), key=lambda x: x[1], reverse=True)
+    ids = VOCABULARY.encode(text)
+    hits = EMOTION_OF_ID[ids[ids < len(EMOTION_OF_ID)]]
+    hits = hits[hits >= 0]
+    if not len(hits):
+        return []
+    
+    # Count per emotion; ties keep the order of first mention
+    found, first, counts = np.unique(hits, return_index=True, return_counts=True)
+    order = np.lexsort((first, -counts))
+    sorted_emotions = [(EMOTIONS[found[i]], int(counts[i])) for i in order]
     return sorted_emotions
 
 
@@ -181,6 +312,9 @@ def get_emotion_message(state: Dict) -> str:
     if state['query_type'] == 'neutral':
         return "I'll recommend some highly-rated movies for you!"
     
+    if state['query_type'] == 'similar':
+        return f"You liked {state['similar_to']['title']}! Let me find movies with a similar feel..."
+    
     emotion = state['emotion']
     if not emotion:
         return "I didn't catch an emotion. Tell me how you're feeling or what you'd like to watch."
@@ -204,6 +338,9 @@ if __name__ == "__main__":
         "Make me laugh, I want joy"
     ]
     
+    for text in ["Something like Vertigo", "movies similar to 'the godfater' from the 70s", "I'd like to feel happy"]:
+        print(f"\nTitle reference in {text!r}: {extract_title_reference(text)}")
+    
     for text in test_inputs:
         result = parse_emotion(text)
         message = get_emotion_message(result)
@@ -6,7 +6,12 @@ Uses local IMDb data or mock data for demonstration.
 """
 
 import os
-from rdflib import Graph, Namespace, Literal, URIRef
+from rdflib import Namespace, Literal
+from rule_engine import refresh_derived
+from parallel_loader import load_graph_parallel
+from answer_table import precompute_answers
+from similarity_graph import build_similarity
+from kb_upsert import UpsertBatch, apply_upsert, describe
 
 # Movie database - you can expand this with real IMDb data
 MOVIE_DATABASE = {
@@ -86,8 +91,7 @@ def enrich_movie_data(ttl_path):
     """Add movie metadata to RDF graph."""
     
     # Load existing graph
-    graph = Graph()
-    graph.parse(ttl_path, format='turtle')
+    graph = load_graph_parallel(ttl_path, store='memory')
     
     # Define namespaces
     ONYX = Namespace('http://www.gsi.dit.upm.es/ontologies/onyx/ns#')
@@ -95,74 +99,69 @@ def enrich_movie_data(ttl_path):
     EMOTION = Namespace('http://example.org/emotion/')
     DBPEDIA = Namespace('http://dbpedia.org/ontology/')
     RDF = Namespace('http://www.w3.org/1999/02/22-rdf-syntax-ns#')
+    RDFS = Namespace('http://www.w3.org/2000/01/rdf-schema#')
+    XSD = Namespace('http://www.w3.org/2001/XMLSchema#')
     
-    # Add movie metadata
+    # Describe the wanted state; the upsert only writes what differs
+    batch = UpsertBatch()
     movie_count = 0
     emotion_count = 0
     
     for movie_id, info in MOVIE_DATABASE.items():
         movie_uri = MOVIE[movie_id]
         
-        # Ensure movie has the Movie type
-        if (movie_uri, RDF.type, ONYX.Movie) not in graph:
-            graph.add((movie_uri, RDF.type, ONYX.Movie))
-        # Remove old label
-        for o in graph.objects(movie_uri, URIRef('http://www.w3.org/2000/01/rdf-schema#label')):
-            graph.remove((movie_uri, URIRef('http://www.w3.org/2000/01/rdf-schema#label'), o))
+        batch.ensure(movie_uri, RDF.type, ONYX.Movie)
         
-        # Add new title
-        graph.add((movie_uri, URIRef('http://www.w3.org/2000/01/rdf-schema#label'), Literal(info['title'])))
-        
-        # Add director
-        graph.add((movie_uri, DBPEDIA.director, Literal(info['director'])))
-        
-        # Add year
-        graph.add((movie_uri, DBPEDIA.releaseDate, Literal(info['year'])))
-        
-        # Add cast members
+        # Title, director, year and cast replace any previous values
+        batch.set(movie_uri, RDFS.label, Literal(info['title']))
+        batch.set(movie_uri, DBPEDIA.director, Literal(info['director']))
+        batch.set(movie_uri, DBPEDIA.releaseDate, Literal(info['year']))
         for i, actor in enumerate(info['cast'][:3]):
-            graph.add((movie_uri, DBPEDIA[f'cast_member_{i}'], Literal(actor)))
+            batch.set(movie_uri, DBPEDIA[f'cast_member_{i}'], Literal(actor))
         
         # Add emotions (if provided in the updated database)
         if 'emotions' in info:
-            # Get or create the emotion set for this movie
             emotion_set_uri = EMOTION[f'set_{movie_id}']
-            
-            # Ensure movie links to emotion set
-            if (movie_uri, ONYX.hasEmotionSet, emotion_set_uri) not in graph:
-                graph.add((movie_uri, ONYX.hasEmotionSet, emotion_set_uri))
+            batch.ensure(movie_uri, ONYX.hasEmotionSet, emotion_set_uri)
+            batch.ensure(emotion_set_uri, RDF.type, ONYX.AggregatedEmotionSet)
             
             for emotion_name, intensity in info['emotions'].items():
-                # Create emotion entry
                 emotion_uri = EMOTION[f'{movie_id}_{emotion_name.lower()}']
                 
-                # Make sure emotion set is of correct type
-                graph.add((emotion_set_uri, RDF.type, ONYX.AggregatedEmotionSet))
-                
-                # Link emotion to set
-                if (emotion_set_uri, ONYX.hasEmotion, emotion_uri) not in graph:
-                    graph.add((emotion_set_uri, ONYX.hasEmotion, emotion_uri))
-                
-                # Link emotion to movie (direct link too, for querying)
-                if (movie_uri, ONYX.hasEmotion, emotion_uri) not in graph:
-                    graph.add((movie_uri, ONYX.hasEmotion, emotion_uri))
+                # Link emotion to set, and to the movie directly for querying
+                batch.ensure(emotion_set_uri, ONYX.hasEmotion, emotion_uri)
+                batch.ensure(movie_uri, ONYX.hasEmotion, emotion_uri)
                 
                 # Set emotion properties
-                graph.add((emotion_uri, RDF.type, ONYX.AggregatedEmotion))
-                graph.add((emotion_uri, ONYX.hasEmotionCategory, ONYX[emotion_name]))
-                graph.add((emotion_uri, ONYX.hasEmotionIntensity, Literal(intensity, datatype=URIRef('http://www.w3.org/2001/XMLSchema#float'))))
-                graph.add((emotion_uri, ONYX.algorithmConfidence, Literal(0.85, datatype=URIRef('http://www.w3.org/2001/XMLSchema#float'))))
+                batch.ensure(emotion_uri, RDF.type, ONYX.AggregatedEmotion)
+                batch.set(emotion_uri, ONYX.hasEmotionCategory, ONYX[emotion_name])
+                batch.set(emotion_uri, ONYX.hasEmotionIntensity, Literal(intensity, datatype=XSD.float))
+                batch.set(emotion_uri, ONYX.algorithmConfidence, Literal(0.85, datatype=XSD.float))
                 
                 emotion_count += 1
         
         movie_count += 1
     
+    report = apply_upsert(graph, batch)
+    print(f'[OK] {movie_count} movies, {emotion_count} emotion associations: {describe(report)}')
+    
+    if not report['subjects']:
+        # Already enriched: the KB and its derived files are current
+        return graph
+    
     # Save enriched graph
     graph.serialize(ttl_path, format='turtle')
-    print(f'[OK] Enriched {movie_count} movies with metadata')
-    print(f'[OK] Added {emotion_count} emotion associations')
     print(f'[OK] Updated {ttl_path}')
     
+    # Keep the materialized inferences in step with the changed subjects
+    refresh_derived(ttl_path, graph, report['subjects'])
+    
+    # Rankings depend on every emotion node, so the answer table is rebuilt
+    precompute_answers(ttl_path)
+    
+    # Director / cast changes move neighbours too
+    build_similarity(ttl_path)
+    
     return graph
 
 if __name__ == '__main__':
@@ -0,0 +1,129 @@
+"""
+FACET INDEX
+
+Inverted metadata indexes over the knowledge base, built once at load time:
+- a posting list (sorted internal movie ids) per director and per actor
+- a year-sorted array of movie ids for release-year range queries
+
+Used by RecommendationEngine to narrow the emotion candidate set to movies
+matching "a tense Hitchcock film from the 50s" before any scoring happens.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+
+def normalize_name(name: str) -> str:
+    """Case- and whitespace-insensitive key for a person name."""
+    return " ".join(re.findall(r"[\w'.-]+", name.lower()))
+
+
+class FacetIndex:
+    """Director/actor posting lists and a sorted release-year array."""
+
+    def __init__(self, movies: List[Dict], movie_index: Dict[str, int]):
+        """
+        Args:
+            movies: Dicts with movie_id, director (str, may be comma-separated),
+                    cast (List[str]) and year (int or None), e.g. from
+                    SPARQLRecommender.get_movie_metadata()
+            movie_index: movie_id -> internal integer id
+        """
+        directors = defaultdict(set)
+        actors = defaultdict(set)
+        dated = []
+
+        for movie in movies:
+            key = movie_index.get(movie['movie_id'])
+            if key is None:
+                continue
+            for director in (movie.get('director') or '').split(','):
+                if director.strip() and director.strip() != 'Unknown':
+                    directors[normalize_name(director)].add(key)
+            for actor in movie.get('cast') or []:
+                actors[normalize_name(actor)].add(key)
+            if movie.get('year') is not None:
+                dated.append((int(movie['year']), key))
+
+        self.directors = {name: sorted(ids) for name, ids in directors.items()}
+        self.actors = {name: sorted(ids) for name, ids in actors.items()}
+
+        dated.sort()
+        self.years = [year for year, _ in dated]
+        self.year_ids = [key for _, key in dated]
+
+        # Display names keyed by normalized name, for the parser vocabulary
+        self.names = {}
+        self.surnames = defaultdict(set)
+        for movie in movies:
+            for person in (movie.get('director') or '').split(',') + list(movie.get('cast') or []):
+                if person.strip() and person.strip() != 'Unknown':
+                    key = normalize_name(person)
+                    self.names.setdefault(key, person.strip())
+                    self.surnames[key.split()[-1]].add(key)
+
+    def people_lookup(self) -> Dict[str, Dict[str, str]]:
+        """
+        Parser vocabulary: normalized full name or surname -> {role: display name}.
+
+        Lets emotion_state_parser.extract_facets find people with dictionary
+        lookups over the words of a message instead of scanning every name.
+        """
+        lookup = defaultdict(dict)
+        for role, index in (('director', self.directors), ('actor', self.actors)):
+            for name in index:
+                lookup[name].setdefault(role, self.names[name])
+                lookup[name.split()[-1]].setdefault(role, self.names[name])
+        return dict(lookup)
+
+    def _postings(self, index: Dict[str, List[int]], name: str) -> List[int]:
+        """Posting list for a full name, or the union over names with that surname."""
+        key = normalize_name(name)
+        if key in index:
+            return index[key]
+        matches = set()
+        for full_name in self.surnames.get(key, ()):
+            matches.update(index.get(full_name, ()))
+        return sorted(matches)
+
+    def years_between(self, start: int, end: int) -> List[int]:
+        """Sorted ids of movies released in [start, end], via binary search on the year array."""
+        lo = bisect_left(self.years, start)
+        hi = bisect_right(self.years, end)
+        return sorted(self.year_ids[lo:hi])
+
+    def match(
+        self,
+        director: Optional[str] = None,
+        actor: Optional[str] = None,
+        year_range: Optional[Tuple[int, int]] = None
+    ) -> Optional[Set[int]]:
+        """
+        Ids of movies matching every given facet, or None if no facet is given.
+
+        Intersection walks the shortest posting list and probes the others,
+        so the cost is proportional to the smallest posting, not the catalog.
+        """
+        postings = []
+        if director:
+            postings.append(self._postings(self.directors, director))
+        if actor:
+            postings.append(self._postings(self.actors, actor))
+        if year_range:
+            postings.append(self.years_between(*year_range))
+
+        if not postings:
+            return None
+
+        postings.sort(key=len)
+        result = postings[0]
+        for other in postings[1:]:
+            result = [key for key in result if _contains(other, key)]
+        return set(result)
+
+
+def _contains(sorted_ids: List[int], key: int) -> bool:
+    i = bisect_left(sorted_ids, key)
+    return i < len(sorted_ids) and sorted_ids[i] == key
@@ -4,11 +4,18 @@ STEP 3: Knowledge Base (TTL) Generation
 - Reads emotion_results.json
 - Converts it into RDF triples
 - Writes movie-emotions.ttl
+- Materializes rule inferences into movie-emotions.inferred.ttl
+- Precomputes the emotion-state rankings into movie-emotions.answers.json
+  (and their heads into movie-emotions.warm.json)
+- Builds the movie similarity graph into movie-emotions.similarity.npz
 """
 
 import json
 import os
 from rdflib import Graph, Namespace, RDF, RDFS, Literal, XSD
+from rule_engine import materialize_kb
+from answer_table import precompute_answers
+from similarity_graph import build_similarity
 
 
 # ---------- PATHS ----------
@@ -68,6 +75,15 @@ def generate_kb():
     g.serialize(destination=OUTPUT_PATH, format="turtle")
     print(f"\n📄 Knowledge Base written to: {OUTPUT_PATH}")
 
+    # ---------- MATERIALIZE INFERENCES ----------
+    materialize_kb(OUTPUT_PATH, base=g)
+
+    # ---------- PRECOMPUTE ANSWERS ----------
+    precompute_answers(OUTPUT_PATH)
+
+    # ---------- SIMILARITY GRAPH ----------
+    build_similarity(OUTPUT_PATH)
+
 
 if __name__ == "__main__":
     generate_kb()
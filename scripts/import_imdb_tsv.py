@@ -0,0 +1,207 @@
+"""
+IMDB TSV IMPORT
+
+Bulk metadata import from local IMDb dataset dumps (title.basics,
+title.crew, title.principals, name.basics; .tsv or .tsv.gz).
+
+The dumps are multi-GB, but the KB only has a small set of movies. Each
+file is streamed line by line and a row is kept only if its key is in a
+prebuilt id set (hash join, build side = KB ids), so memory is bounded by
+the KB, not the dump:
+
+1. title.basics      -> title and year of KB movies
+2. title.crew        -> director ids
+3. title.principals  -> first CAST_SIZE actors / actresses by billing order
+4. name.basics       -> names of only the people collected in 2-3
+
+The resulting title / year / director / top-3 cast are upserted onto the KB
+movies (kb_upsert: only values that differ are written, in bulk batches),
+then the derived graph, answer table and similarity graph are rebuilt as in
+enrich_movie_data. Re-importing the same dumps changes nothing.
+
+Usage:
+    python import_imdb_tsv.py /path/to/imdb-dumps [--kb ../movie-emotions.ttl] [--dry-run]
+"""
+
+import argparse
+import gzip
+import heapq
+import os
+import time
+from typing import Dict, Iterator, List, Set, TextIO
+
+from rdflib import Literal, Namespace, URIRef
+from rdflib.namespace import RDF, RDFS
+
+from kb_upsert import UpsertBatch, apply_upsert, describe, diff
+
+
+ONYX = Namespace('http://www.gsi.dit.upm.es/ontologies/onyx/ns#')
+MOVIE = Namespace('http://example.org/movie/')
+DBPEDIA = Namespace('http://dbpedia.org/ontology/')
+
+DUMPS = {
+    'basics': 'title.basics.tsv',
+    'crew': 'title.crew.tsv',
+    'principals': 'title.principals.tsv',
+    'names': 'name.basics.tsv',
+}
+
+# IMDb's null marker
+NULL = '\\N'
+
+CAST_SIZE = 3
+CAST_CATEGORIES = {'actor', 'actress', 'self'}
+
+
+# ---------- Streaming ----------
+
+def find_dump(directory: str, name: str) -> str:
+    """Path of a dump in directory, preferring the .gz file."""
+    for candidate in (f"{name}.gz", name):
+        path = os.path.join(directory, candidate)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"❌ {name}(.gz) not found in {directory}")
+
+
+def open_tsv(path: str) -> TextIO:
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='\n')
+    return open(path, 'r', encoding='utf-8', newline='\n')
+
+
+def iter_rows(path: str, keys: Set[str]) -> Iterator[List[str]]:
+    """Rows (split on tabs) whose first column is in keys; the header is skipped."""
+    with open_tsv(path) as f:
+        next(f, None)
+        for line in f:
+            # Probe the key before splitting the whole line
+            if line[:line.find('\t')] in keys:
+                yield line.rstrip('\n').split('\t')
+
+
+# ---------- Join ----------
+
+def join_imdb(directory: str, tconsts: Set[str]) -> Dict[str, Dict]:
+    """
+    Stream the dumps and join them on the given title ids.
+
+    Returns: tconst -> {'title', 'year', 'director', 'cast'} (values present in the dumps only)
+    """
+    records = {}
+    for row in iter_rows(find_dump(directory, DUMPS['basics']), tconsts):
+        record = records.setdefault(row[0], {})
+        record['title'] = row[2]
+        if row[5] != NULL:
+            record['year'] = int(row[5])
+
+    directors = {}
+    for row in iter_rows(find_dump(directory, DUMPS['crew']), tconsts):
+        if row[1] != NULL:
+            directors[row[0]] = row[1].split(',')
+
+    # Lowest billing orders per title, in a bounded heap
+    billing = {}
+    for row in iter_rows(find_dump(directory, DUMPS['principals']), tconsts):
+        if row[3] in CAST_CATEGORIES:
+            heap = billing.setdefault(row[0], [])
+            entry = (-int(row[1]), row[2])
+            if len(heap) < CAST_SIZE:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+    cast = {tconst: [nconst for _, nconst in sorted(heap, reverse=True)] for tconst, heap in billing.items()}
+
+    people = {nconst for ids in directors.values() for nconst in ids}
+    people.update(nconst for ids in cast.values() for nconst in ids)
+    names = {row[0]: row[1] for row in iter_rows(find_dump(directory, DUMPS['names']), people)}
+
+    for tconst, ids in directors.items():
+        resolved = [names[nconst] for nconst in ids if nconst in names]
+        if resolved:
+            records.setdefault(tconst, {})['director'] = ", ".join(resolved)
+    for tconst, ids in cast.items():
+        resolved = [names[nconst] for nconst in ids if nconst in names]
+        if resolved:
+            records.setdefault(tconst, {})['cast'] = resolved
+
+    return records
+
+
+# ---------- KB ----------
+
+def kb_title_ids(graph) -> Dict[str, URIRef]:
+    """IMDb title id (tt + KB movie id) -> movie URI, for every movie in the KB."""
+    prefix = str(MOVIE)
+    return {
+        f"tt{str(movie)[len(prefix):]}": movie
+        for movie in graph.subjects(RDF.type, ONYX.Movie)
+        if str(movie).startswith(prefix)
+    }
+
+
+def add_metadata(batch: UpsertBatch, movie: URIRef, record: Dict):
+    """Upsert the values of one joined record; fields missing from the dumps are left alone."""
+    if 'title' in record:
+        batch.set(movie, RDFS.label, Literal(record['title']))
+    if 'year' in record:
+        batch.set(movie, DBPEDIA.releaseDate, Literal(record['year']))
+    if 'director' in record:
+        batch.set(movie, DBPEDIA.director, Literal(record['director']))
+    if 'cast' in record:
+        cast = record['cast'][:CAST_SIZE]
+        for i in range(CAST_SIZE):
+            predicate = DBPEDIA[f'cast_member_{i}']
+            batch.set(movie, predicate, *([Literal(cast[i])] if i < len(cast) else []))
+
+
+def import_imdb(ttl_path: str, directory: str, dry_run: bool = False) -> Dict:
+    """Join the dumps onto the KB movies and write the updated KB (unless dry_run)."""
+    from parallel_loader import load_graph_parallel
+
+    start = time.perf_counter()
+    graph = load_graph_parallel(ttl_path, store='memory')
+    movies = kb_title_ids(graph)
+    print(f"📥 {len(movies)} KB movies to look up in {directory}")
+
+    records = join_imdb(directory, set(movies))
+    print(f"✅ Joined {len(records)} / {len(movies)} movies ({time.perf_counter() - start:.1f}s)")
+
+    batch = UpsertBatch()
+    for tconst, record in records.items():
+        add_metadata(batch, movies[tconst], record)
+
+    if dry_run:
+        removals, additions, unchanged = diff(graph, batch)
+        print(f"[OK] Dry run: +{len(additions)} / -{len(removals)} triples, {unchanged} values unchanged (KB not written)")
+        return {'kb_movies': len(movies), 'matched': len(records), 'added': len(additions), 'removed': len(removals)}
+
+    report = apply_upsert(graph, batch)
+    print(f"[OK] {describe(report)}")
+    stats = {'kb_movies': len(movies), 'matched': len(records), 'added': len(report['added']), 'removed': len(report['removed'])}
+    if not report['subjects']:
+        return stats
+
+    graph.serialize(ttl_path, format='turtle')
+    print(f"[OK] Updated {ttl_path}")
+
+    from rule_engine import refresh_derived
+    from answer_table import precompute_answers
+    from similarity_graph import build_similarity
+
+    refresh_derived(ttl_path, graph, report['subjects'])
+    precompute_answers(ttl_path)
+    build_similarity(ttl_path)
+    return stats
+
+
+# ===== ENTRY POINT =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import IMDb TSV metadata into the KB.")
+    parser.add_argument("dumps", help="Directory with title.basics / title.crew / title.principals / name.basics .tsv(.gz)")
+    parser.add_argument("--kb", default=os.path.join(os.path.dirname(__file__), "..", "movie-emotions.ttl"))
+    parser.add_argument("--dry-run", action="store_true", help="Join and report without writing the KB")
+    args = parser.parse_args()
+
+    import_imdb(args.kb, args.dumps, args.dry_run)
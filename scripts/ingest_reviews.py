@@ -0,0 +1,340 @@
+"""
+STEP 1: Review & Metadata Ingestion (Python, asyncio)
+
+Replaces the sequential puppeteer flow in pipeline.js:
+
+- Queries a Wikidata SPARQL endpoint for movies with IMDb ids
+- Fetches review pages concurrently over a pooled HTTP client
+  (bounded concurrency, per-host rate limiting, retries with backoff)
+- Appends each finished movie to a JSONL checkpoint, so an interrupted
+  run resumes where it stopped
+- Writes reviews.json for run_emotions_analysis.py
+
+Endpoints are configurable so a local stub server can stand in for
+Wikidata and IMDb in tests.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+
+# ---------- PATHS ----------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECKPOINT_PATH = os.path.join(BASE_DIR, "..", "reviews.jsonl")
+OUTPUT_PATH = os.path.join(BASE_DIR, "..", "reviews.json")
+
+
+# ---------- ENDPOINTS ----------
+WIKIDATA_ENDPOINT = "https://query.wikidata.org/sparql"
+REVIEW_URL_TEMPLATE = "https://www.imdb.com/title/tt{movie_id}/reviews"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+DEFAULT_FILTER = "?movie wdt:P577 ?date . FILTER(YEAR(?date) = 1950)"
+
+
+# ---------- TUNING ----------
+DEFAULT_CONCURRENCY = 16
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+DEFAULT_RETRIES = 4
+BACKOFF_BASE = 1.0
+REQUEST_TIMEOUT = 30
+MAX_REVIEWS_PER_MOVIE = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# ===== REVIEW EXTRACTION =====
+class ReviewPageParser(HTMLParser):
+    """Collect text of elements whose class mentions "review", plus the first <h1>."""
+
+    VOID_TAGS = {"br", "img", "hr", "input", "meta", "link", "source", "wbr"}
+
+    def __init__(self):
+        super().__init__()
+        self.stack = []
+        self.open_reviews = []
+        self.reviews = []
+        self.title = None
+        self.title_parts = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.VOID_TAGS:
+            return
+        is_review = "review" in (dict(attrs).get("class") or "")
+        self.stack.append((tag, is_review))
+        if is_review:
+            self.open_reviews.append([])
+        if tag == "h1" and self.title is None:
+            self.title_parts = []
+
+    def handle_endtag(self, tag):
+        # Pop up to the matching tag to tolerate unclosed elements
+        while self.stack:
+            open_tag, is_review = self.stack.pop()
+            if is_review:
+                self.reviews.append(" ".join("".join(self.open_reviews.pop()).split()))
+            if open_tag == "h1" and self.title_parts is not None:
+                self.title = " ".join("".join(self.title_parts).split())
+                self.title_parts = None
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        for parts in self.open_reviews:
+            parts.append(data)
+        if self.title_parts is not None:
+            self.title_parts.append(data)
+
+
+def extract_reviews(html: str) -> Tuple[Optional[str], List[str]]:
+    """Return (page title, up to MAX_REVIEWS_PER_MOVIE review texts), same filters as pipeline.js."""
+    parser = ReviewPageParser()
+    parser.feed(html)
+    parser.close()
+
+    reviews = []
+    for text in parser.reviews:
+        if (
+            150 < len(text) < 2000
+            and "Sign in" not in text
+            and "JavaScript" not in text
+            and "Ratings" not in text
+            and "stars" not in text
+            and len(text.split(" ")) > 15
+            and text not in reviews
+        ):
+            reviews.append(text)
+
+    return parser.title, reviews[:MAX_REVIEWS_PER_MOVIE]
+
+
+# ===== HTTP =====
+class HostRateLimiter:
+    """Spaces out request starts per host to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = {}
+        self.lock = asyncio.Lock()
+
+    async def wait(self, url: str):
+        host = urlsplit(url).netloc
+        async with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class Fetcher:
+    """Pooled HTTP client with bounded concurrency, rate limiting and retries."""
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+        retries: int = DEFAULT_RETRIES
+    ):
+        self.session = session
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = HostRateLimiter(requests_per_second)
+        self.retries = retries
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+
+    async def get(self, url: str, params: Optional[Dict] = None, as_json: bool = False):
+        """GET url; retries timeouts, connection errors and RETRY_STATUSES with backoff."""
+        for attempt in range(self.retries + 1):
+            await self.limiter.wait(url)
+            delay = BACKOFF_BASE * (2 ** attempt) * (0.5 + random.random())
+            try:
+                async with self.semaphore:
+                    self.stats["requests"] += 1
+                    async with self.session.get(url, params=params) as response:
+                        if response.status in RETRY_STATUSES:
+                            retry_after = response.headers.get("Retry-After", "")
+                            if retry_after.isdigit():
+                                delay = max(delay, float(retry_after))
+                            raise aiohttp.ClientResponseError(
+                                response.request_info, response.history,
+                                status=response.status, message=response.reason or ""
+                            )
+                        response.raise_for_status()
+                        if as_json:
+                            return await response.json(content_type=None)
+                        return await response.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status in RETRY_STATUSES
+                if not retryable or attempt == self.retries:
+                    self.stats["failures"] += 1
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+
+
+# ===== WIKIDATA =====
+async def query_movie_ids(
+    fetcher: Fetcher,
+    endpoint: str = WIKIDATA_ENDPOINT,
+    filter_query: str = DEFAULT_FILTER,
+    limit: int = 1000
+) -> List[Tuple[str, str]]:
+    """Return (movie_id without 'tt', label) pairs from Wikidata."""
+    sparql = f"""
+    SELECT ?movie ?movieLabel ?imdbId WHERE {{
+      ?movie wdt:P31 wd:Q11424 .
+      ?movie wdt:P345 ?imdbId .
+      {filter_query}
+      SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en" . }}
+    }}
+    LIMIT {limit}
+    """
+    data = await fetcher.get(endpoint, params={"query": sparql, "format": "json"}, as_json=True)
+
+    movies = []
+    for row in data["results"]["bindings"]:
+        imdb_id = row["imdbId"]["value"]
+        if imdb_id.startswith("tt"):
+            movies.append((imdb_id[2:], row.get("movieLabel", {}).get("value", "Unknown")))
+    return movies
+
+
+# ===== CHECKPOINT =====
+def load_checkpoint(path: str) -> set:
+    """Movie ids already written to the JSONL checkpoint."""
+    done = set()
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["movieId"])
+                except (ValueError, KeyError):
+                    continue  # torn last line from an interrupted run
+    return done
+
+
+def write_reviews_json(checkpoint_path: str, output_path: str) -> int:
+    """Stream the JSONL checkpoint into the reviews.json array run_emotions_analysis reads."""
+    count = 0
+    with open(checkpoint_path, "r", encoding="utf-8") as src, open(output_path, "w", encoding="utf-8") as dst:
+        dst.write("[\n")
+        for line in src:
+            try:
+                movie = json.loads(line)
+            except ValueError:
+                continue
+            if movie.get("reviews"):
+                dst.write((",\n" if count else "") + json.dumps(movie, ensure_ascii=False))
+                count += 1
+        dst.write("\n]\n")
+    return count
+
+
+# ===== INGESTION =====
+async def ingest(
+    movie_ids: Optional[List[str]] = None,
+    wikidata_endpoint: str = WIKIDATA_ENDPOINT,
+    review_url_template: str = REVIEW_URL_TEMPLATE,
+    filter_query: str = DEFAULT_FILTER,
+    limit: int = 1000,
+    checkpoint_path: str = CHECKPOINT_PATH,
+    output_path: Optional[str] = OUTPUT_PATH,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    retries: int = DEFAULT_RETRIES
+) -> Dict:
+    """Fetch reviews for movie_ids (or a Wikidata query), resuming from checkpoint_path."""
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency)
+    headers = {"User-Agent": USER_AGENT}
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector, headers=headers) as session:
+        fetcher = Fetcher(session, concurrency, requests_per_second, retries)
+
+        if movie_ids is None:
+            print("🔍 Querying Wikidata for movies...")
+            movies = await query_movie_ids(fetcher, wikidata_endpoint, filter_query, limit)
+        else:
+            movies = [(movie_id, "Unknown") for movie_id in movie_ids]
+
+        done = load_checkpoint(checkpoint_path)
+        pending = [(movie_id, label) for movie_id, label in movies if movie_id not in done]
+        print(f"✅ {len(movies)} movies, {len(movies) - len(pending)} already in checkpoint\n")
+
+        queue = asyncio.Queue()
+        for item in pending:
+            queue.put_nowait(item)
+
+        summary = {"fetched": 0, "withReviews": 0, "failed": 0}
+
+        with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+            async def worker():
+                while True:
+                    try:
+                        movie_id, label = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    try:
+                        html = await fetcher.get(review_url_template.format(movie_id=movie_id))
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        summary["failed"] += 1
+                        print(f"❌ Error fetching {movie_id}: {e}")
+                        continue
+
+                    title, reviews = extract_reviews(html)
+                    record = {"movieId": movie_id, "title": title or label, "reviews": reviews}
+                    checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    checkpoint.flush()
+
+                    summary["fetched"] += 1
+                    summary["withReviews"] += bool(reviews)
+                    print(f"🎬 {record['title']} ({movie_id}): {len(reviews)} reviews")
+
+            await asyncio.gather(*(worker() for _ in range(min(concurrency, len(pending)))))
+
+        summary.update(fetcher.stats)
+
+    if output_path:
+        summary["written"] = write_reviews_json(checkpoint_path, output_path)
+        print(f"\n📄 {summary['written']} movies written to: {output_path}")
+
+    return summary
+
+
+# ---------- ENTRY POINT ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest movie reviews into reviews.json.")
+    parser.add_argument("--ids", nargs="*", help="IMDb ids (without 'tt'); default: query Wikidata")
+    parser.add_argument("--filter", default=DEFAULT_FILTER, help="Wikidata SPARQL filter clause")
+    parser.add_argument("--limit", type=int, default=1000, help="Max movies from Wikidata")
+    parser.add_argument("--wikidata-endpoint", default=WIKIDATA_ENDPOINT)
+    parser.add_argument("--review-url", default=REVIEW_URL_TEMPLATE, help="URL template with {movie_id}")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rps", type=float, default=DEFAULT_REQUESTS_PER_SECOND, help="Requests/second per host")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    args = parser.parse_args()
+
+    result = asyncio.run(ingest(
+        movie_ids=args.ids,
+        wikidata_endpoint=args.wikidata_endpoint,
+        review_url_template=args.review_url,
+        filter_query=args.filter,
+        limit=args.limit,
+        checkpoint_path=args.checkpoint,
+        output_path=args.output,
+        concurrency=args.concurrency,
+        requests_per_second=args.rps,
+        retries=args.retries
+    ))
+    print(f"✅ Ingestion complete: {result}")
@@ -0,0 +1,129 @@
+"""
+KB UPSERT
+
+Idempotent batch updates of the knowledge base.
+
+Writers (enrich_movie_data, import_imdb_tsv) describe the state they want
+instead of adding triples blindly:
+- batch.set(s, p, *objects)  the values of (s, p) become exactly objects
+- batch.ensure(s, p, o)      (s, p, o) exists; other values of (s, p) stay
+
+apply_upsert diffs the batch against the graph, touching only the
+(subject, predicate) pairs it names, and applies all removals and
+additions together (Graph.addN in batches). If anything fails part-way,
+the graph is rolled back to its previous state. The returned report lists
+what changed, so a rerun with the same data is a no-op: nothing removed,
+nothing added, no changed subjects to refresh downstream.
+"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+from rdflib import Graph
+
+
+# Triples per Graph.addN call
+BATCH_SIZE = 10000
+
+
+class UpsertBatch:
+    """Desired values per (subject, predicate)."""
+
+    def __init__(self):
+        self.values = {}
+        self.links = set()
+
+    def set(self, subject, predicate, *objects):
+        """Replace every value of (subject, predicate) with objects (none = delete)."""
+        self.values[(subject, predicate)] = set(objects)
+
+    def ensure(self, subject, predicate, obj):
+        """Add (subject, predicate, obj) if missing, keeping other values."""
+        self.links.add((subject, predicate, obj))
+
+    def __len__(self) -> int:
+        return len(self.values) + len(self.links)
+
+
+def diff(graph: Graph, batch: UpsertBatch) -> Tuple[List[Tuple], List[Tuple], int]:
+    """(removals, additions, unchanged) that bring graph to the state batch describes."""
+    removals, additions = [], []
+    unchanged = 0
+    for (subject, predicate), wanted in batch.values.items():
+        current = set(graph.objects(subject, predicate))
+        if current == wanted:
+            unchanged += 1
+            continue
+        removals.extend((subject, predicate, o) for o in current - wanted)
+        additions.extend((subject, predicate, o) for o in wanted - current)
+
+    pending = set(additions)
+    for triple in batch.links:
+        if triple in graph or triple in pending:
+            unchanged += 1
+            continue
+        additions.append(triple)
+        pending.add(triple)
+    return removals, additions, unchanged
+
+
+def add_in_batches(graph: Graph, triples: Iterable[Tuple], batch_size: int = BATCH_SIZE) -> int:
+    """Graph.addN in fixed-size batches; returns the number of triples added."""
+    added = 0
+    quads = []
+    for s, p, o in triples:
+        quads.append((s, p, o, graph))
+        if len(quads) >= batch_size:
+            graph.addN(quads)
+            added += len(quads)
+            quads = []
+    if quads:
+        graph.addN(quads)
+        added += len(quads)
+    return added
+
+
+def apply_upsert(graph: Graph, batch: UpsertBatch) -> Dict:
+    """
+    Apply a batch atomically (all of it, or nothing on error).
+
+    Returns:
+    {
+        'removed': List[triple],
+        'added': List[triple],
+        'subjects': Set of subjects that changed,
+        'unchanged': int (pairs / links already in the wanted state)
+    }
+    """
+    removals, additions, unchanged = diff(graph, batch)
+
+    removed = []
+    try:
+        for triple in removals:
+            graph.remove(triple)
+            removed.append(triple)
+        add_in_batches(graph, additions)
+    except Exception:
+        # Roll back: drop whatever was added, restore what was removed
+        # (one triple at a time, not through the batch path that failed)
+        for triple in additions:
+            graph.remove(triple)
+        for triple in removed:
+            graph.add(triple)
+        raise
+
+    subjects: Set = {s for s, _, _ in removals}
+    subjects.update(s for s, _, _ in additions)
+    return {
+        'removed': removals,
+        'added': additions,
+        'subjects': subjects,
+        'unchanged': unchanged
+    }
+
+
+def describe(report: Dict) -> str:
+    """One-line summary of an upsert report."""
+    if not report['removed'] and not report['added']:
+        return f"No changes ({report['unchanged']} values already up to date)"
+    return (f"{len(report['subjects'])} subjects changed: +{len(report['added'])} / "
+            f"-{len(report['removed'])} triples, {report['unchanged']} values unchanged")
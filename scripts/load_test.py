@@ -0,0 +1,459 @@
+"""
+LOAD TEST
+
+Concurrent-user load generator for EmotionChatbot / RecommendationEngine,
+for capacity planning. Runs fully offline.
+
+- Utterances are drawn from the emotion_state_parser marker and keyword
+  lists (current-state, desired-state, neutral and "more" follow-ups)
+- Targets: an in-process engine (one loaded KB, one chatbot per simulated
+  user) or a local HTTP server (--url, POST {"session", "message"} as JSON)
+- Concurrency: threads, processes (one engine per process) or asyncio
+- Closed loop: N users each send, wait for the reply, think, repeat
+- Open loop: requests arrive at a fixed rate (Poisson) whether or not earlier
+  ones finished; latency is measured from the scheduled arrival, so queueing
+  delay counts (no coordinated omission); requests still unfinished --drain
+  seconds after the last arrival count as failures
+- Reports throughput, latency percentiles, which path served the replies
+  (served_by / degraded, see request_budget.py) and CPU / RSS sampled from
+  /proc over time, optionally against synthetic KBs of increasing size
+- --budget gives every chatbot turn a deadline, to see how much traffic
+  degrades to cached / precomputed answers at a given load
+
+Usage:
+    python load_test.py --sizes 100,1000,5000 --users 8 --duration 20
+    python load_test.py --kb ../movie-emotions.ttl --mode open --rate 50 --backend asyncio
+    python load_test.py --sizes 5000 --mode open --rate 200 --budget 0.2
+    python load_test.py --url http://127.0.0.1:8000/chat --users 32 --backend asyncio
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from emotion_state_parser import (
+    EMOTION_KEYWORDS, CURRENT_STATE_MARKERS, DESIRED_STATE_MARKERS, NEUTRAL_MARKERS, MORE_MARKERS
+)
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_KB_PATH = os.path.join(BASE_DIR, "..", "movie-emotions.ttl")
+
+# Share of each utterance kind in the generated mix
+UTTERANCE_MIX = {
+    "current_state": 0.35,
+    "desired_state": 0.35,
+    "neutral": 0.15,
+    "more": 0.15,
+}
+
+SAMPLE_INTERVAL = 1.0  # seconds between CPU / RSS samples
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+# ===== UTTERANCES =====
+def make_utterance(rng: random.Random) -> str:
+    """One user message, drawn from the parser's own vocabulary."""
+    kind = rng.choices(list(UTTERANCE_MIX), weights=list(UTTERANCE_MIX.values()))[0]
+    keyword = rng.choice(rng.choice(list(EMOTION_KEYWORDS.values())))
+
+    if kind == "current_state":
+        # Repeating the keyword raises the parsed intensity
+        return f"{rng.choice(CURRENT_STATE_MARKERS)} " + " and ".join([keyword] * rng.randint(1, 3))
+    if kind == "desired_state":
+        return f"{rng.choice(DESIRED_STATE_MARKERS)} something {keyword}"
+    if kind == "neutral":
+        return rng.choice(NEUTRAL_MARKERS)
+    return rng.choice(MORE_MARKERS)
+
+
+# ===== TARGETS =====
+class InProcessTarget:
+    """One loaded engine, one EmotionChatbot (conversation state) per session."""
+
+    def __init__(self, ttl_path: str, budget: Optional[float] = None):
+        from chatbot import EmotionChatbot
+        from recommendation_engine import RecommendationEngine
+
+        self._chatbot = EmotionChatbot
+        self.ttl_path = ttl_path
+        self.budget = budget
+        self.engine = RecommendationEngine(ttl_path)
+        self.sessions = {}
+        self.locks = {}
+        self._guard = threading.Lock()
+
+    def send(self, session: int, message: str) -> tuple:
+        """(served_by, degraded) of the reply."""
+        with self._guard:
+            if session not in self.sessions:
+                self.sessions[session] = self._chatbot(self.ttl_path, engine=self.engine)
+                self.locks[session] = threading.Lock()
+        # A conversation handles one message at a time, like a real client
+        with self.locks[session]:
+            result = self.sessions[session].handle_user_input(message, self.budget)
+        return result['served_by'], result['degraded']
+
+
+class HttpTarget:
+    """Local server speaking {"session", "message"} JSON over POST."""
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, session: int, message: str) -> tuple:
+        """(served_by, degraded) of the reply, if the server reports them."""
+        body = json.dumps({"session": session, "message": message}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            payload = response.read()
+        try:
+            reply = json.loads(payload)
+        except ValueError:
+            return None, None
+        if not isinstance(reply, dict):
+            return None, None
+        return reply.get("served_by"), reply.get("degraded")
+
+
+def make_target(config: Dict):
+    return HttpTarget(config["url"]) if config.get("url") else InProcessTarget(config["kb"], config.get("budget"))
+
+
+# ===== RESOURCE SAMPLING =====
+def read_proc(pid: int) -> Optional[tuple]:
+    """(cpu seconds, rss bytes) of a process from /proc, or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm") as f:
+            rss_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+    return cpu, rss_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class ResourceSampler(threading.Thread):
+    """Samples CPU % and RSS of this process and its children every interval."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def _totals(self) -> tuple:
+        cpu = rss = 0.0
+        for pid in [os.getpid()] + [p.pid for p in multiprocessing.active_children()]:
+            usage = read_proc(pid)
+            if usage:
+                cpu += usage[0]
+                rss += usage[1]
+        return cpu, rss
+
+    def run(self):
+        start = time.perf_counter()
+        last_time, (last_cpu, _) = start, self._totals()
+        while not self._stop_event.wait(self.interval):
+            now, (cpu, rss) = time.perf_counter(), self._totals()
+            self.samples.append({
+                "t": round(now - start, 2),
+                "cpu_percent": round(100 * (cpu - last_cpu) / (now - last_time), 1),
+                "rss_mb": round(rss / 1e6, 1)
+            })
+            last_time, last_cpu = now, cpu
+
+    def stop(self) -> List[Dict]:
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+
+# ===== LOAD LOOPS =====
+def _timed(target, session: int, message: str, scheduled: float, origin: float) -> tuple:
+    """(offset of scheduled start, latency from scheduled start, ok, (served_by, degraded))"""
+    try:
+        served = target.send(session, message)
+        ok = True
+    except Exception:
+        served = (None, None)
+        ok = False
+    return scheduled - origin, time.perf_counter() - scheduled, ok, served
+
+
+def run_threads(config: Dict, target=None) -> List[tuple]:
+    """Closed- or open-loop load from a thread pool; returns request records."""
+    target = target or make_target(config)
+    rng = random.Random(config["seed"])
+    deadline_offset = config["duration"]
+    records = []
+    lock = threading.Lock()
+
+    if config["mode"] == "closed":
+        origin = time.perf_counter()
+
+        def user(session: int):
+            user_rng = random.Random(config["seed"] * 1000 + session)
+            while time.perf_counter() - origin < deadline_offset:
+                record = _timed(target, session, make_utterance(user_rng), time.perf_counter(), origin)
+                with lock:
+                    records.append(record)
+                if config["think_time"]:
+                    time.sleep(user_rng.expovariate(1.0 / config["think_time"]))
+
+        threads = [threading.Thread(target=user, args=(s + config["session_offset"],)) for s in range(config["users"])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return records
+
+    # Open loop: Poisson arrivals at config["rate"] per second
+    pool = ThreadPoolExecutor(max_workers=config["users"])
+    scheduled = []
+    origin = time.perf_counter()
+    next_arrival = origin
+    while next_arrival - origin < deadline_offset:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        session = config["session_offset"] + rng.randrange(config["users"])
+        future = pool.submit(_timed, target, session, make_utterance(rng), next_arrival, origin)
+        scheduled.append((future, next_arrival))
+        next_arrival += rng.expovariate(config["rate"])
+
+    # Past saturation the backlog never drains; what is left after the grace period fails
+    wait([future for future, _ in scheduled], timeout=config["drain"])
+    pool.shutdown(wait=False, cancel_futures=True)
+    return [
+        future.result() if future.done() and not future.cancelled()
+        else (arrival - origin, time.perf_counter() - arrival, False, (None, None))
+        for future, arrival in scheduled
+    ]
+
+
+def _process_worker(config: Dict) -> List[tuple]:
+    return run_threads(config)
+
+
+def run_processes(config: Dict) -> List[tuple]:
+    """Split users (and arrival rate) across worker processes, each with its own engine."""
+    workers = max(1, min(config["workers"], config["users"]))
+    configs = []
+    for i in range(workers):
+        users = config["users"] // workers + (i < config["users"] % workers)
+        configs.append({
+            **config,
+            "users": users,
+            "rate": config["rate"] * users / config["users"],
+            "seed": config["seed"] + i,
+            "session_offset": sum(c["users"] for c in configs)
+        })
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = list(pool.map(_process_worker, configs))
+
+    # Each process measured from its own origin; offsets are still relative to its start
+    return [record for records in results for record in records]
+
+
+def run_asyncio(config: Dict, target=None) -> List[tuple]:
+    """Requests as coroutines; blocking sends run via asyncio.to_thread."""
+    target = target or make_target(config)
+
+    async def main() -> List[tuple]:
+        origin = time.perf_counter()
+        semaphore = asyncio.Semaphore(config["users"])
+        rng = random.Random(config["seed"])
+
+        async def one(session: int, message: str, scheduled: float) -> tuple:
+            async with semaphore:
+                return await asyncio.to_thread(_timed, target, session, message, scheduled, origin)
+
+        if config["mode"] == "closed":
+            async def user(session: int) -> List[tuple]:
+                user_rng = random.Random(config["seed"] * 1000 + session)
+                records = []
+                while time.perf_counter() - origin < config["duration"]:
+                    records.append(await one(session, make_utterance(user_rng), time.perf_counter()))
+                    if config["think_time"]:
+                        await asyncio.sleep(user_rng.expovariate(1.0 / config["think_time"]))
+                return records
+
+            per_user = await asyncio.gather(*(user(s) for s in range(config["users"])))
+            return [r for records in per_user for r in records]
+
+        scheduled = []
+        next_arrival = origin
+        while next_arrival - origin < config["duration"]:
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            task = asyncio.create_task(one(rng.randrange(config["users"]), make_utterance(rng), next_arrival))
+            scheduled.append((task, next_arrival))
+            next_arrival += rng.expovariate(config["rate"])
+
+        await asyncio.wait([task for task, _ in scheduled], timeout=config["drain"])
+        records = []
+        for task, arrival in scheduled:
+            if task.done():
+                records.append(task.result())
+            else:
+                task.cancel()
+                records.append((arrival - origin, time.perf_counter() - arrival, False, (None, None)))
+        return records
+
+    return asyncio.run(main())
+
+
+BACKENDS = {
+    "threads": run_threads,
+    "processes": run_processes,
+    "asyncio": run_asyncio,
+}
+
+
+# ===== REPORTING =====
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(records: List[tuple], duration: float, samples: List[Dict]) -> Dict:
+    latencies = sorted(latency for _, latency, ok, _ in records if ok)
+    errors = sum(1 for _, _, ok, _ in records if not ok)
+
+    # Throughput per second of the run, to see where it saturates
+    timeline = {}
+    for offset, latency, ok, _ in records:
+        if ok:
+            second = int(offset + latency)
+            timeline[second] = timeline.get(second, 0) + 1
+
+    # Which path answered, and why the fallbacks did
+    served_by, degraded = {}, {}
+    for _, _, ok, (path, reason) in records:
+        if ok and path is not None:
+            served_by[path] = served_by.get(path, 0) + 1
+        if ok and reason is not None:
+            degraded[reason] = degraded.get(reason, 0) + 1
+
+    return {
+        "requests": len(records),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+        "latency_ms": {
+            name: round(percentile(latencies, p) * 1000, 2)
+            for name, p in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+        },
+        "completed_per_second": [timeline.get(s, 0) for s in range(int(duration) + 1)],
+        "served_by": served_by,
+        "degraded": degraded,
+        "cpu_percent_max": max((s["cpu_percent"] for s in samples), default=0.0),
+        "rss_mb_max": max((s["rss_mb"] for s in samples), default=0.0),
+        "samples": samples
+    }
+
+
+def run_load_test(config: Dict) -> Dict:
+    """Run one load test described by config; returns the summary."""
+    sampler = ResourceSampler(config.get("sample_interval", SAMPLE_INTERVAL))
+    sampler.start()
+
+    # The in-process engine is loaded before the clock starts
+    target = None
+    if config["backend"] != "processes":
+        target = make_target(config)
+
+    if config["backend"] == "processes":
+        records = run_processes(config)
+    else:
+        records = BACKENDS[config["backend"]](config, target)
+
+    # Measured window: from each loop's origin (after its engine loaded) to the last reply
+    span = max((offset + latency for offset, latency, _, _ in records), default=0.0)
+    return summarize(records, span, sampler.stop())
+
+
+def print_summary(label: str, summary: Dict):
+    latency = summary["latency_ms"]
+    print(f"\n📊 {label}")
+    print(f"   ➤ Requests: {summary['requests']} ({summary['errors']} failed or timed out)")
+    print(f"   ➤ Throughput: {summary['throughput_rps']} req/s")
+    print(f"   ➤ Latency ms: p50 {latency['p50']} | p90 {latency['p90']} | p99 {latency['p99']} | max {latency['max']}")
+    if summary["served_by"]:
+        served = " | ".join(f"{path} {count}" for path, count in sorted(summary["served_by"].items()))
+        degraded = " | ".join(f"{reason} {count}" for reason, count in sorted(summary["degraded"].items())) or "none"
+        print(f"   ➤ Served by: {served} (degraded: {degraded})")
+    print(f"   ➤ CPU max: {summary['cpu_percent_max']}% | RSS max: {summary['rss_mb_max']} MB")
+    print(f"   ➤ Completed/s: {summary['completed_per_second']}")
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Load-test the emotion chatbot.")
+    parser.add_argument("--kb", default=DEFAULT_KB_PATH, help="TTL knowledge base (in-process target)")
+    parser.add_argument("--sizes", help="Comma-separated synthetic KB sizes to test instead of --kb")
+    parser.add_argument("--url", help="Local server endpoint instead of the in-process engine")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="threads")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent users (closed) / max in flight (open)")
+    parser.add_argument("--rate", type=float, default=20.0, help="Arrivals per second (open loop)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds between a user's messages")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    parser.add_argument("--drain", type=float, default=5.0, help="Open loop: seconds to let the backlog finish")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes (processes backend)")
+    parser.add_argument("--budget", type=float, help="Seconds per chatbot turn (in-process target; default: no deadline)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write all summaries to this file")
+    args = parser.parse_args(argv)
+
+    base = {
+        "url": args.url,
+        "backend": args.backend,
+        "mode": args.mode,
+        "users": args.users,
+        "rate": args.rate,
+        "think_time": args.think_time,
+        "duration": args.duration,
+        "drain": args.drain,
+        "workers": args.workers,
+        "seed": args.seed,
+        "budget": args.budget,
+        "session_offset": 0
+    }
+
+    results = {}
+    if args.sizes and not args.url:
+        from synthetic_kb import generate_synthetic_kb
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for size in (int(s) for s in args.sizes.split(",")):
+                kb = generate_synthetic_kb(size, os.path.join(tmp, f"kb-{size}.ttl"), args.seed)
+                label = f"{size} movies, {args.backend}/{args.mode}, {args.users} users"
+                results[label] = run_load_test({**base, "kb": kb})
+                print_summary(label, results[label])
+    else:
+        label = f"{args.url or args.kb}, {args.backend}/{args.mode}, {args.users} users"
+        results[label] = run_load_test({**base, "kb": args.kb})
+        print_summary(label, results[label])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📄 Results written to: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
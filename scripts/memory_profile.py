@@ -0,0 +1,217 @@
+"""
+MEMORY PROFILE
+
+Memory footprint of the recommender stack per KB size, with budgets.
+
+Each KB is profiled in a fresh process (so peak RSS is its own) under
+tracemalloc. Reported components, as retained bytes (traced memory that
+stays allocated after the step, with garbage collected):
+- kb_build:   an rdflib Graph of the whole KB, as generate_kb holds while writing
+- graph:      SPARQLRecommender (base + derived graph, movie id maps), in the
+              --store it serves from
+- indexes:    FacetIndex (director / actor / year postings)
+- caches:     warmed per-KB-version caches (emotion candidates, overall
+              ranking, title index)
+- session:    one EmotionChatbot conversation after --turns messages
+
+Sizes are also shown per movie (session: per conversation). Budgets are
+fixed bytes plus bytes per movie; a component over budget (BUDGETS, or a
+--budgets JSON with the same shape) makes the run exit non-zero, for use
+as a regression gate.
+
+Usage:
+    python memory_profile.py --sizes 100,1000,5000
+    python memory_profile.py --kb ../movie-emotions.ttl --top 10
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+
+# Budgets per component: fixed bytes (parser grammar, ontology, empty
+# structures) plus bytes per movie in the KB. session is per conversation;
+# it grows with the catalog because a conversation's cursor keeps its ranking heap.
+BUDGETS = {
+    "kb_build": {"fixed": 1_500_000, "per_movie": 45_000},
+    "graph": {"fixed": 5_000_000, "per_movie": 45_000},
+    "indexes": {"fixed": 50_000, "per_movie": 1_000},
+    "caches": {"fixed": 200_000, "per_movie": 5_000},
+    "session": {"fixed": 100_000, "per_movie": 600},
+}
+
+
+def _traced() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _peak_rss() -> int:
+    """Peak resident set size of this process (VmHWM), in bytes."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def profile_kb(ttl_path: str, sessions: int = 10, turns: int = 10, top: int = 0, store: str = "memory") -> Dict:
+    """Measure retained bytes per component for one KB (call in a fresh process)."""
+    from rdflib import Graph
+    from chatbot import EmotionChatbot
+    from load_test import make_utterance
+    from recommendation_engine import RecommendationEngine
+
+    tracemalloc.start()
+    sizes = {}
+
+    # ---- KB build: one full output graph ----
+    start = _traced()
+    graph = Graph()
+    graph.parse(ttl_path, format="turtle")
+    sizes["kb_build"] = _traced() - start
+    del graph
+
+    # ---- Engine: graph + indexes ----
+    start = _traced()
+    before = tracemalloc.take_snapshot() if top else None
+    engine = RecommendationEngine(ttl_path, store)
+    engine_total = _traced() - start
+    movies = len(engine.recommender.movie_ids)
+
+    # ---- Caches (filled lazily by real traffic; warmed for every emotion here) ----
+    start = _traced()
+    for emotion in engine.emotion_list:
+        engine._emotion_candidates(emotion)
+    engine._overall_ranking()
+    engine._title_index()
+    sizes["caches"] = _traced() - start
+
+    allocation_sites = []
+    if top:
+        after = tracemalloc.take_snapshot()
+        for stat in after.compare_to(before, "lineno")[:top]:
+            allocation_sites.append({"site": str(stat.traceback), "bytes": stat.size_diff})
+
+    # ---- Per-session state ----
+    rng = random.Random(0)
+    start = _traced()
+    chatbots = [EmotionChatbot(ttl_path, engine=engine) for _ in range(sessions)]
+    for chatbot in chatbots:
+        for _ in range(turns):
+            chatbot.handle_user_input(make_utterance(rng))
+    sizes["session"] = (_traced() - start) // max(1, sessions)
+    del chatbots
+
+    # ---- Retained size of the indexes = what is freed when they are dropped ----
+    start = _traced()
+    engine.facets = None
+    sizes["indexes"] = start - _traced()
+    sizes["graph"] = engine_total - sizes["indexes"]
+
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_unit = {
+        name: round(size / (1 if name == "session" else max(1, movies)))
+        for name, size in sizes.items()
+    }
+    return {
+        "movies": movies,
+        "bytes": sizes,
+        "per_unit": per_unit,
+        "peak_traced_bytes": peak_traced,
+        "peak_rss_bytes": _peak_rss(),
+        "allocation_sites": allocation_sites
+    }
+
+
+def profile_in_subprocess(ttl_path: str, **kwargs) -> Dict:
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(profile_kb, ttl_path, **kwargs).result()
+
+
+def check_budgets(result: Dict, budgets: Dict[str, Dict]) -> List[str]:
+    """Human-readable violations (empty if within budget)."""
+    violations = []
+    for name, budget in budgets.items():
+        if name not in result["bytes"]:
+            continue
+        limit = budget.get("fixed", 0) + budget.get("per_movie", 0) * result["movies"]
+        if result["bytes"][name] > limit:
+            violations.append(f"{name}: {result['bytes'][name]:,} B > budget {limit:,} B")
+    return violations
+
+
+def print_result(label: str, result: Dict, violations: List[str]):
+    print(f"\n🧠 {label} ({result['movies']} movies)")
+    for name, size in result["bytes"].items():
+        unit = "session" if name == "session" else "movie"
+        print(f"   ➤ {name:<9} {size / 1e6:9.2f} MB  {result['per_unit'][name]:>10,} B/{unit}")
+    print(f"   ➤ peak traced {result['peak_traced_bytes'] / 1e6:.1f} MB | peak RSS {result['peak_rss_bytes'] / 1e6:.1f} MB")
+    for site in result["allocation_sites"]:
+        print(f"      {site['bytes'] / 1e6:8.2f} MB  {site['site']}")
+    for violation in violations:
+        print(f"   ❌ Over budget: {violation}")
+    if not violations:
+        print("   ✅ Within budget")
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Profile recommender memory per KB size.")
+    parser.add_argument("--kb", help="Profile this TTL knowledge base")
+    parser.add_argument("--sizes", default="100,1000", help="Comma-separated synthetic KB sizes")
+    parser.add_argument("--sessions", type=int, default=10, help="Conversations to average session size over")
+    parser.add_argument("--turns", type=int, default=10, help="Messages per conversation")
+    parser.add_argument("--store", choices=["memory", "compact", "shared"], default="memory",
+                        help="Triple store the engine serves from (shared: memory-mapped index, see shared_index.py)")
+    parser.add_argument("--top", type=int, default=0, help="Show the top N allocation sites of engine + caches")
+    parser.add_argument("--budgets", help="JSON file overriding BUDGETS")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    budgets = dict(BUDGETS)
+    if args.budgets:
+        with open(args.budgets, "r", encoding="utf-8") as f:
+            budgets.update(json.load(f))
+
+    options = {"sessions": args.sessions, "turns": args.turns, "top": args.top, "store": args.store}
+    results = {}
+
+    if args.kb:
+        results[args.kb] = profile_in_subprocess(args.kb, **options)
+    else:
+        from synthetic_kb import generate_synthetic_kb
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for size in (int(s) for s in args.sizes.split(",")):
+                path = generate_synthetic_kb(size, os.path.join(tmp, f"kb-{size}.ttl"))
+                results[f"synthetic-{size}"] = profile_in_subprocess(path, **options)
+
+    failed = False
+    for label, result in results.items():
+        result["violations"] = check_budgets(result, budgets)
+        failed = failed or bool(result["violations"])
+        print_result(label, result, result["violations"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"budgets": budgets, "results": results}, f, indent=2)
+        print(f"\n📄 Results written to: {args.json}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
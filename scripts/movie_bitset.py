@@ -0,0 +1,51 @@
+"""
+MOVIE BITSET
+
+Compact set of internal movie ids (see SPARQLRecommender.movie_index).
+One bit per movie in the catalog, so membership is O(1) and a session's
+exclusion mask costs catalog_size / 8 bytes regardless of history size.
+"""
+
+from typing import Iterable, Iterator
+
+
+class MovieBitset:
+    """Growable bitset over non-negative integer ids."""
+
+    def __init__(self, size: int = 0, ids: Iterable[int] = ()):
+        self.bits = bytearray((size + 7) // 8)
+        self.count = 0
+        for i in ids:
+            self.add(i)
+
+    def add(self, i: int):
+        byte, mask = i >> 3, 1 << (i & 7)
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        if not self.bits[byte] & mask:
+            self.bits[byte] |= mask
+            self.count += 1
+
+    def discard(self, i: int):
+        byte, mask = i >> 3, 1 << (i & 7)
+        if byte < len(self.bits) and self.bits[byte] & mask:
+            self.bits[byte] &= ~mask
+            self.count -= 1
+
+    def clear(self):
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
+
+    def __contains__(self, i) -> bool:
+        byte = i >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << (i & 7)))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[int]:
+        for byte, value in enumerate(self.bits):
+            while value:
+                low = value & -value
+                yield (byte << 3) + low.bit_length() - 1
+                value ^= low
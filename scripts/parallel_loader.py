@@ -0,0 +1,168 @@
+"""
+PARALLEL LOADER
+
+Parses a knowledge base on several cores.
+
+rdflib parses a file on one core. Line-oriented N-Triples, and Turtle as
+rdflib and generate_kb write it (prefix header, then one block per subject,
+blocks separated by blank lines), can be cut into byte ranges at those
+boundaries instead. Each range is parsed in a worker process (Turtle ranges
+get the prefix header prepended) into a CompactStore batch, i.e. its own
+term list plus an int32 triple array, which pickles far smaller than rdflib
+triples. The batches are merged, in file order, into one CompactStore (or
+a Memory graph for code that edits the KB).
+
+Files that cannot be cut safely (labelled blank nodes, long string literals
+that may contain blank lines, prefixes declared after the header) and
+files below MIN_PARALLEL_BYTES are parsed serially.
+
+Usage:
+    python parallel_loader.py path/to/kb.ttl [--workers 4] [--store compact]
+"""
+
+import argparse
+import multiprocessing
+import os
+import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from rdflib import Graph
+from compact_store import CompactStore
+
+
+# Below this size, worker start-up costs more than parsing
+MIN_PARALLEL_BYTES = 4 << 20
+
+# Ranges per worker (more, smaller ranges even out uneven blocks)
+CHUNKS_PER_WORKER = 2
+
+HEADER_PREFIXES = (b"@prefix", b"@base", b"PREFIX", b"BASE", b"#")
+
+# Turtle constructs that tie blocks together or may hide a blank line
+UNSAFE_MARKERS = (b"_:", b'"""', b"'''")
+
+
+def rdf_format(path: str) -> str:
+    return "nt" if path.endswith(".nt") else "turtle"
+
+
+def split_ranges(path: str, parts: int, format: str = "turtle") -> Optional[Tuple[bytes, List[Tuple[int, int]]]]:
+    """
+    (header, [(start, end), ...]) byte ranges cut at statement boundaries,
+    or None if the file cannot be cut safely.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if format == "nt":
+        header, body_start, boundary = b"", 0, b"\n"
+    else:
+        if any(marker in data for marker in UNSAFE_MARKERS):
+            return None
+        body_start = 0
+        for line in data.splitlines(keepends=True):
+            if line.strip() and not line.lstrip().startswith(HEADER_PREFIXES):
+                break
+            body_start += len(line)
+        header, boundary = data[:body_start], b"\n\n"
+        if b"@prefix" in data[body_start:] or b"PREFIX" in data[body_start:]:
+            return None
+
+    ranges = []
+    start = body_start
+    size = max(1, (len(data) - body_start) // max(1, parts))
+    while start < len(data):
+        cut = data.find(boundary, start + size)
+        end = len(data) if cut == -1 else cut + len(boundary)
+        ranges.append((start, end))
+        start = end
+
+    return header, ranges
+
+
+def _parse_range(path: str, header: bytes, start: int, end: int, format: str):
+    """Worker: parse one byte range into a CompactStore batch."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = header + f.read(end - start)
+
+    store = CompactStore()
+    Graph(store=store).parse(data=data.decode("utf-8"), format=format, publicID=pathlib.Path(path).absolute().as_uri())
+    return store.batch()
+
+
+def load_graph_parallel(
+    path: str,
+    workers: Optional[int] = None,
+    store: str = "compact",
+    format: Optional[str] = None
+) -> Graph:
+    """
+    Parse path across a process pool into a frozen CompactStore graph
+    (store "compact") or an rdflib Memory graph (store "memory").
+
+    workers None = one per CPU.
+    """
+    format = format or rdf_format(path)
+    workers = workers or os.cpu_count() or 1
+
+    split = None
+    if workers > 1 and os.path.getsize(path) >= MIN_PARALLEL_BYTES:
+        split = split_ranges(path, workers * CHUNKS_PER_WORKER, format)
+
+    if split is None:
+        return _load_serial(path, store, format)
+
+    header, ranges = split
+    merged = CompactStore()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=context) as pool:
+        futures = [pool.submit(_parse_range, path, header, start, end, format) for start, end in ranges]
+        # Merge in file order so term ids do not depend on worker timing
+        for future in futures:
+            merged.add_batch(*future.result())
+
+    if store == "compact":
+        graph = Graph(store=merged.freeze())
+    else:
+        graph = Graph()
+        terms, triples = merged.batch()
+        graph.addN((terms[s], terms[p], terms[o], graph) for s, p, o in triples.tolist())
+
+    for prefix, namespace in Graph().parse(data=header.decode("utf-8"), format=format).namespaces():
+        graph.bind(prefix, namespace, override=False)
+    return graph
+
+
+def _load_serial(path: str, store: str, format: str) -> Graph:
+    if store == "compact":
+        graph = Graph(store=CompactStore())
+        graph.parse(path, format=format)
+        graph.store.freeze()
+        return graph
+    graph = Graph()
+    graph.parse(path, format=format)
+    return graph
+
+
+# ===== BENCHMARK =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse a KB serially and in parallel.")
+    parser.add_argument("path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--store", choices=["memory", "compact"], default="compact")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    serial = _load_serial(args.path, args.store, rdf_format(args.path))
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel = load_graph_parallel(args.path, args.workers, args.store)
+    parallel_time = time.perf_counter() - start
+
+    print(f"📊 {len(serial)} triples serial in {serial_time:.2f}s, "
+          f"{len(parallel)} with {args.workers} workers in {parallel_time:.2f}s "
+          f"({serial_time / parallel_time:.2f}x)")
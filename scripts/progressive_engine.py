@@ -0,0 +1,266 @@
+"""
+PROGRESSIVE ENGINE
+
+Two-tier startup: answer right away from the warm-start table
+(movie-emotions.warm.json, see answer_table.py) while the full
+RecommendationEngine (graph, facet / title indexes, similarity graph)
+loads in a background thread.
+
+- "precomputed" tier: the head (top WARM_TOP_K) of every emotion and
+  neutral ranking, with exclusion and paging. Launch reads only that small
+  file and stats the TTL, so an instance serves within about a second
+  whatever the catalog size.
+- "full" tier: everything else. Requests the precomputed tier cannot answer
+  (facets, "something like X", title lookup, pages past the head,
+  explanations, any other engine method) wait for the load to finish
+  instead of failing.
+
+The warm table records the KB version it was built from. The background
+thread hashes the KB (compute_kb_version) before loading it; if the
+versions differ, the warm table is dropped and requests wait for the full
+KB. A changed TTL size is caught at launch already.
+
+The loaded engine takes over with one attribute swap; `tier` / `ready`
+tell clients which tier served them. Rankings are the same on both tiers,
+so a cursor opened on the precomputed tier keeps paging after the swap.
+
+Without a warm table (or with one for another KB size) the full KB is
+loaded before serving, as RecommendationEngine does.
+
+Usage:
+    python progressive_engine.py [path/to/movie-emotions.ttl]
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+from answer_table import AnswerTable, WarmTable, warm_path
+from facet_index import FacetIndex
+from movie_bitset import MovieBitset
+from recommendation_engine import RecommendationEngine, RecommendationCursor, DESIRED_INTENSITY
+from sparql_recommender import compute_kb_version
+
+
+TIER_PRECOMPUTED = "precomputed"
+TIER_FULL = "full"
+
+
+class ProgressiveEngine:
+    """RecommendationEngine-compatible front that serves while the KB loads."""
+
+    def __init__(self, ttl_path: str, store: str = "memory", workers: Optional[int] = 1):
+        """Start serving from the warm table; the full engine loads in the background."""
+        self.ttl_path = ttl_path
+        self.store = store
+        self.workers = workers
+        self.emotion_list = ["joy", "sadness", "fear", "anger", "disgust", "surprise", "trust"]
+        self._engine = None
+        self._error = None
+        self._loaded = threading.Event()
+
+        self.warm = WarmTable.load(warm_path(ttl_path))
+        if self.warm is not None and self.warm.kb_size != os.path.getsize(ttl_path):
+            print(f"♻️  Ignoring stale warm-start table {warm_path(ttl_path)} (rebuild with answer_table.py)")
+            self.warm = None
+
+        if self.warm is None:
+            print("♻️  No current warm-start table, loading the full KB before serving")
+            self._load_full()
+            if self._error is not None:
+                raise self._error
+            return
+
+        self._warm_keys = {movie[0]: key for movie, key in zip(self.warm.movies, self.warm.keys)}
+        self._warm_movies = [
+            {'movie_id': movie_id, 'title': title, 'director': director, 'cast': cast}
+            for movie_id, title, director, cast in self.warm.movies
+        ]
+        print(f"[OK] Serving the top {len(self.warm.movies)} precomputed movies while the KB loads")
+
+        threading.Thread(target=self._load_full, name="kb-loader", daemon=True).start()
+
+    def _load_full(self):
+        start = time.perf_counter()
+        try:
+            # The warm table's recorded version is only trusted until the KB is hashed
+            if self.warm is not None and compute_kb_version(self.ttl_path) != self.warm.kb_version:
+                print("♻️  Warm-start table is stale; waiting for the full KB")
+                self.warm = None
+            engine = RecommendationEngine(self.ttl_path, self.store, self.workers)
+        except Exception as exc:
+            self._error = exc
+            print(f"❌ Loading the full KB failed: {exc}")
+        else:
+            self._engine = engine
+            print(f"[OK] Full KB ready ({time.perf_counter() - start:.1f}s)")
+        finally:
+            self._loaded.set()
+
+    # ---------- Readiness ----------
+
+    @property
+    def ready(self) -> bool:
+        """Whether the full engine is serving."""
+        return self._engine is not None
+
+    @property
+    def tier(self) -> str:
+        """Tier serving requests right now ("precomputed" or "full")."""
+        return TIER_FULL if self._engine is not None else TIER_PRECOMPUTED
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the full engine is serving (or timeout); returns ready."""
+        self._loaded.wait(timeout)
+        return self.ready
+
+    def _full(self) -> RecommendationEngine:
+        """The full engine, waiting for it to load if needed."""
+        self._loaded.wait()
+        if self._engine is None:
+            raise self._error
+        return self._engine
+
+    def _warm(self) -> Optional[WarmTable]:
+        """The warm table while it is what serves (None once loaded or found stale)."""
+        return self.warm if self._engine is None else None
+
+    def __getattr__(self, name: str):
+        # Anything the precomputed tier does not serve is the full engine's
+        if name.startswith('__') or name in ('_engine', '_error', '_loaded', 'warm'):
+            raise AttributeError(name)
+        return getattr(self._full(), name)
+
+    # ---------- Served on both tiers ----------
+
+    @property
+    def kb_version(self) -> str:
+        warm = self._warm()
+        if warm is None:
+            return self._full().kb_version
+        return warm.kb_version
+
+    @property
+    def answers(self) -> Optional[AnswerTable]:
+        """Precomputed rankings: the full engine's table once loaded, the warm heads before."""
+        warm = self._warm()
+        if warm is None:
+            return self._full().answers
+        return warm
+
+    def people_lookup(self) -> Dict[str, Dict[str, str]]:
+        """Director/actor vocabulary (of the warm movies only until the KB is loaded)."""
+        warm = self._warm()
+        if warm is None:
+            return self._full().people_lookup()
+        return FacetIndex(self._warm_movies, self._warm_keys).people_lookup()
+
+    def movie_key(self, movie_id: str) -> Optional[int]:
+        warm = self._warm()
+        if warm is not None and movie_id in self._warm_keys:
+            return self._warm_keys[movie_id]
+        return self._full().movie_key(movie_id)
+
+    def new_exclusion_set(self) -> MovieBitset:
+        warm = self._warm()
+        if warm is None:
+            return self._full().new_exclusion_set()
+        return MovieBitset(warm.catalog_size)
+
+    def _is_excluded(self, movie: Dict, exclude: Optional[MovieBitset]) -> bool:
+        if not exclude:
+            return False
+        key = self.movie_key(movie['movie_id'])
+        return key is not None and key in exclude
+
+    def open_cursor(self, emotion_state: Dict, exclude: Optional[MovieBitset] = None) -> RecommendationCursor:
+        return RecommendationCursor(self, emotion_state, exclude)
+
+    def iter_recommendations(
+        self,
+        emotion_state: Dict,
+        num_results: Optional[int] = 10,
+        exclude: Optional[MovieBitset] = None
+    ) -> Iterator[Dict]:
+        """
+        RecommendationEngine.iter_recommendations, from the warm table until the KB is loaded.
+
+        A page running past a ranking's stored head continues on the full
+        tier (waiting for it), after the movies already yielded.
+        """
+        warm = self._warm()
+        head = self._warm_ranking(warm, emotion_state) if warm is not None else None
+        if head is None:
+            yield from self._full().iter_recommendations(emotion_state, num_results, exclude)
+            return
+
+        ranked, truncated = head
+        yielded = set()
+        for movie in ranked:
+            if num_results is not None and len(yielded) >= num_results:
+                return
+            if self._is_excluded(movie, exclude):
+                continue
+            yielded.add(movie['movie_id'])
+            yield movie
+
+        if not truncated:
+            return
+        remaining = None if num_results is None else num_results - len(yielded)
+        for movie in self._full().iter_recommendations(emotion_state, None, exclude):
+            if remaining is not None and remaining <= 0:
+                return
+            if movie['movie_id'] in yielded:
+                continue
+            if remaining is not None:
+                remaining -= 1
+            yield movie
+
+    def _warm_ranking(self, warm: WarmTable, emotion_state: Dict) -> Optional[Tuple[Iterator[Dict], bool]]:
+        """(head of the precomputed ranking, whether it is truncated) for an emotion state, or None if it needs the full KB."""
+        facets = emotion_state.get('facets') or {}
+        if any(value is not None for value in facets.values()):
+            return None
+
+        query_type = emotion_state['query_type']
+        emotion = emotion_state['emotion']
+        if query_type == 'similar' and emotion_state.get('similar_to'):
+            return None
+
+        if query_type not in ('current_state', 'desired_state') or emotion not in self.emotion_list:
+            return warm.ranking(), warm.truncated()
+
+        target = emotion_state['intensity'] if query_type == 'current_state' else DESIRED_INTENSITY
+        ranked = warm.ranking(emotion, target)
+        if ranked is None:
+            return None
+        return self._scored(ranked, target), warm.truncated(emotion, target)
+
+    @staticmethod
+    def _scored(ranked: Iterator[Dict], target: float) -> Iterator[Dict]:
+        for movie in ranked:
+            RecommendationEngine._score_movie(movie, target)
+            yield movie
+
+
+# ===== TEST =====
+if __name__ == "__main__":
+    from emotion_state_parser import parse_emotion
+
+    ttl_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "movie-emotions.ttl")
+
+    if os.path.exists(ttl_path):
+        start = time.perf_counter()
+        engine = ProgressiveEngine(ttl_path)
+        state = parse_emotion("I feel so sad")
+        first = list(engine.iter_recommendations(state, 5))
+        print(f"📊 First answer after {time.perf_counter() - start:.2f}s from the {engine.tier} tier")
+
+        engine.wait_ready()
+        again = list(engine.iter_recommendations(state, 5))
+        print(f"📊 Full tier ready after {time.perf_counter() - start:.2f}s; same ranking: "
+              f"{[m['movie_id'] for m in first] == [m['movie_id'] for m in again]}")
+    else:
+        print(f"❌ TTL file not found at {ttl_path}")
@@ -5,24 +5,118 @@ Core logic that orchestrates emotion parsing, SPARQL queries, and movie ranking.
 Provides recommendations based on user emotional state.
 """
 
-from sparql_recommender import SPARQLRecommender
-from typing import List, Dict, Optional
+from sparql_recommender import SPARQLRecommender, compute_kb_version, kb_file_stamp
+from movie_bitset import MovieBitset
+from facet_index import FacetIndex
+from title_index import TitleIndex
+from answer_table import AnswerTable, answers_path
+from similarity_graph import SimilarityGraph, similarity_path, EMOTION_WEIGHT, DIRECTOR_WEIGHT, CAST_WEIGHT
+from shared_index import SharedRecommender
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import heapq
 import os
+import numpy as np
+
+
+# Weights of the blended score used by _score_by_intensity_match
+INTENSITY_WEIGHT = 0.6
+CONFIDENCE_WEIGHT = 0.4
+
+# Target intensity for desired-state queries (prefer an emotional boost)
+DESIRED_INTENSITY = 0.8
+
+# Max memoized explanations per engine
+EXPLANATION_CACHE_SIZE = 1024
 
 
 class RecommendationEngine:
     """Orchestrate movie recommendations based on user emotions."""
     
-    def __init__(self, ttl_path: str):
-        """Initialize with TTL knowledge base path."""
-        self.recommender = SPARQLRecommender(ttl_path)
+    def __init__(self, ttl_path: str, store: str = "memory", workers: Optional[int] = 1):
+        """
+        Initialize with TTL knowledge base path (store, workers: see SPARQLRecommender).
+        
+        store "shared" reads the memory-mapped index every worker process on
+        the host shares (shared_index.py) instead of loading its own graph.
+        """
+        self.ttl_path = ttl_path
+        self.store = store
+        self.workers = workers
         self.emotion_list = ["joy", "sadness", "fear", "anger", "disgust", "surprise", "trust"]
+        self._explanations = OrderedDict()
+        self._candidates = {}
+        # Taken before loading, so a write during the load is seen by the next reload
+        self._kb_stamp = kb_file_stamp(ttl_path)
+        self.recommender, self.facets, self.answers, self.similarity = self._load()
+    
+    def _load(self) -> Tuple[SPARQLRecommender, FacetIndex, Optional[AnswerTable], Optional[SimilarityGraph]]:
+        """Load the KB graph and everything built from it."""
+        if self.store == "shared":
+            recommender = SharedRecommender.open(self.ttl_path)
+        else:
+            recommender = SPARQLRecommender(self.ttl_path, self.store, self.workers)
+        
+        # Inverted director/actor/year indexes for faceted filtering
+        facets = FacetIndex(recommender.get_movie_metadata(), recommender.movie_index)
+        
+        # Rankings precomputed at KB build time (answer_table.py), if current
+        answers = AnswerTable.load(answers_path(self.ttl_path), recommender.kb_version)
+        if answers is not None:
+            print(f"[OK] Loaded {len(answers.answers)} precomputed rankings")
+        
+        # Top-M neighbours per movie (similarity_graph.py), if current
+        similarity = SimilarityGraph.load(similarity_path(self.ttl_path), recommender.kb_version)
+        
+        return recommender, facets, answers, similarity
+    
+    def reload(self) -> bool:
+        """
+        Hot-reload the KB if its files changed; returns whether a new version was loaded.
+        
+        The new version is loaded (in parallel if workers > 1) while requests
+        are still served from the old one, then swapped in. Open cursors see
+        the change through RecommendationCursor.is_current.
+        
+        Polling is cheap: the files are only hashed when their size or
+        modification time changed.
+        """
+        stamp = kb_file_stamp(self.ttl_path)
+        if stamp == self._kb_stamp:
+            return False
+        if compute_kb_version(self.ttl_path) == self.recommender.kb_version:
+            # Touched, same content
+            self._kb_stamp = stamp
+            return False
+        
+        recommender, facets, answers, similarity = self._load()
+        self.facets, self.answers, self.similarity, self.recommender = facets, answers, similarity, recommender
+        self._kb_stamp = stamp
+        
+        # Caches are keyed by KB version; drop the old version's
+        self._candidates = {key: value for key, value in self._candidates.items() if key[0] == recommender.kb_version}
+        return True
+    
+    @property
+    def kb_version(self) -> str:
+        """Version (content hash) of the KB being served."""
+        return self.recommender.kb_version
+    
+    # Always fully loaded (see progressive_engine.ProgressiveEngine)
+    ready = True
+    tier = "full"
+    
+    def people_lookup(self) -> Dict[str, Dict[str, str]]:
+        """Director/actor name vocabulary for emotion_state_parser.extract_facets."""
+        return self.facets.people_lookup()
     
     def recommend_current_state(
         self,
         user_emotion: str,
         user_intensity: float = 0.5,
-        num_results: int = 10
+        num_results: int = 10,
+        exclude: Optional[MovieBitset] = None
     ) -> List[Dict]:
         """
         User feels X emotion → recommend movies that evoke the same emotion.
@@ -32,22 +126,15 @@ class RecommendationEngine:
         if user_emotion.lower() not in self.emotion_list:
             return []
         
-        movies = self.recommender.get_movies_by_emotion(
-            emotion=user_emotion.lower(),
-            intensity_threshold=0.0,
-            limit=num_results * 2  # Get extra to rank
-        )
-        
         # Score by similarity to user intensity
-        scored_movies = self._score_by_intensity_match(movies, user_intensity)
-        
-        return scored_movies[:num_results]
+        return list(self._iter_by_emotion(user_emotion.lower(), user_intensity, num_results, exclude))
     
     def recommend_desired_state(
         self,
         desired_emotion: str,
         current_emotion: Optional[str] = None,
-        num_results: int = 10
+        num_results: int = 10,
+        exclude: Optional[MovieBitset] = None
     ) -> List[Dict]:
         """
         User wants to feel Y emotion → recommend movies that evoke it.
@@ -57,25 +144,79 @@ class RecommendationEngine:
         if desired_emotion.lower() not in self.emotion_list:
             return []
         
-        movies = self.recommender.get_movies_by_emotion(
-            emotion=desired_emotion.lower(),
-            intensity_threshold=0.0,
+        # Prefer high intensity if going for emotional boost
+        return list(self._iter_by_emotion(desired_emotion.lower(), DESIRED_INTENSITY, num_results, exclude))
+    
+    def recommend_neutral(
+        self,
+        num_results: Optional[int] = 10,
+        exclude: Optional[MovieBitset] = None,
+        allowed: Optional[Set[int]] = None
+    ) -> List[Dict]:
+        """
+        Random recommendation → suggest popular movies.
+        
+        Best for: "Surprise me" → get top-rated movies (num_results None = all)
+        """
+        if allowed is not None:
+            # Rank only the facet matches, by their position in the overall ranking
+            ranking, positions = self._overall_ranking()
+            movies = [ranking[positions[key]] for key in sorted(allowed & positions.keys(), key=positions.get)]
+        else:
+            movies = self._precomputed()
+            if movies is None and not exclude:
+                return self.recommender.get_top_movies_overall(limit=num_results)
+            if movies is None:
+                # Scan the full ranking so exactly num_results unexcluded movies come back
+                movies = self.recommender.get_top_movies_overall(limit=None)
+        
+        unexcluded = (dict(movie) for movie in movies if not self._is_excluded(movie, exclude))
+        return list(islice(unexcluded, num_results))
+    
+    def recommend_by_category(
+        self,
+        category: str,
+        num_results: int = 10
+    ) -> List[Dict]:
+        """
+        Recommend movies by an inferred category (rule_engine.py).
+        
+        Best for: "something cathartic" → sad movies with intensity > 0.8
+        """
+        movies = self.recommender.get_movies_by_category(
+            category.lower(),
             limit=num_results * 2
         )
         
-        # Prefer high intensity if going for emotional boost
-        scored_movies = self._score_by_intensity_match(movies, intensity=0.8)
+        scored_movies = self._score_by_intensity_match(movies, intensity=1.0)
         
         return scored_movies[:num_results]
     
-    def recommend_neutral(self, num_results: int = 10) -> List[Dict]:
+    def resolve_title(self, text: str, limit: int = 5) -> List[Dict]:
         """
-        Random recommendation → suggest popular movies.
+        Fuzzy-match free text to catalog titles, best first.
         
-        Best for: "Surprise me" → get top-rated movies
+        Returns: List of {movie_id, title, distance} (distance = edit distance)
         """
-        movies = self.recommender.get_top_movies_overall(limit=num_results)
-        return movies
+        return self._title_index().lookup(text, limit)
+    
+    def recommend_similar(
+        self,
+        movie_id: str,
+        num_results: int = 10,
+        exclude: Optional[MovieBitset] = None,
+        allowed: Optional[Set[int]] = None
+    ) -> List[Dict]:
+        """
+        Recommend movies similar to a given movie ("because you liked X").
+        
+        Reads the movie's precomputed neighbours (emotions, director, cast;
+        see similarity_graph.py) in O(M); without a current similarity graph,
+        or with facets, ranks movies sharing its emotions live.
+        
+        Best for: "something like Vertigo" (after resolve_title)
+        """
+        return list(self._iter_similar(movie_id, num_results, exclude, allowed))
     
     def recommend_emotion_journey(
         self,
@@ -109,6 +250,375 @@ class RecommendationEngine:
         
         return journey
     
+    def iter_recommendations(
+        self,
+        emotion_state: Dict,
+        num_results: Optional[int] = 10,
+        exclude: Optional[MovieBitset] = None
+    ) -> Iterator[Dict]:
+        """
+        Yield recommendations for a parsed emotion state one at a time, in rank order.
+        
+        Candidates are scored once and heapified; each movie is yielded as soon
+        as it is popped, i.e. as soon as its position in the top-k is final.
+        Produces the same ranking as the matching recommend_* method.
+        num_results None yields the whole ranking lazily (see open_cursor).
+        """
+        query_type = emotion_state['query_type']
+        emotion = emotion_state['emotion']
+        allowed = self.filter_movies(**(emotion_state.get('facets') or {}))
+        
+        if query_type == 'similar' and emotion_state.get('similar_to'):
+            similar_to = emotion_state['similar_to']
+            yield from self._iter_similar(similar_to['movie_id'], num_results, exclude, allowed, similar_to.get('profile'))
+            return
+        
+        if query_type not in ('current_state', 'desired_state') or emotion not in self.emotion_list:
+            yield from self.recommend_neutral(num_results=num_results, exclude=exclude, allowed=allowed)
+            return
+        
+        target = emotion_state['intensity'] if query_type == 'current_state' else DESIRED_INTENSITY
+        yield from self._iter_by_emotion(emotion, target, num_results, exclude, allowed)
+    
+    def recommend_batch(
+        self,
+        states: List[Dict],
+        num_results: int = 10,
+        excludes: Optional[List[Optional[MovieBitset]]] = None
+    ) -> List[List[Dict]]:
+        """
+        Top-k lists for many parsed emotion states at once (offline campaigns).
+        
+        Requests are grouped by emotion; each distinct target intensity is
+        scored against the emotion's candidates once, as one NumPy matrix,
+        and ranked once. Every request in the group then only skips its own
+        excluded movies. Neutral requests share one overall ranking. Facet and
+        "similar" requests are answered one by one (iter_recommendations).
+        
+        Returns, per state (aligned with states), the same list
+        iter_recommendations(state, num_results, exclude) yields.
+        """
+        excludes = excludes or [None] * len(states)
+        results = [None] * len(states)
+        groups = {}
+        
+        for i, state in enumerate(states):
+            query_type = state['query_type']
+            emotion = state['emotion']
+            if self.filter_movies(**(state.get('facets') or {})) is not None or (
+                query_type == 'similar' and state.get('similar_to')
+            ):
+                results[i] = list(self.iter_recommendations(state, num_results, excludes[i]))
+            elif query_type in ('current_state', 'desired_state') and emotion in self.emotion_list:
+                target = state['intensity'] if query_type == 'current_state' else DESIRED_INTENSITY
+                groups.setdefault(emotion, {}).setdefault(float(target), []).append(i)
+            else:
+                groups.setdefault(None, {}).setdefault(None, []).append(i)
+        
+        for emotion, by_target in groups.items():
+            if emotion is None:
+                keys, ranking = self._batch_neutral()
+                members = by_target[None]
+                head = self._ranked_head(np.arange(len(ranking)), keys, ranking, None, num_results, [excludes[i] for i in members])
+                for i in members:
+                    results[i] = self._take_ranked(head, num_results, excludes[i])
+                continue
+            
+            keys, intensity, confidence, rows = self._batch_candidates(emotion)
+            targets = np.array(list(by_target), dtype=np.float64)
+            
+            # Same arithmetic as _score_movie, for every (target, candidate) pair
+            scores = (1.0 - np.abs(intensity[None, :] - targets[:, None])) * INTENSITY_WEIGHT + confidence[None, :] * CONFIDENCE_WEIGHT
+            
+            # Stable sort keeps ties in query order, like the (-score, position) heap
+            order = np.argsort(-scores, axis=1, kind="stable")
+            for row, members in enumerate(by_target.values()):
+                # A movie counts once, at its best (first ranked) row
+                _, first = np.unique(keys[order[row]], return_index=True)
+                ranked = order[row][np.sort(first)]
+                head = self._ranked_head(ranked, keys, rows, scores[row], num_results, [excludes[i] for i in members])
+                for i in members:
+                    results[i] = self._take_ranked(head, num_results, excludes[i])
+        
+        return results
+    
+    def _batch_candidates(self, emotion: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Dict]]:
+        """An emotion's candidate rows as (movie keys, intensities, confidences, rows), cached per KB version."""
+        key = (self.recommender.kb_version, 'batch', emotion)
+        if key not in self._candidates:
+            rows = self.recommender.get_movies_by_emotion(emotion=emotion, intensity_threshold=0.0, limit=None)
+            self._candidates[key] = (
+                np.array([self._batch_key(movie, j) for j, movie in enumerate(rows)], dtype=np.int64),
+                np.array([movie['intensity'] for movie in rows], dtype=np.float64),
+                np.array([movie['confidence'] for movie in rows], dtype=np.float64),
+                rows
+            )
+        return self._candidates[key]
+    
+    def _batch_neutral(self) -> Tuple[np.ndarray, List[Dict]]:
+        """The neutral ranking as (movie keys, rows), cached per KB version."""
+        key = (self.recommender.kb_version, 'batch', None)
+        if key not in self._candidates:
+            ranking, _ = self._overall_ranking()
+            self._candidates[key] = (
+                np.array([self._batch_key(movie, j) for j, movie in enumerate(ranking)], dtype=np.int64),
+                ranking
+            )
+        return self._candidates[key]
+    
+    def _batch_key(self, movie: Dict, row: int) -> int:
+        """Internal movie id; rows of movies outside the catalog get distinct negative keys."""
+        key = self.movie_key(movie['movie_id'])
+        return key if key is not None else -(row + 1)
+    
+    def _ranked_head(
+        self,
+        ranked: np.ndarray,
+        keys: np.ndarray,
+        rows: List[Dict],
+        scores: Optional[np.ndarray],
+        num_results: int,
+        excludes: List[Optional[MovieBitset]]
+    ) -> List[Tuple[int, Dict]]:
+        """(key, movie) for the leading movies of a ranking, enough for every request sharing it."""
+        # A request skips at most len(exclude) of the leading movies
+        window = ranked[:num_results + max(len(exclude) if exclude else 0 for exclude in excludes)]
+        head = []
+        for j, key in zip(window.tolist(), keys[window].tolist()):
+            movie = dict(rows[j])
+            if scores is not None:
+                movie['score'] = float(scores[j])
+            head.append((key, movie))
+        return head
+    
+    def _take_ranked(self, head: List[Tuple[int, Dict]], num_results: int, exclude: Optional[MovieBitset]) -> List[Dict]:
+        """First num_results unexcluded movies of a ranking head, as fresh movie dicts."""
+        if not exclude:
+            return [dict(movie) for _, movie in head[:num_results]]
+        unexcluded = (movie for key, movie in head if key < 0 or key not in exclude)
+        return [dict(movie) for movie in islice(unexcluded, num_results)]
+    
+    def filter_movies(
+        self,
+        director: Optional[str] = None,
+        actor: Optional[str] = None,
+        year_range: Optional[Tuple[int, int]] = None
+    ) -> Optional[Set[int]]:
+        """
+        Internal ids of movies matching all given facets (None = no filter).
+        
+        Director/actor match full names or surnames; year_range is inclusive.
+        """
+        return self.facets.match(director=director, actor=actor, year_range=year_range)
+    
+    def recommend_filtered(
+        self,
+        emotion_state: Dict,
+        director: Optional[str] = None,
+        actor: Optional[str] = None,
+        year_range: Optional[Tuple[int, int]] = None,
+        num_results: int = 10,
+        exclude: Optional[MovieBitset] = None
+    ) -> List[Dict]:
+        """
+        Recommend for an emotion state restricted to facet matches.
+        
+        Best for: "a tense Hitchcock film from the 50s"
+        """
+        facets = {'director': director, 'actor': actor, 'year_range': year_range}
+        return list(self.iter_recommendations({**emotion_state, 'facets': facets}, num_results, exclude))
+    
+    def open_cursor(self, emotion_state: Dict, exclude: Optional[MovieBitset] = None) -> 'RecommendationCursor':
+        """Start a resumable ranking for "more recommendations" paging."""
+        return RecommendationCursor(self, emotion_state, exclude)
+    
+    def movie_key(self, movie_id: str) -> Optional[int]:
+        """Internal integer id of a movie, as used by MovieBitset exclusion sets."""
+        return self.recommender.movie_index.get(movie_id)
+    
+    def new_exclusion_set(self) -> MovieBitset:
+        """Empty exclusion set sized for the catalog."""
+        return MovieBitset(len(self.recommender.movie_ids))
+    
+    def _is_excluded(self, movie: Dict, exclude: Optional[MovieBitset]) -> bool:
+        if not exclude:
+            return False
+        key = self.movie_key(movie['movie_id'])
+        return key is not None and key in exclude
+    
+    def _iter_by_emotion(
+        self,
+        emotion: str,
+        target: float,
+        num_results: Optional[int],
+        exclude: Optional[MovieBitset] = None,
+        allowed: Optional[Set[int]] = None
+    ) -> Iterator[Dict]:
+        """Heap top-k over an emotion's candidates, skipping excluded movies while popping."""
+        ranked = self._precomputed(emotion, target) if allowed is None else None
+        if ranked is not None:
+            # Already in rank order with one row per movie: only exclusion is left
+            unexcluded = (movie for movie in ranked if not self._is_excluded(movie, exclude))
+            for movie in islice(unexcluded, num_results):
+                self._score_movie(movie, target)
+                yield movie
+            return
+        
+        if allowed is not None:
+            # Facet matches are intersected with the candidates before scoring,
+            # so filtered queries only touch the matching movies
+            candidates = self._emotion_candidates(emotion)
+            movies = [dict(row) for key in sorted(allowed) for row in candidates.get(key, ())]
+        else:
+            # Scan every candidate (no 2x over-fetch) so exactly num_results movies
+            # come back whenever that many unexcluded ones exist
+            movies = self.recommender.get_movies_by_emotion(
+                emotion=emotion,
+                intensity_threshold=0.0,
+                limit=None
+            )
+        
+        # (-score, position) keeps ties in query order, like the stable sort
+        heap = [(-self._score_movie(movie, target), i, movie) for i, movie in enumerate(movies)]
+        yield from self._pop_ranked(heap, num_results, exclude)
+    
+    def _pop_ranked(
+        self,
+        heap: List[Tuple],
+        num_results: Optional[int],
+        exclude: Optional[MovieBitset] = None
+    ) -> Iterator[Dict]:
+        """Heapify (-score, position, movie) entries and pop them lazily in rank order."""
+        heapq.heapify(heap)
+        
+        # A movie can match through several emotion nodes; only its best one counts
+        returned = MovieBitset(len(self.recommender.movie_ids))
+        while heap and (num_results is None or len(returned) < num_results):
+            movie = heapq.heappop(heap)[2]
+            key = self.movie_key(movie['movie_id'])
+            if self._is_excluded(movie, exclude) or (key is not None and key in returned):
+                continue
+            if key is not None:
+                returned.add(key)
+            yield movie
+    
+    def _iter_similar(
+        self,
+        movie_id: str,
+        num_results: Optional[int],
+        exclude: Optional[MovieBitset] = None,
+        allowed: Optional[Set[int]] = None,
+        profile: Optional[Dict[str, float]] = None
+    ) -> Iterator[Dict]:
+        """
+        Rank movies sharing any of a movie's emotions, each scored against the
+        movie's own intensity for that emotion; the movie itself is skipped.
+        
+        profile (see emotion_profile) can be passed in when the movie is not
+        in this engine's KB, e.g. on another shard.
+        """
+        neighbours = self._neighbours(movie_id) if profile is None and allowed is None else None
+        if neighbours is not None:
+            unexcluded = (movie for movie in neighbours if not self._is_excluded(movie, exclude))
+            yield from islice(unexcluded, num_results)
+            return
+        
+        if profile is None:
+            profile = self.emotion_profile(movie_id)
+        
+        heap = []
+        for emotion, target in profile.items():
+            candidates = self._emotion_candidates(emotion)
+            keys = sorted(allowed) if allowed is not None else candidates.keys()
+            for key in keys:
+                for row in candidates.get(key, ()):
+                    if row['movie_id'] != movie_id:
+                        movie = dict(row)
+                        heap.append((-self._score_movie(movie, target), len(heap), movie))
+        
+        yield from self._pop_ranked(heap, num_results, exclude)
+    
+    def _precomputed(self, emotion: Optional[str] = None, target: Optional[float] = None) -> Optional[Iterator[Dict]]:
+        """Precomputed ranking for an emotion and target (neutral: no emotion), or None to query live."""
+        if self.answers is None or self.answers.kb_version != self.recommender.kb_version:
+            return None
+        return self.answers.ranking(emotion, target)
+    
+    def emotion_profile(self, movie_id: str) -> Dict[str, float]:
+        """Strongest intensity of each of a movie's emotions."""
+        profile = {}
+        for e in self.recommender.get_all_emotions_for_movie(movie_id)['emotions']:
+            if e['emotion'] in self.emotion_list:
+                profile[e['emotion']] = max(profile.get(e['emotion'], 0.0), e['intensity'])
+        return profile
+    
+    def _neighbours(self, movie_id: str) -> Optional[Iterator[Dict]]:
+        """A movie's precomputed neighbours as movie dicts, or None to rank live."""
+        if self.similarity is None or self.similarity.kb_version != self.kb_version:
+            return None
+        if movie_id not in self.similarity.movie_index:
+            return None
+        metadata = self._metadata()
+        return (
+            {**metadata[n['movie_id']], 'score': n['score']}
+            for n in self.similarity.neighbours(movie_id) if n['movie_id'] in metadata
+        )
+    
+    def _metadata(self) -> Dict[str, Dict]:
+        """movie_id -> {movie_id, title, director, cast} (cached per KB version)."""
+        key = (self.kb_version, 'metadata')
+        if key not in self._candidates:
+            self._candidates[key] = {
+                movie['movie_id']: {k: movie[k] for k in ('movie_id', 'title', 'director', 'cast')}
+                for movie in self.recommender.get_movie_metadata()
+            }
+        return self._candidates[key]
+    
+    def _title_index(self) -> TitleIndex:
+        """Fuzzy title index (built once per KB version)."""
+        key = (self.recommender.kb_version, 'titles')
+        if key not in self._candidates:
+            self._candidates[key] = TitleIndex(self.recommender.get_all_movies())
+        return self._candidates[key]
+    
+    def _emotion_candidates(self, emotion: str) -> Dict[int, List[Dict]]:
+        """Candidate rows of an emotion grouped by internal movie id (cached per KB version)."""
+        key = (self.recommender.kb_version, emotion)
+        if key not in self._candidates:
+            grouped = {}
+            for movie in self.recommender.get_movies_by_emotion(emotion, limit=None):
+                movie_key = self.movie_key(movie['movie_id'])
+                if movie_key is not None:
+                    grouped.setdefault(movie_key, []).append(movie)
+            self._candidates[key] = grouped
+        return self._candidates[key]
+    
+    def _overall_ranking(self) -> Tuple[List[Dict], Dict[int, int]]:
+        """Neutral ranking and internal id -> position in it (cached per KB version)."""
+        key = (self.recommender.kb_version, None)
+        if key not in self._candidates:
+            ranking = self.recommender.get_top_movies_overall(limit=None)
+            positions = {}
+            for position, movie in enumerate(ranking):
+                movie_key = self.movie_key(movie['movie_id'])
+                if movie_key is not None:
+                    positions.setdefault(movie_key, position)
+            self._candidates[key] = (ranking, positions)
+        return self._candidates[key]
+    
+    @staticmethod
+    def _score_movie(movie: Dict, intensity: float) -> float:
+        """Blend intensity match and confidence into movie['score'] and return it."""
+        # Distance from target intensity (0 = perfect match)
+        distance = abs(movie['intensity'] - intensity)
+        
+        # Score: closer to intensity = higher score
+        intensity_score = 1.0 - distance
+        
+        # Combine with confidence
+        movie['score'] = (intensity_score * INTENSITY_WEIGHT) + (movie['confidence'] * CONFIDENCE_WEIGHT)
+        return movie['score']
+    
     def _score_by_intensity_match(
         self,
         movies: List[Dict],
@@ -120,16 +630,7 @@ class RecommendationEngine:
         Low intensity → prefer subtle movies
         """
         for movie in movies:
-            movie_intensity = movie['intensity']
-            
-            # Distance from target intensity (0 = perfect match)
-            distance = abs(movie_intensity - intensity)
-            
-            # Score: closer to intensity = higher score
-            intensity_score = 1.0 - distance
-            
-            # Combine with confidence
-            movie['score'] = (intensity_score * 0.6) + (movie['confidence'] * 0.4)
+            self._score_movie(movie, intensity)
         
         # Sort by score
         movies.sort(key=lambda m: m['score'], reverse=True)
@@ -141,6 +642,198 @@ class RecommendationEngine:
         
         return f"**{movie['title']}** - {reason}"
     
+    def explain(self, movie_id: str, emotion_state: Dict) -> Dict:
+        """
+        Structured provenance for why a movie was recommended for an emotion state.
+        
+        Computed on demand (e.g. when a client expands a card) and memoized per
+        (movie, emotion state, reference movie, KB version), so it costs nothing
+        on the hot path.
+        
+        Returns:
+        {
+            'movie_id', 'title', 'query_type', 'emotion', 'rule': str,
+            'evidence': List[Dict] (emotion nodes with their triples),
+            'scoring': Dict (target intensity, weighted terms, total score;
+                             "similar": reference movie and its similarity),
+            'summary': str, 'kb_version': str
+        }
+        """
+        similar_to = emotion_state.get('similar_to') if emotion_state.get('query_type') == 'similar' else None
+        key = (
+            movie_id,
+            emotion_state.get('query_type'),
+            emotion_state.get('emotion'),
+            emotion_state.get('intensity') or 0.0,
+            # A reference profile passed in (sharded engine) means the live ranking, not the graph
+            (similar_to['movie_id'], tuple(sorted((similar_to.get('profile') or {}).items()))) if similar_to else None,
+            self.recommender.kb_version
+        )
+        if key in self._explanations:
+            self._explanations.move_to_end(key)
+            return self._explanations[key]
+        
+        explanation = self._build_explanation(*key, similar_to=similar_to)
+        self._explanations[key] = explanation
+        if len(self._explanations) > EXPLANATION_CACHE_SIZE:
+            self._explanations.popitem(last=False)
+        
+        return explanation
+    
+    def _build_explanation(
+        self,
+        movie_id: str,
+        query_type: str,
+        emotion: Optional[str],
+        intensity: float,
+        reference: Optional[str],
+        kb_version: str,
+        similar_to: Optional[Dict] = None
+    ) -> Dict:
+        """Assemble the provenance for explain() from the knowledge graph."""
+        provenance = self.recommender.get_emotion_provenance(movie_id)
+        movie_info = self.recommender.get_all_emotions_for_movie(movie_id)
+        title = movie_info['title'] or movie_id
+        
+        if reference is not None:
+            return self._explain_similar(movie_id, title, provenance, similar_to, kb_version)
+        
+        if query_type in ('current_state', 'desired_state') and emotion in self.emotion_list:
+            target = intensity if query_type == 'current_state' else DESIRED_INTENSITY
+            evidence = [p for p in provenance if p['emotion'] == emotion]
+            rule = f"IF {query_type}(user, {emotion}) ∧ hasEmotion(?m, {emotion}) → recommend(?m)"
+        else:
+            target = None
+            evidence = provenance
+            rule = "IF neutral(user) → recommend(?m) ORDER BY confidence"
+        
+        if not evidence:
+            return {
+                'movie_id': movie_id,
+                'title': title,
+                'query_type': query_type,
+                'emotion': emotion,
+                'rule': rule,
+                'evidence': [],
+                'scoring': {},
+                'summary': f"{title} has no recorded {emotion or 'emotion'} in the knowledge graph.",
+                'kb_version': kb_version
+            }
+        
+        # The node the ranking kept: best blended score against the target
+        # (neutral: the most confident one)
+        if target is None:
+            best = max(evidence, key=lambda p: p['confidence'])
+        else:
+            best = max(evidence, key=lambda p: self._score_movie(dict(p), target))
+        
+        if target is None:
+            scoring = {
+                'confidence': best['confidence'],
+                'score': best['confidence']
+            }
+            summary = f"{title} is among the most confidently classified movies ({best['confidence']:.0%})."
+        else:
+            scoring = self._blend_terms(best, target)
+            summary = (
+                f"{title} evokes {emotion} at intensity {best['intensity']:.2f} "
+                f"(target {target:.2f}) with {best['confidence']:.0%} classifier confidence."
+            )
+        
+        if best['inferred_categories']:
+            summary += f" Also inferred as: {', '.join(best['inferred_categories'])}."
+        
+        return {
+            'movie_id': movie_id,
+            'title': title,
+            'query_type': query_type,
+            'emotion': emotion,
+            'rule': rule,
+            'evidence': evidence,
+            'scoring': scoring,
+            'summary': summary,
+            'kb_version': kb_version
+        }
+    
+    def _explain_similar(
+        self,
+        movie_id: str,
+        title: str,
+        provenance: List[Dict],
+        similar_to: Dict,
+        kb_version: str
+    ) -> Dict:
+        """
+        explain() for "because you liked X", following _iter_similar: the
+        similarity graph's neighbour score when the ranking came from it,
+        otherwise the emotion node that best matched X's emotion profile.
+        """
+        reference = similar_to['movie_id']
+        reference_title = similar_to.get('title') or reference
+        explanation = {
+            'movie_id': movie_id,
+            'title': title,
+            'query_type': 'similar',
+            'emotion': None,
+            'rule': f"IF liked(user, {reference}) ∧ similarTo(?m, {reference}) → recommend(?m)",
+            'evidence': provenance,
+            'kb_version': kb_version
+        }
+        
+        neighbours = self._neighbours(reference) if similar_to.get('profile') is None else None
+        if neighbours is not None:
+            similarity = next((n['score'] for n in neighbours if n['movie_id'] == movie_id), None)
+            if similarity is not None:
+                explanation['scoring'] = {
+                    'reference': reference,
+                    'similarity': round(similarity, 4),
+                    'weights': {'emotion': EMOTION_WEIGHT, 'director': DIRECTOR_WEIGHT, 'cast': CAST_WEIGHT},
+                    'score': round(similarity, 4)
+                }
+                explanation['summary'] = (
+                    f"{title} is one of the nearest neighbours of {reference_title} "
+                    f"(similarity {similarity:.2f} from emotional profile, director and cast)."
+                )
+                return explanation
+        
+        # Ranked live: each shared emotion scored against the reference's own intensity
+        profile = similar_to.get('profile') or self.emotion_profile(reference)
+        evidence = [p for p in provenance if p['emotion'] in profile]
+        if not evidence:
+            explanation.update(
+                evidence=[],
+                scoring={'reference': reference},
+                summary=f"{title} shares no recorded emotion with {reference_title} in the knowledge graph."
+            )
+            return explanation
+        
+        best = max(evidence, key=lambda p: self._score_movie(dict(p), profile[p['emotion']]))
+        target = profile[best['emotion']]
+        explanation.update(
+            emotion=best['emotion'],
+            evidence=evidence,
+            scoring={'reference': reference, **self._blend_terms(best, target)},
+            summary=(
+                f"{title} shares {best['emotion']} with {reference_title}: intensity {best['intensity']:.2f} "
+                f"against its {target:.2f}, with {best['confidence']:.0%} classifier confidence."
+            )
+        )
+        return explanation
+    
+    @staticmethod
+    def _blend_terms(node: Dict, target: float) -> Dict:
+        """Weighted terms of _score_movie for an emotion node and target intensity."""
+        intensity_score = 1.0 - abs(node['intensity'] - target)
+        return {
+            'target_intensity': target,
+            'movie_intensity': node['intensity'],
+            'intensity_score': round(intensity_score, 4),
+            'intensity_term': round(intensity_score * INTENSITY_WEIGHT, 4),
+            'confidence': node['confidence'],
+            'confidence_term': round(node['confidence'] * CONFIDENCE_WEIGHT, 4),
+            'score': round(intensity_score * INTENSITY_WEIGHT + node['confidence'] * CONFIDENCE_WEIGHT, 4)
+        }
+    
     def format_recommendations(
         self,
         movies: List[Dict],
@@ -176,6 +869,52 @@ class RecommendationEngine:
         return "\n".join(output)
 
 
+class RecommendationCursor:
+    """
+    Resumable position in one emotion state's ranking.
+    
+    Wraps the lazily advanced heap of iter_recommendations, so each page
+    costs O(page size) pops instead of a new query. A cursor is only valid
+    for the KB version it was opened against (see is_current).
+    """
+    
+    def __init__(
+        self,
+        engine: RecommendationEngine,
+        emotion_state: Dict,
+        exclude: Optional[MovieBitset] = None
+    ):
+        self.engine = engine
+        self.emotion_state = emotion_state
+        self.exclude = exclude
+        self.kb_version = engine.kb_version
+        self._ranked = engine.iter_recommendations(emotion_state, None, exclude)
+        self._pending = deque()
+    
+    def is_current(self) -> bool:
+        """False once the engine serves a different KB version."""
+        return self.engine.kb_version == self.kb_version
+    
+    def next_page(self, size: int) -> Iterator[Dict]:
+        """Yield up to size movies, unread ones first; newly excluded movies are skipped."""
+        returned = 0
+        while returned < size:
+            if self._pending:
+                movie = self._pending.popleft()
+            else:
+                movie = next(self._ranked, None)
+                if movie is None:
+                    return
+            if self.engine._is_excluded(movie, self.exclude):
+                continue
+            returned += 1
+            yield movie
+    
+    def unread(self, movies: List[Dict]):
+        """Push movies back so the next page starts with them."""
+        self._pending.extendleft(reversed(movies))
+
+
 # ===== TEST =====
 if __name__ == "__main__":
     # Find TTL file
@@ -0,0 +1,191 @@
+"""
+REQUEST BUDGET
+
+Deadline-aware serving for EmotionChatbot: a turn can carry a time budget
+(opt-in: ServingPolicy(budget=...) or handle_user_input(..., budget=...)),
+and the chatbot then degrades to cheaper answers instead of running past it.
+Admission control applies with or without a budget.
+
+- Deadline: budget of one request; stages (parsing, retrieval, scoring,
+  formatting) are marked as they finish, so remaining time can be checked
+  between them and per-stage timings are reported
+- StageEstimates: moving average of how long each serving route took, to
+  decide *before* starting whether a route still fits the remaining time
+- AdmissionControl: bounded number of requests in flight; past it requests
+  are shed (served only from the cheap paths) instead of queueing up
+- PageCache: LRU of recently served pages, per KB version and query
+
+Answers come from the first path that fits, and results report which one
+served them (served_by):
+    "full" / "precomputed"  the engine, on its current tier (see progressive_engine.py)
+    "cache"                 a page served earlier for the same query
+    "top_list"              the precomputed ranking of the emotion (answer_table.py)
+    "shed"                  nothing cheap available; the user is asked to retry
+
+Chatbots sharing an engine share one ServingPolicy (policy_for), so the
+admission limit, estimates and cache are per loaded KB, not per conversation.
+"""
+
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+
+# Default budget of one chatbot turn (seconds; None = no deadline)
+REQUEST_BUDGET = None
+
+# Requests served at once per engine before new ones are shed
+MAX_IN_FLIGHT = 64
+
+# Pages kept per engine for the "cache" fallback
+PAGE_CACHE_SIZE = 1024
+
+# Weight of the latest observation in the per-route moving average
+ESTIMATE_WEIGHT = 0.2
+
+# A route skipped for its estimate is never measured again, so its estimate
+# decays by this factor on every skip (StageEstimates.skip) until the route
+# is tried once more
+RETRY_DECAY = 0.9
+
+SERVED_FULL = "full"
+SERVED_PRECOMPUTED = "precomputed"
+SERVED_CACHE = "cache"
+SERVED_TOP_LIST = "top_list"
+SERVED_SHED = "shed"
+
+STAGES = ("parsing", "retrieval", "scoring", "formatting")
+
+
+class Deadline:
+    """Time budget of one request, with per-stage timings."""
+
+    def __init__(self, budget: Optional[float] = REQUEST_BUDGET):
+        self.budget = budget
+        self.start = time.perf_counter()
+        self.expires = None if budget is None else self.start + budget
+        self.stages = {}
+        self._last = self.start
+
+    def remaining(self) -> float:
+        """Seconds left (infinite without a budget, never negative)."""
+        if self.expires is None:
+            return float("inf")
+        return max(0.0, self.expires - time.perf_counter())
+
+    def expired(self) -> bool:
+        return self.expires is not None and time.perf_counter() >= self.expires
+
+    def mark(self, stage: str) -> float:
+        """Record that a stage finished; returns its duration."""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last)
+        self._last = now
+        return self.stages[stage]
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+class StageEstimates:
+    """Moving-average duration per route, e.g. "live" or "precomputed" retrieval."""
+
+    def __init__(self, weight: float = ESTIMATE_WEIGHT):
+        self.weight = weight
+        self.seconds = {}
+
+    def estimate(self, route: str) -> float:
+        """Expected seconds (0 until the route was observed once)."""
+        return self.seconds.get(route, 0.0)
+
+    def observe(self, route: str, seconds: float):
+        previous = self.seconds.get(route)
+        self.seconds[route] = seconds if previous is None else previous + self.weight * (seconds - previous)
+
+    def fits(self, route: str, deadline: Deadline, reserve: float = 0.0) -> bool:
+        """Whether the route is expected to finish (plus reserve) before the deadline."""
+        return self.estimate(route) + reserve <= deadline.remaining()
+
+    def skip(self, route: str):
+        """Record that the route was not taken for its estimate (decays the estimate, see RETRY_DECAY)."""
+        if route in self.seconds:
+            self.seconds[route] *= RETRY_DECAY
+
+
+class AdmissionControl:
+    """Counts requests in flight; try_enter fails (the request is shed) past the limit."""
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.stats = {"admitted": 0, "shed": 0}
+        self._lock = threading.Lock()
+
+    def try_enter(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.stats["shed"] += 1
+                return False
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class PageCache:
+    """LRU of served pages: (KB version, query) -> movies."""
+
+    def __init__(self, size: int = PAGE_CACHE_SIZE):
+        self.size = size
+        self.stats = {"hits": 0, "misses": 0}
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[List[Dict]]:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                self.stats["misses"] += 1
+                return None
+            self._pages.move_to_end(key)
+            self.stats["hits"] += 1
+            return page
+
+    def put(self, key: Hashable, movies: List[Dict]):
+        with self._lock:
+            self._pages[key] = list(movies)
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.size:
+                self._pages.popitem(last=False)
+
+
+class ServingPolicy:
+    """Budget, admission limit, route estimates and page cache shared by the chatbots of one engine."""
+
+    def __init__(
+        self,
+        budget: Optional[float] = REQUEST_BUDGET,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        cache_size: int = PAGE_CACHE_SIZE
+    ):
+        self.budget = budget
+        self.admission = AdmissionControl(max_in_flight)
+        self.estimates = StageEstimates()
+        self.cache = PageCache(cache_size)
+
+
+_policies = weakref.WeakKeyDictionary()
+_policies_lock = threading.Lock()
+
+
+def policy_for(engine) -> ServingPolicy:
+    """The ServingPolicy of an engine (created with the defaults on first use)."""
+    with _policies_lock:
+        if engine not in _policies:
+            _policies[engine] = ServingPolicy()
+        return _policies[engine]
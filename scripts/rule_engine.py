@@ -0,0 +1,280 @@
+"""
+RULE ENGINE
+
+Forward-chaining reasoner over the movie knowledge base and the Onyx/MFOEM ontologies.
+Inferred triples are materialized offline into a separate derived graph
+(movie-emotions.inferred.ttl) so that queries only need plain lookups.
+
+Supported inferences:
+- rdfs:subClassOf closure over rdf:type (RDFS rule 9)
+- rdfs:subPropertyOf closure over asserted properties (RDFS rule 7)
+- subclass closure over onyx:hasEmotionCategory (Onyx categories are bridged to MFOEM classes)
+- user rules such as "sadness-intensity > 0.8 => cathartic"
+
+Every rule only reads triples of the subject it concludes about, so when base
+triples change it is enough to re-derive the changed subjects. Changes to the
+schema itself (subClassOf / subPropertyOf) need a full materialization.
+"""
+
+import operator
+import os
+import re
+from rdflib import Graph, Namespace, URIRef, RDF, RDFS
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+# ===== NAMESPACES =====
+ONYX = Namespace("http://www.gsi.dit.upm.es/ontologies/onyx/ns#")
+OBO = Namespace("http://purl.obolibrary.org/obo/")
+EX = Namespace("http://example.org/")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ONTOLOGY_PATHS = [
+    os.path.join(BASE_DIR, "..", "assets", "onyx.rdf"),
+    os.path.join(BASE_DIR, "..", "assets", "MFOEM.owl"),
+]
+
+# MFOEM: "positive emotion" / "negative emotion"
+POSITIVE_EMOTION = OBO["MFOEM_000211"]
+NEGATIVE_EMOTION = OBO["MFOEM_000212"]
+
+# Onyx categories used in the KB -> MFOEM classes they specialize
+CATEGORY_BRIDGE = {
+    "Joy": [OBO["MFOEM_000034"], POSITIVE_EMOTION],
+    "Trust": [URIRef("https://purl.obolibrary.org/obo/MFOEM_000224"), POSITIVE_EMOTION],
+    "Surprise": [OBO["MFOEM_000032"]],
+    "Sadness": [OBO["MFOEM_000056"], NEGATIVE_EMOTION],
+    "Fear": [OBO["MFOEM_000026"], NEGATIVE_EMOTION],
+    "Anger": [OBO["MFOEM_000009"], NEGATIVE_EMOTION],
+    "Disgust": [OBO["MFOEM_000019"], NEGATIVE_EMOTION],
+}
+
+# Category names that resolve to ontology classes rather than derived ones
+CATEGORY_ALIASES = {
+    "positive": POSITIVE_EMOTION,
+    "negative": NEGATIVE_EMOTION,
+}
+
+
+# ===== USER RULES =====
+# IF emotion category = <category> AND intensity <operator> <threshold>
+# THEN emotion also has category ex:<Then>
+DEFAULT_RULES = [
+    {"category": "sadness", "operator": ">", "threshold": 0.8, "then": "cathartic"},
+    {"category": "fear", "operator": ">", "threshold": 0.7, "then": "thrilling"},
+    {"category": "joy", "operator": ">=", "threshold": 0.9, "then": "uplifting"},
+]
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+RULE_PATTERN = re.compile(
+    r"^\s*(\w+)(?:[-_ ]intensity)?\s*(>=|<=|>|<)\s*([0-9.]+)\s*(?:=>|⇒|->)\s*(\w+)\s*$"
+)
+
+
+def parse_rule(text: str) -> Dict:
+    """Parse a rule like "sadness-intensity > 0.8 => cathartic"."""
+    match = RULE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Cannot parse rule: {text!r}")
+
+    category, op, threshold, then = match.groups()
+    return {
+        "category": category.lower(),
+        "operator": op,
+        "threshold": float(threshold),
+        "then": then.lower()
+    }
+
+
+def category_uri(name: str) -> URIRef:
+    """Resolve a category name to its URI (Onyx, ontology alias or derived)."""
+    key = name.lower()
+    if key in CATEGORY_ALIASES:
+        return CATEGORY_ALIASES[key]
+    if key.capitalize() in CATEGORY_BRIDGE:
+        return ONYX[key.capitalize()]
+    return EX[key.capitalize()]
+
+
+def category_name(uri) -> Optional[str]:
+    """Inverse of category_uri for aliases and derived categories; None for other classes."""
+    for name, alias in CATEGORY_ALIASES.items():
+        if uri == alias:
+            return name
+    if str(uri).startswith(str(EX)):
+        return str(uri)[len(str(EX)):].lower()
+    return None
+
+
+def derived_path(ttl_path: str) -> str:
+    """movie-emotions.ttl -> movie-emotions.inferred.ttl"""
+    root, ext = os.path.splitext(ttl_path)
+    return f"{root}.inferred{ext or '.ttl'}"
+
+
+def load_schema(paths: Optional[List[str]] = None) -> Graph:
+    """Load the ontologies plus the Onyx -> MFOEM bridge axioms."""
+    schema = Graph()
+    for path in ONTOLOGY_PATHS if paths is None else paths:
+        if os.path.exists(path):
+            schema.parse(path, format="xml")
+
+    for category, parents in CATEGORY_BRIDGE.items():
+        for parent in parents:
+            schema.add((ONYX[category], RDFS.subClassOf, parent))
+
+    return schema
+
+
+def is_schema_triple(triple: Tuple) -> bool:
+    """True if changing this triple invalidates the whole materialization."""
+    return triple[1] in (RDFS.subClassOf, RDFS.subPropertyOf)
+
+
+class RuleEngine:
+    """Forward-chaining reasoner that materializes inferences per subject."""
+
+    def __init__(self, schema: Graph, rules: Optional[List[Dict]] = None):
+        self.schema = schema
+        self.rules = [self._compile_rule(r) for r in (DEFAULT_RULES if rules is None else rules)]
+        self._superclasses = {}
+        self._superproperties = {}
+
+    def _compile_rule(self, rule: Dict) -> Tuple:
+        return (
+            category_uri(rule["category"]),
+            OPERATORS[rule["operator"]],
+            float(rule["threshold"]),
+            category_uri(rule["then"])
+        )
+
+    # ----- schema closure -----
+    def _closure(self, node, predicate, memo: Dict) -> Set:
+        if node not in memo:
+            ancestors = set()
+            stack = [node]
+            while stack:
+                for parent in self.schema.objects(stack.pop(), predicate):
+                    if isinstance(parent, URIRef) and parent not in ancestors:
+                        ancestors.add(parent)
+                        stack.append(parent)
+            ancestors.discard(node)
+            memo[node] = ancestors
+        return memo[node]
+
+    def superclasses(self, cls) -> Set:
+        return self._closure(cls, RDFS.subClassOf, self._superclasses)
+
+    def superproperties(self, prop) -> Set:
+        return self._closure(prop, RDFS.subPropertyOf, self._superproperties)
+
+    # ----- inference -----
+    def infer_subject(self, base: Graph, subject) -> Set[Tuple]:
+        """Run all rules to fixpoint for one subject; return only new triples."""
+        known = set(base.predicate_objects(subject))
+        intensities = [float(o) for o in base.objects(subject, ONYX.hasEmotionIntensity)]
+        pending = list(known)
+        inferred = set()
+
+        while pending:
+            p, o = pending.pop()
+            conclusions = [(q, o) for q in self.superproperties(p)]
+
+            if p == RDF.type:
+                conclusions.extend((RDF.type, c) for c in self.superclasses(o))
+            elif p == ONYX.hasEmotionCategory:
+                conclusions.extend((p, c) for c in self.superclasses(o))
+                for category, op, threshold, then in self.rules:
+                    if o == category and any(op(i, threshold) for i in intensities):
+                        conclusions.append((p, then))
+
+            for conclusion in conclusions:
+                if conclusion not in known:
+                    known.add(conclusion)
+                    inferred.add(conclusion)
+                    pending.append(conclusion)
+
+        return {(subject, p, o) for p, o in inferred}
+
+    def materialize(self, base: Graph) -> Graph:
+        """Compute the full derived graph for base."""
+        derived = Graph()
+        derived.bind("onyx", ONYX)
+        derived.bind("ex", EX)
+        derived.bind("obo", OBO)
+
+        for subject in set(base.subjects()):
+            for triple in self.infer_subject(base, subject):
+                derived.add(triple)
+
+        return derived
+
+    def update(self, base: Graph, derived: Graph, subjects: Iterable) -> Dict:
+        """
+        Incrementally maintain derived after base triples of subjects changed.
+
+        Returns {'removed': int, 'added': int}.
+        """
+        removed = added = 0
+        for subject in set(subjects):
+            old = set(derived.triples((subject, None, None)))
+            new = self.infer_subject(base, subject)
+            for triple in old - new:
+                derived.remove(triple)
+                removed += 1
+            for triple in new - old:
+                derived.add(triple)
+                added += 1
+
+        return {"removed": removed, "added": added}
+
+
+# ===== KB BUILD HOOKS =====
+def materialize_kb(ttl_path: str, base: Optional[Graph] = None, rules: Optional[List[Dict]] = None) -> Graph:
+    """Materialize all inferences for ttl_path into its derived graph file."""
+    if base is None:
+        base = Graph()
+        base.parse(ttl_path, format="turtle")
+
+    derived = RuleEngine(load_schema(), rules).materialize(base)
+    derived.serialize(destination=derived_path(ttl_path), format="turtle")
+    print(f"[OK] Materialized {len(derived)} inferred triples to {derived_path(ttl_path)}")
+    return derived
+
+
+def refresh_derived(
+    ttl_path: str,
+    base: Graph,
+    subjects: Iterable,
+    rules: Optional[List[Dict]] = None
+) -> Graph:
+    """Re-derive only the given subjects; falls back to a full build if no derived graph exists."""
+    path = derived_path(ttl_path)
+    if not os.path.exists(path):
+        return materialize_kb(ttl_path, base, rules)
+
+    derived = Graph()
+    derived.parse(path, format="turtle")
+    stats = RuleEngine(load_schema(), rules).update(base, derived, subjects)
+    derived.serialize(destination=path, format="turtle")
+    print(f"[OK] Derived graph updated: +{stats['added']} / -{stats['removed']} triples")
+    return derived
+
+
+# ===== TEST =====
+if __name__ == "__main__":
+    ttl_path = os.path.join(BASE_DIR, "..", "movie-emotions.ttl")
+
+    if os.path.exists(ttl_path):
+        derived = materialize_kb(ttl_path)
+        for name in ["cathartic", "uplifting", "positive"]:
+            count = len(set(derived.subjects(ONYX.hasEmotionCategory, category_uri(name))))
+            print(f"  {name}: {count} emotion nodes")
+    else:
+        print(f"[ERROR] TTL file not found at {ttl_path}")
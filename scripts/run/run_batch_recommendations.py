@@ -0,0 +1,275 @@
+"""
+BATCH RECOMMENDATIONS - JSONL RUNNER
+
+Offline recommendations for many (user, emotion state) requests, e.g.
+marketing campaigns. Streams JSONL requests in and JSONL results out, in
+input order, through RecommendationEngine.recommend_batch.
+
+Request lines (one JSON object each):
+    {"id": "u1", "message": "I feel sad"}
+    {"id": "u2", "query_type": "desired_state", "emotion": "joy", "exclude": ["0042674"]}
+
+"message" is parsed like a chat turn (emotion and facets); otherwise
+query_type / emotion / intensity / facets (director, actor, year_range
+[start, end]) are taken as given, once checked. "exclude" lists movie ids
+the request must not get.
+
+Result lines:
+    {"id": "u1", "query_type": ..., "emotion": ..., "recommendations": [{"movie_id", "title", "score"}, ...]}
+
+A line that is not a valid request gets an error line instead, and the
+run goes on:
+    {"line": 17, "error": "invalid request: ..."}
+
+Input is read in chunks of --batch-size requests; with --workers > 1 the
+chunks are spread over worker processes (at most 2 per worker in flight,
+so memory stays bounded), each with its own engine. --store shared makes
+the workers map one index instead of each loading the graph.
+
+Usage:
+    python run_batch_recommendations.py requests.jsonl [-o results.jsonl] [--workers 4] [--store shared]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+# Add scripts directory to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+scripts_dir = os.path.dirname(script_dir)
+project_root = os.path.dirname(scripts_dir)
+sys.path.insert(0, scripts_dir)
+
+from emotion_state_parser import EMOTIONS, parse_emotion, extract_facets
+from recommendation_engine import RecommendationEngine
+
+
+BATCH_SIZE = 10000
+
+# Movie fields written per recommendation
+RESULT_FIELDS = ('movie_id', 'title', 'score', 'confidence')
+
+QUERY_TYPES = ('current_state', 'desired_state', 'neutral', 'similar')
+PERSON_FACETS = ('director', 'actor')
+
+# Engine of this (worker) process
+_engine: Optional[RecommendationEngine] = None
+_people = None
+
+
+def init_worker(ttl_path: str, store: str):
+    global _engine, _people
+    _engine = RecommendationEngine(ttl_path, store)
+    _people = _engine.people_lookup()
+
+
+def parse_request(line: str) -> Dict:
+    """Request object of a line; ValueError if it is not one."""
+    request = json.loads(line)
+    if not isinstance(request, dict):
+        raise ValueError("not a JSON object")
+    if 'message' in request and not isinstance(request['message'], str):
+        raise ValueError("'message' is not a string")
+    if request.get('exclude') and not (
+        isinstance(request['exclude'], list) and all(isinstance(movie_id, str) for movie_id in request['exclude'])
+    ):
+        raise ValueError("'exclude' is not a list of movie ids")
+    if 'message' not in request:
+        check_state_fields(request)
+    return request
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_state_fields(request: Dict):
+    """ValueError unless query_type / emotion / intensity / facets / similar_to are usable as given."""
+    if request.get('query_type', 'neutral') not in QUERY_TYPES:
+        raise ValueError(f"'query_type' is not one of {', '.join(QUERY_TYPES)}")
+    if request.get('emotion') is not None and request['emotion'] not in EMOTIONS:
+        raise ValueError(f"'emotion' is not one of {', '.join(EMOTIONS)}")
+    if request.get('intensity') is not None and not _is_number(request['intensity']):
+        raise ValueError("'intensity' is not a number")
+
+    facets = request.get('facets') or {}
+    if not isinstance(facets, dict):
+        raise ValueError("'facets' is not an object")
+    for name, value in facets.items():
+        if value is None:
+            continue
+        if name in PERSON_FACETS:
+            if not isinstance(value, str):
+                raise ValueError(f"facet '{name}' is not a string")
+        elif name == 'year_range':
+            if not (isinstance(value, list) and len(value) == 2 and all(map(_is_number, value))):
+                raise ValueError("facet 'year_range' is not a [start, end] pair of years")
+        else:
+            raise ValueError(f"unknown facet '{name}'")
+
+    similar_to = request.get('similar_to')
+    if similar_to is not None and not (isinstance(similar_to, dict) and isinstance(similar_to.get('movie_id'), str)):
+        raise ValueError("'similar_to' is not an object with a 'movie_id'")
+
+
+def to_state(request: Dict) -> Dict:
+    """Emotion state of a request line."""
+    if 'message' in request:
+        state = parse_emotion(request['message'])
+        state['facets'] = extract_facets(request['message'], _people)
+        return state
+    return {
+        'query_type': request.get('query_type', 'neutral'),
+        'emotion': request.get('emotion'),
+        'intensity': request.get('intensity') or 0.0,
+        'facets': request.get('facets') or {},
+        'similar_to': request.get('similar_to')
+    }
+
+
+def recommend_lines(lines: List[str], num_results: int, first_line: int = 1) -> List[str]:
+    """Result lines for a chunk of request lines (runs in a worker); first_line numbers error lines."""
+    output = [None] * len(lines)
+    positions, requests = [], []
+    for i, line in enumerate(lines):
+        try:
+            requests.append(parse_request(line))
+        except ValueError as exc:
+            output[i] = json.dumps({'line': first_line + i, 'error': f"invalid request: {exc}"}, ensure_ascii=False)
+        else:
+            positions.append(i)
+
+    # Campaign messages repeat a lot: parse each distinct text once
+    parsed = {}
+    states = []
+    for request in requests:
+        if 'message' not in request:
+            states.append(to_state(request))
+            continue
+        if request['message'] not in parsed:
+            parsed[request['message']] = to_state(request)
+        states.append(dict(parsed[request['message']]))
+
+    excludes = []
+    for request in requests:
+        exclude = None
+        if request.get('exclude'):
+            exclude = _engine.new_exclusion_set()
+            for movie_id in request['exclude']:
+                key = _engine.movie_key(movie_id)
+                if key is not None:
+                    exclude.add(key)
+        excludes.append(exclude)
+
+    results = _engine.recommend_batch(states, num_results, excludes)
+
+    for i, request, state, movies in zip(positions, requests, states, results):
+        output[i] = json.dumps({
+            'id': request.get('id'),
+            'query_type': state['query_type'],
+            'emotion': state['emotion'],
+            'recommendations': [
+                {field: movie[field] for field in RESULT_FIELDS if field in movie}
+                for movie in movies
+            ]
+        }, ensure_ascii=False)
+    return output
+
+
+def read_chunks(f, size: int) -> Iterator[List[str]]:
+    # Blank lines are skipped and not counted in error line numbers
+    lines = (line for line in f if line.strip())
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(
+    ttl_path: str,
+    input_file,
+    output_file,
+    num_results: int = 10,
+    workers: int = 1,
+    store: str = "memory",
+    batch_size: int = BATCH_SIZE
+) -> int:
+    """Stream requests to results; returns the number of requests served."""
+    served = 0
+    chunks = read_chunks(input_file, batch_size)
+
+    if workers <= 1:
+        init_worker(ttl_path, store)
+        for chunk in chunks:
+            for line in recommend_lines(chunk, num_results, served + 1):
+                output_file.write(line + "\n")
+            served += len(chunk)
+        return served
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(ttl_path, store)) as pool:
+        pending = deque()
+        submitted = 0
+        for chunk in chunks:
+            pending.append(pool.submit(recommend_lines, chunk, num_results, submitted + 1))
+            submitted += len(chunk)
+            # Bounded lookahead: results are written in order as they complete
+            while len(pending) >= 2 * workers or (pending and pending[0].done()):
+                lines = pending.popleft().result()
+                output_file.write("\n".join(lines) + "\n")
+                served += len(lines)
+        while pending:
+            lines = pending.popleft().result()
+            output_file.write("\n".join(lines) + "\n")
+            served += len(lines)
+    return served
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Batch recommendations from JSONL requests.")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL requests (- = stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results (- = stdout)")
+    parser.add_argument("--kb", default=os.path.join(project_root, "movie-emotions.ttl"))
+    parser.add_argument("-k", "--num-results", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    parser.add_argument("--store", choices=["memory", "compact", "shared"], default="memory")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Requests per recommend_batch call")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.kb):
+        print(f"❌ Error: Knowledge base not found at {args.kb}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.store == "shared" and args.workers > 1:
+        # Build (or refresh) the index once, before the workers map it
+        from shared_index import SharedRecommender
+        SharedRecommender.open(args.kb)
+
+    # Engine logs go to stderr so stdout stays pure JSONL
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+
+    input_file = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    output_file = stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        served = run_batch(args.kb, input_file, output_file, args.num_results, args.workers, args.store, args.batch_size)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not stdout:
+            output_file.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {served} requests in {elapsed:.1f}s ({served / max(elapsed, 1e-9):.0f}/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,70 @@
 STEP 2: Emotion Classification (Python)
 
 - Reads raw reviews from reviews.json
-- Applies Naïve Bayes emotion classifier
-- Aggregates emotions per movie
-- Writes emotion_results.json
+- Applies Naïve Bayes emotion classifier (cached per review text and
+  classifier version in classification_cache.sqlite)
+- Aggregates emotions per movie incrementally: each movie's EmotionAggregate
+  state and the hashes of the reviews already in it are kept in
+  emotion_aggregates.json, so only newly arrived reviews are classified
+- Writes emotion_results.json (per-review "classifications" of every review;
+  already aggregated ones are read back from the cache, not re-classified)
 
 This script replaces emotion classification previously done in JavaScript.
 """
 
 import json
 import os
-from emotion_classifier import classify_emotion, aggregate_emotions
+from collections import Counter
+from emotion_classifier import EmotionAggregate
+from classification_cache import ClassificationCache, classify_with_cache, text_hash
 
 
 # ---------- PATH SETUP ----------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 INPUT_PATH = os.path.join(BASE_DIR, "..", "reviews.json")
 OUTPUT_PATH = os.path.join(BASE_DIR, "..", "emotion_results.json")
+CACHE_PATH = os.path.join(BASE_DIR, "..", "classification_cache.sqlite")
+AGGREGATES_PATH = os.path.join(BASE_DIR, "..", "emotion_aggregates.json")
+
+
+# ---------- AGGREGATE STATE ----------
+def load_aggregates(version):
+    """Per-movie aggregate states, or {} if missing or built by another classifier version."""
+    if not os.path.exists(AGGREGATES_PATH):
+        return {}
+
+    with open(AGGREGATES_PATH, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+
+    if saved.get("version") != version:
+        print(f"♻️  Classifier changed ({version}): re-aggregating all movies\n")
+        return {}
+    return saved["movies"]
+
+
+def save_aggregates(version, states):
+    with open(AGGREGATES_PATH, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "movies": states}, f)
+
+
+def pending_reviews(reviews, hashes, entry):
+    """
+    (aggregate, indexes of the reviews not yet in it) for a movie.
+
+    Falls back to a fresh aggregate over all reviews when a review that was
+    aggregated before is gone or edited, since states can only grow.
+    """
+    if entry is not None and Counter(entry["reviewHashes"]) <= Counter(hashes):
+        remaining = Counter(entry["reviewHashes"])
+        new = []
+        for index, key in enumerate(hashes):
+            if remaining[key]:
+                remaining[key] -= 1
+            else:
+                new.append(index)
+        return EmotionAggregate.from_dict(entry["aggregate"]), new
+
+    return EmotionAggregate(), list(range(len(reviews)))
 
 
 # ---------- MAIN PROCESS ----------
@@ -25,7 +73,7 @@ def run_emotion_analysis():
     print("📥 Loading reviews.json...")
 
     if not os.path.exists(INPUT_PATH):
-        raise FileNotFoundError("❌ reviews.json not found. Run pipeline.js first.")
+        raise FileNotFoundError("❌ reviews.json not found. Run ingest_reviews.py (or pipeline.js) first.")
 
     with open(INPUT_PATH, "r", encoding="utf-8") as f:
         movies = json.load(f)
@@ -33,23 +81,30 @@ def run_emotion_analysis():
     print(f"✅ Loaded {len(movies)} movies\n")
 
     final_results = []
+    cache = ClassificationCache(CACHE_PATH)
+    states = load_aggregates(cache.version)
+
+    if cache.stats["purged"]:
+        print(f"♻️  Classifier changed ({cache.version}): dropped {cache.stats['purged']} cached results\n")
 
     for movie in movies:
         movie_id = movie["movieId"]
         title = movie["title"]
         reviews = movie["reviews"]
+        hashes = [text_hash(review) for review in reviews]
 
         print(f"🎬 Processing: {title}")
 
-        # ---- Classify each review ----
-        classification_results = []
-        for review in reviews:
-            result = classify_emotion(review)
-            classification_results.append(result)
+        # ---- Classify reviews missing from the cache (aggregated ones are all cached) ----
+        aggregate, new_reviews = pending_reviews(reviews, hashes, states.get(movie_id))
+        classification_results = classify_with_cache(reviews, cache) if reviews else []
 
-        # ---- Aggregate emotions ----
-        aggregation = aggregate_emotions(classification_results)
+        # ---- Fold only the reviews not yet aggregated into the movie's aggregate ----
+        aggregate.update([classification_results[index] for index in new_reviews])
+        states[movie_id] = {"aggregate": aggregate.to_dict(), "reviewHashes": hashes}
+        aggregation = aggregate.result()
 
+        print(f"   ➤ New reviews: {len(new_reviews)} / {len(reviews)}")
         print(f"   ➤ Dominant emotion: {aggregation['aggregatedEmotion'].upper()}")
         print(f"   ➤ Vote %: {aggregation['votePercentage']}%")
         print(f"   ➤ Avg intensity: {aggregation['averageIntensity']}")
@@ -66,8 +121,12 @@ def run_emotion_analysis():
     with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
         json.dump(final_results, f, indent=2)
 
+    save_aggregates(cache.version, states)
+
     print(f"✅ Emotion analysis complete!")
+    print(f"🗃️  Cache: {cache.stats['hits']} hits, {cache.stats['misses']} classified ({cache.hit_rate():.0%} hit rate)")
     print(f"📄 Results written to: {OUTPUT_PATH}")
+    cache.close()
 
 
 # ---------- ENTRY POINT ----------
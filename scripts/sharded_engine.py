@@ -0,0 +1,480 @@
+"""
+SHARDED ENGINE
+
+Scatter-gather recommendations over several engine processes.
+
+One RecommendationEngine process is bound by the GIL and holds the whole
+graph. Here movies are partitioned by a hash of their id: split_kb writes
+one TTL per shard holding its movies with their emotion sets and emotion
+nodes (plus the matching slice of the derived graph and a precomputed
+answer table), and each shard is served by its own process running a
+RecommendationEngine over only that slice.
+
+Shards speak a small request/response protocol over
+multiprocessing.connection (pickled tuples, HMAC-authenticated), so they
+can be local processes on Unix sockets (ShardedEngine.launch) or processes
+on other nodes on TCP (python sharded_engine.py serve ...).
+
+ShardedEngine is the coordinator. It fans each request out to all shards,
+each returns its partial ranking (already scored, exclusion applied), and
+a k-way heapq.merge on the blended score produces the global ranking. It
+offers the RecommendationEngine methods EmotionChatbot uses, so a chatbot
+runs on it unchanged:
+
+    engine = ShardedEngine.launch("movie-emotions.ttl", shards=4)
+    chatbot = EmotionChatbot(None, engine=engine)
+
+Movies with equal scores are merged in the single engine's order (higher
+intensity, then higher confidence, then movie id), so the global ranking is
+the one a single engine over the whole KB returns.
+
+Usage:
+    python sharded_engine.py demo [kb.ttl] --shards 4
+    python sharded_engine.py split kb.ttl --shards 4 --out shards/
+    python sharded_engine.py serve shards/kb.shard0.ttl --address 0.0.0.0:7100 --authkey KEY
+"""
+
+import argparse
+import hashlib
+import heapq
+import multiprocessing
+import os
+import secrets
+import tempfile
+import threading
+import time
+import zlib
+from itertools import islice
+from multiprocessing.connection import Client, Listener
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from rdflib import Graph, RDF
+from movie_bitset import MovieBitset
+from rule_engine import derived_path
+
+
+# First page fetched from each shard for open-ended (cursor) rankings;
+# later pages double in size
+STREAM_PAGE = 20
+
+# Seconds to wait for a shard to come up (it loads its slice first)
+CONNECT_TIMEOUT = 300
+
+
+def shard_of(movie_id: str, shards: int) -> int:
+    """Shard owning a movie (stable across processes and runs, unlike hash())."""
+    return zlib.crc32(movie_id.encode("utf-8")) % shards
+
+
+def parse_address(address: str):
+    """"host:port" -> TCP address, anything else -> Unix socket path."""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return (host, int(port))
+    return address
+
+
+# ===== SPLITTING =====
+
+def split_kb(ttl_path: str, shards: int, out_dir: str) -> List[str]:
+    """
+    Write one TTL per shard (plus its derived graph and answer table) and
+    return their paths.
+
+    Each movie goes to shard_of(movie id) together with its emotion sets and
+    emotion nodes; triples of any other subject (ontology, shared nodes) are
+    copied to every shard.
+    """
+    from answer_table import precompute_answers
+    from sparql_recommender import ONYX, MOVIE, load_graph
+
+    base = load_graph(ttl_path)
+    owners = {}
+    for movie in base.subjects(RDF.type, ONYX.Movie):
+        shard = shard_of(str(movie)[len(str(MOVIE)):], shards)
+        owners.setdefault(movie, shard)
+        for node in base.objects(movie, ONYX.hasEmotion):
+            owners.setdefault(node, shard)
+        for emotion_set in base.objects(movie, ONYX.hasEmotionSet):
+            owners.setdefault(emotion_set, shard)
+            for node in base.objects(emotion_set, ONYX.hasEmotion):
+                owners.setdefault(node, shard)
+
+    os.makedirs(out_dir, exist_ok=True)
+    root = os.path.splitext(os.path.basename(ttl_path))[0]
+    paths = [os.path.join(out_dir, f"{root}.shard{i}.ttl") for i in range(shards)]
+
+    sources = [(base, lambda path: path)]
+    if os.path.exists(derived_path(ttl_path)):
+        sources.append((load_graph(derived_path(ttl_path)), derived_path))
+
+    for graph, target in sources:
+        parts = [Graph() for _ in range(shards)]
+        for part in parts:
+            for prefix, namespace in graph.namespaces():
+                part.bind(prefix, namespace)
+        for triple in graph:
+            shard = owners.get(triple[0])
+            for part in (parts if shard is None else (parts[shard],)):
+                part.add(triple)
+        for part, path in zip(parts, paths):
+            part.serialize(destination=target(path), format="turtle")
+
+    for path in paths:
+        precompute_answers(path)
+
+    print(f"[OK] Split {len(owners)} subjects of {ttl_path} into {shards} shards in {out_dir}")
+    return paths
+
+
+# ===== SHARD WORKER =====
+
+def _rank(engine, emotion_state: Dict, offset: int, count: Optional[int], excluded: List[str]) -> List[Dict]:
+    exclude = MovieBitset(len(engine.recommender.movie_ids))
+    for movie_id in excluded:
+        key = engine.movie_key(movie_id)
+        if key is not None:
+            exclude.add(key)
+    limit = None if count is None else offset + count
+    return list(islice(engine.iter_recommendations(emotion_state, limit, exclude or None), offset, None))
+
+
+def _filter(engine, facets: Dict) -> Optional[List[str]]:
+    keys = engine.filter_movies(**facets)
+    if keys is None:
+        return None
+    return [engine.recommender.movie_ids[key] for key in keys]
+
+
+SHARD_METHODS = {
+    'info': lambda engine: {
+        'kb_version': engine.kb_version,
+        'movie_ids': engine.recommender.movie_ids,
+        'people': engine.people_lookup()
+    },
+    'rank': _rank,
+    'filter': _filter,
+    'titles': lambda engine, text, limit: engine.resolve_title(text, limit),
+    'profile': lambda engine, movie_id: engine.emotion_profile(movie_id),
+    'explain': lambda engine, movie_id, emotion_state: engine.explain(movie_id, emotion_state),
+}
+
+
+def _serve_connection(engine, conn):
+    with conn:
+        while True:
+            try:
+                method, args = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                conn.send(('ok', SHARD_METHODS[method](engine, *args)))
+            except Exception as error:
+                conn.send(('error', f"{type(error).__name__}: {error}"))
+
+
+def serve_shard(ttl_path: str, address, authkey: bytes, store: str = "compact"):
+    """Load one shard and answer coordinator requests until killed (one thread per connection)."""
+    from recommendation_engine import RecommendationEngine
+
+    engine = RecommendationEngine(ttl_path, store)
+    with Listener(address, authkey=authkey) as listener:
+        print(f"[OK] Shard {os.path.basename(ttl_path)} serving on {address}")
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, multiprocessing.AuthenticationError):
+                continue
+            threading.Thread(target=_serve_connection, args=(engine, conn), daemon=True).start()
+
+
+# ===== COORDINATOR =====
+
+def _rank_key(movie: Dict) -> Tuple[float, float, float, str]:
+    # Blended score for emotion / similar rankings, confidence for neutral ones;
+    # ties as the single engine's query order breaks them
+    return (
+        -movie.get('score', movie.get('confidence', 0.0)),
+        -movie.get('intensity', 0.0),
+        -movie.get('confidence', 0.0),
+        movie['movie_id']
+    )
+
+
+class ShardedEngine:
+    """Coordinator presenting N shard processes as one RecommendationEngine."""
+
+    def __init__(self, addresses: List, authkey: bytes, processes: Optional[List] = None, workdir=None):
+        """Connect to running shards (addresses in shard order)."""
+        self.addresses = addresses
+        self.authkey = authkey
+        self.emotion_list = ["joy", "sadness", "fear", "anger", "disgust", "surprise", "trust"]
+        self._processes = processes or []
+        self._workdir = workdir
+        self._local = threading.local()
+
+        infos = self._fanout('info', [()] * len(addresses))
+        self.shard_versions = [info['kb_version'] for info in infos]
+
+        # Global ids for exclusion sets, in the order a single engine would use
+        self.movie_ids = sorted(movie_id for info in infos for movie_id in info['movie_ids'])
+        self.movie_index = {movie_id: i for i, movie_id in enumerate(self.movie_ids)}
+
+        self._people = {}
+        for info in infos:
+            for name, roles in info['people'].items():
+                for role, display in roles.items():
+                    self._people.setdefault(name, {}).setdefault(role, display)
+
+    @classmethod
+    def launch(
+        cls,
+        ttl_path: str,
+        shards: int = 2,
+        store: str = "compact",
+        shard_dir: Optional[str] = None
+    ) -> 'ShardedEngine':
+        """Split ttl_path, start one local shard process per slice and connect to them."""
+        workdir = tempfile.TemporaryDirectory(prefix="shards-")
+        paths = split_kb(ttl_path, shards, shard_dir or workdir.name)
+        authkey = secrets.token_bytes(16)
+        addresses = [os.path.join(workdir.name, f"shard{i}.sock") for i in range(shards)]
+
+        context = multiprocessing.get_context("spawn")
+        processes = []
+        for path, address in zip(paths, addresses):
+            process = context.Process(target=serve_shard, args=(path, address, authkey, store), daemon=True)
+            process.start()
+            processes.append(process)
+
+        return cls(addresses, authkey, processes, workdir)
+
+    # ---------- Transport ----------
+
+    def _connections(self) -> List:
+        """This thread's connection to every shard (requests on one connection are sequential)."""
+        if not hasattr(self._local, 'connections'):
+            self._local.connections = [self._connect(address) for address in self.addresses]
+        return self._local.connections
+
+    def _connect(self, address):
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while True:
+            try:
+                return Client(address, authkey=self.authkey)
+            except (ConnectionRefusedError, FileNotFoundError):
+                if time.monotonic() > deadline:
+                    raise
+                if any(not process.is_alive() for process in self._processes):
+                    raise RuntimeError(f"Shard process exited before serving on {address}")
+                time.sleep(0.05)
+
+    def _fanout(self, method: str, args: List[Tuple]) -> List:
+        """Send one request per shard, then gather the replies (shards work concurrently)."""
+        connections = self._connections()
+        for conn, shard_args in zip(connections, args):
+            conn.send((method, shard_args))
+        return [self._reply(conn) for conn in connections]
+
+    def _call(self, shard: int, method: str, *args):
+        conn = self._connections()[shard]
+        conn.send((method, args))
+        return self._reply(conn)
+
+    @staticmethod
+    def _reply(conn):
+        status, value = conn.recv()
+        if status != 'ok':
+            raise RuntimeError(f"Shard error: {value}")
+        return value
+
+    def close(self):
+        for conn in getattr(self._local, 'connections', ()):
+            conn.close()
+        for process in self._processes:
+            process.terminate()
+            process.join()
+        if self._workdir is not None:
+            self._workdir.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- Engine API ----------
+
+    @property
+    def kb_version(self) -> str:
+        return hashlib.sha1("|".join(self.shard_versions).encode()).hexdigest()[:16]
+
+    # Shards serve once launched
+    ready = True
+    tier = "full"
+
+    def people_lookup(self) -> Dict[str, Dict[str, str]]:
+        return self._people
+
+    def movie_key(self, movie_id: str) -> Optional[int]:
+        return self.movie_index.get(movie_id)
+
+    def new_exclusion_set(self) -> MovieBitset:
+        return MovieBitset(len(self.movie_ids))
+
+    def _is_excluded(self, movie: Dict, exclude: Optional[MovieBitset]) -> bool:
+        if not exclude:
+            return False
+        key = self.movie_key(movie['movie_id'])
+        return key is not None and key in exclude
+
+    def _excluded_by_shard(self, exclude: Optional[MovieBitset]) -> List[List[str]]:
+        excluded = [[] for _ in self.addresses]
+        for key in (exclude or ()):
+            movie_id = self.movie_ids[key]
+            excluded[shard_of(movie_id, len(self.addresses))].append(movie_id)
+        return excluded
+
+    def iter_recommendations(
+        self,
+        emotion_state: Dict,
+        num_results: Optional[int] = 10,
+        exclude: Optional[MovieBitset] = None
+    ) -> Iterator[Dict]:
+        """
+        Same contract as RecommendationEngine.iter_recommendations.
+
+        Each shard returns its top num_results; the merge of N sorted lists
+        is a k-way heap merge. num_results None merges shard streams that are
+        fetched page by page, so cursors stay lazy.
+        """
+        similar_to = emotion_state.get('similar_to')
+        if emotion_state['query_type'] == 'similar' and similar_to and 'profile' not in similar_to:
+            # Only the owning shard knows the movie; the others rank against its profile
+            owner = shard_of(similar_to['movie_id'], len(self.addresses))
+            profile = self._call(owner, 'profile', similar_to['movie_id'])
+            emotion_state = {**emotion_state, 'similar_to': {**similar_to, 'profile': profile}}
+
+        excluded = self._excluded_by_shard(exclude)
+        page = num_results if num_results is not None else STREAM_PAGE
+        first = self._fanout('rank', [(emotion_state, 0, page, ex) for ex in excluded])
+
+        if num_results is not None:
+            streams = first
+        else:
+            streams = [
+                self._stream(shard, emotion_state, excluded[shard], rows)
+                for shard, rows in enumerate(first)
+            ]
+
+        yield from islice(heapq.merge(*streams, key=_rank_key), num_results)
+
+    def _stream(self, shard: int, emotion_state: Dict, excluded: List[str], rows: List[Dict]) -> Iterator[Dict]:
+        """A shard's full ranking, starting from an already fetched first page."""
+        offset, size = 0, STREAM_PAGE
+        while True:
+            yield from rows
+            if len(rows) < size:
+                return
+            offset, size = offset + len(rows), size * 2
+            rows = self._call(shard, 'rank', emotion_state, offset, size, excluded)
+
+    def open_cursor(self, emotion_state: Dict, exclude: Optional[MovieBitset] = None):
+        from recommendation_engine import RecommendationCursor
+        return RecommendationCursor(self, emotion_state, exclude)
+
+    def recommend_current_state(self, user_emotion: str, user_intensity: float = 0.5, num_results: int = 10,
+                                exclude: Optional[MovieBitset] = None) -> List[Dict]:
+        if user_emotion.lower() not in self.emotion_list:
+            return []
+        state = {'query_type': 'current_state', 'emotion': user_emotion.lower(), 'intensity': user_intensity}
+        return list(self.iter_recommendations(state, num_results, exclude))
+
+    def recommend_desired_state(self, desired_emotion: str, current_emotion: Optional[str] = None,
+                                num_results: int = 10, exclude: Optional[MovieBitset] = None) -> List[Dict]:
+        if desired_emotion.lower() not in self.emotion_list:
+            return []
+        state = {'query_type': 'desired_state', 'emotion': desired_emotion.lower(), 'intensity': 0.0}
+        return list(self.iter_recommendations(state, num_results, exclude))
+
+    def recommend_neutral(self, num_results: Optional[int] = 10, exclude: Optional[MovieBitset] = None) -> List[Dict]:
+        state = {'query_type': 'neutral', 'emotion': None, 'intensity': 0.0}
+        return list(self.iter_recommendations(state, num_results, exclude))
+
+    def recommend_similar(self, movie_id: str, num_results: int = 10,
+                          exclude: Optional[MovieBitset] = None) -> List[Dict]:
+        state = {'query_type': 'similar', 'emotion': None, 'intensity': 0.0, 'similar_to': {'movie_id': movie_id}}
+        return list(self.iter_recommendations(state, num_results, exclude))
+
+    def recommend_filtered(self, emotion_state: Dict, director: Optional[str] = None, actor: Optional[str] = None,
+                           year_range: Optional[Tuple[int, int]] = None, num_results: int = 10,
+                           exclude: Optional[MovieBitset] = None) -> List[Dict]:
+        facets = {'director': director, 'actor': actor, 'year_range': year_range}
+        return list(self.iter_recommendations({**emotion_state, 'facets': facets}, num_results, exclude))
+
+    def filter_movies(self, director: Optional[str] = None, actor: Optional[str] = None,
+                      year_range: Optional[Tuple[int, int]] = None) -> Optional[Set[int]]:
+        facets = {'director': director, 'actor': actor, 'year_range': year_range}
+        matches = self._fanout('filter', [(facets,)] * len(self.addresses))
+        if matches[0] is None:
+            return None
+        return {self.movie_index[movie_id] for ids in matches for movie_id in ids}
+
+    def resolve_title(self, text: str, limit: int = 5) -> List[Dict]:
+        matches = self._fanout('titles', [(text, limit)] * len(self.addresses))
+        return list(islice(heapq.merge(*matches, key=lambda match: match['distance']), limit))
+
+    def explain(self, movie_id: str, emotion_state: Dict) -> Dict:
+        return self._call(shard_of(movie_id, len(self.addresses)), 'explain', movie_id, emotion_state)
+
+
+# ===== ENTRY POINT =====
+
+def _demo(ttl_path: str, shards: int, store: str):
+    from recommendation_engine import RecommendationEngine
+
+    single = RecommendationEngine(ttl_path, store)
+    states = [
+        {'query_type': 'current_state', 'emotion': emotion, 'intensity': 2 / 3}
+        for emotion in single.emotion_list
+    ] + [{'query_type': 'neutral', 'emotion': None, 'intensity': 0.0}]
+
+    with ShardedEngine.launch(ttl_path, shards, store) as sharded:
+        for name, engine in (("single", single), (f"{shards} shards", sharded)):
+            list(engine.iter_recommendations(states[0], 10))
+            start = time.perf_counter()
+            results = [[m['movie_id'] for m in engine.iter_recommendations(state, 10)] for state in states]
+            print(f"📊 {name}: {len(states)} queries in {(time.perf_counter() - start) * 1e3:.1f} ms")
+            if engine is single:
+                expected = results
+        same = sum(a == b for a, b in zip(expected, results))
+        print(f"{'✅' if same == len(states) else '❌'} {same}/{len(states)} top-10 lists identical to the single engine")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded recommendation engine.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    demo = commands.add_parser("demo", help="Launch local shards and compare with one engine")
+    demo.add_argument("kb", nargs="?", default=os.path.join(os.path.dirname(__file__), "..", "movie-emotions.ttl"))
+    demo.add_argument("--shards", type=int, default=2)
+    demo.add_argument("--store", choices=["memory", "compact"], default="compact")
+
+    split = commands.add_parser("split", help="Write per-shard KB files")
+    split.add_argument("kb")
+    split.add_argument("--shards", type=int, required=True)
+    split.add_argument("--out", required=True)
+
+    serve = commands.add_parser("serve", help="Serve one shard file (e.g. on another node)")
+    serve.add_argument("kb")
+    serve.add_argument("--address", required=True, help="host:port or Unix socket path")
+    serve.add_argument("--authkey", required=True)
+    serve.add_argument("--store", choices=["memory", "compact"], default="compact")
+
+    args = parser.parse_args()
+    if args.command == "demo":
+        _demo(args.kb, args.shards, args.store)
+    elif args.command == "split":
+        split_kb(args.kb, args.shards, args.out)
+    else:
+        serve_shard(args.kb, parse_address(args.address), args.authkey.encode(), args.store)
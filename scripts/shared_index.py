@@ -0,0 +1,398 @@
+"""
+SHARED INDEX
+
+Serving data of the KB as memory-mapped NumPy columns, shared by every
+worker process on a host.
+
+A parent process builds the index once from the graph
+(build_shared_index, beside the TTL: movie-emotions.index/, one .npy file
+per column plus meta.json). Workers open it with np.load(mmap_mode="r"),
+so the columns live in the OS page cache once, however many workers map
+them; a worker only pays for its own session state and small Python
+objects it builds on top.
+
+Columns (catalog order = SPARQLRecommender.movie_ids, i.e. sorted ids):
+- strings / string_offsets         UTF-8 string table (ids, titles, names, JSON)
+- movie_id, title, director        string ids per movie
+- movie_key                        sorted UTF-8 ids (fixed width) for id lookups
+- cast                             n x 3 string ids (-1 = none)
+- year                             release year (NO_YEAR = unknown)
+- provenance                       string id of the movie's provenance (JSON)
+- emotion_*                        per-emotion rankings (movie, intensity,
+                                   confidence) as get_movies_by_emotion
+                                   returns them, grouped by emotion_offsets
+- movie_emotion_*                  each movie's emotion rows (CSR)
+- top_*                            get_top_movies_overall ranking
+- category_*                       get_movies_by_category rankings of the
+                                   derived categories
+
+SharedRecommender answers the read API of SPARQLRecommender from these
+arrays, so RecommendationEngine(store="shared") runs on it unchanged.
+
+Usage:
+    python shared_index.py [path/to/movie-emotions.ttl] [--workers 4]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from collections.abc import Mapping, Sequence
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from sparql_recommender import compute_kb_version
+
+
+FORMAT_VERSION = 2
+
+EMOTIONS = ["joy", "sadness", "fear", "anger", "disgust", "surprise", "trust"]
+
+CAST_SIZE = 3
+NO_YEAR = np.iinfo(np.int32).min
+
+
+def shared_index_path(ttl_path: str) -> str:
+    """movie-emotions.ttl -> movie-emotions.index/"""
+    root, _ = os.path.splitext(ttl_path)
+    return f"{root}.index"
+
+
+# ---------- Build ----------
+
+class _StringTable:
+    """Interns strings while building; saved as one UTF-8 blob plus offsets."""
+
+    def __init__(self):
+        self.ids = {}
+        self.chunks = []
+        self.offsets = [0]
+
+    def add(self, text: Optional[str]) -> int:
+        if text is None:
+            return -1
+        if text not in self.ids:
+            data = text.encode("utf-8")
+            self.ids[text] = len(self.chunks)
+            self.chunks.append(data)
+            self.offsets.append(self.offsets[-1] + len(data))
+        return self.ids[text]
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "strings": np.frombuffer(b"".join(self.chunks), dtype=np.uint8),
+            "string_offsets": np.array(self.offsets, dtype=np.int64)
+        }
+
+
+def _ranking_columns(prefix: str, groups: List[List[Dict]], movie_index: Dict[str, int]) -> Dict[str, np.ndarray]:
+    """Concatenated (movie, intensity, confidence) rows of several rankings, with group offsets."""
+    rows = [
+        (movie_index[movie['movie_id']], movie['intensity'], movie['confidence'])
+        for group in groups for movie in group if movie['movie_id'] in movie_index
+    ]
+    offsets = [0]
+    for group in groups:
+        offsets.append(offsets[-1] + sum(1 for movie in group if movie['movie_id'] in movie_index))
+    return {
+        f"{prefix}_movie": np.array([r[0] for r in rows], dtype=np.int32),
+        f"{prefix}_intensity": np.array([r[1] for r in rows], dtype=np.float64),
+        f"{prefix}_confidence": np.array([r[2] for r in rows], dtype=np.float64),
+        f"{prefix}_offsets": np.array(offsets, dtype=np.int64)
+    }
+
+
+def build_columns(recommender) -> Dict:
+    """(meta, columns) of the index, read from a SPARQLRecommender."""
+    from rule_engine import category_name
+    from sparql_recommender import ONYX
+
+    strings = _StringTable()
+    movie_ids = list(recommender.movie_ids)
+    movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+    n = len(movie_ids)
+
+    metadata = {movie['movie_id']: movie for movie in recommender.get_movie_metadata()}
+    titles = {movie['movie_id']: movie['title'] for movie in recommender.get_all_movies()}
+
+    columns = {
+        "movie_id": np.array([strings.add(movie_id) for movie_id in movie_ids], dtype=np.int32),
+        "movie_key": np.array([movie_id.encode("utf-8") for movie_id in movie_ids], dtype=bytes),
+        "title": np.array([strings.add(titles[movie_id]) for movie_id in movie_ids], dtype=np.int32),
+        "director": np.full(n, -1, dtype=np.int32),
+        "cast": np.full((n, CAST_SIZE), -1, dtype=np.int32),
+        "year": np.full(n, NO_YEAR, dtype=np.int32),
+        "provenance": np.zeros(n, dtype=np.int32)
+    }
+    for i, movie_id in enumerate(movie_ids):
+        movie = metadata.get(movie_id, {})
+        columns["director"][i] = strings.add(movie.get('director', 'Unknown'))
+        for j, actor in enumerate(movie.get('cast', [])[:CAST_SIZE]):
+            columns["cast"][i, j] = strings.add(actor)
+        if movie.get('year') is not None:
+            columns["year"][i] = movie['year']
+        columns["provenance"][i] = strings.add(json.dumps(recommender.get_emotion_provenance(movie_id)))
+
+    # Emotion rankings in query order, and each movie's rows of them
+    rankings = [recommender.get_movies_by_emotion(emotion, limit=None) for emotion in EMOTIONS]
+    columns.update(_ranking_columns("emotion", rankings, movie_index))
+    by_movie = [[] for _ in range(n)]
+    for row, movie in enumerate(columns["emotion_movie"].tolist()):
+        by_movie[movie].append(row)
+    columns["movie_emotion_offsets"] = np.cumsum([0] + [len(rows) for rows in by_movie], dtype=np.int64)
+    columns["movie_emotion_rows"] = np.array([row for rows in by_movie for row in rows], dtype=np.int64)
+
+    top = [movie for movie in recommender.get_top_movies_overall(limit=None) if movie['movie_id'] in movie_index]
+    columns["top_movie"] = np.array([movie_index[movie['movie_id']] for movie in top], dtype=np.int32)
+    columns["top_confidence"] = np.array([movie['confidence'] for movie in top], dtype=np.float64)
+
+    # Derived categories (rule_engine.py) present in the KB
+    categories = sorted({
+        name for name in map(category_name, recommender.derived.objects(None, ONYX.hasEmotionCategory)) if name
+    })
+    columns.update(_ranking_columns(
+        "category", [recommender.get_movies_by_category(category, limit=None) for category in categories], movie_index
+    ))
+
+    columns.update(strings.arrays())
+    meta = {
+        "format": FORMAT_VERSION,
+        "kb_version": recommender.kb_version,
+        "emotions": EMOTIONS,
+        "categories": categories
+    }
+    return meta, columns
+
+
+def build_shared_index(ttl_path: str, output_path: Optional[str] = None, store: str = "memory", workers: Optional[int] = 1) -> str:
+    """Build the index of a KB and replace any previous one; returns its directory."""
+    from sparql_recommender import SPARQLRecommender
+
+    start = time.perf_counter()
+    meta, columns = build_columns(SPARQLRecommender(ttl_path, store, workers))
+
+    output_path = output_path or shared_index_path(ttl_path)
+    staging = f"{output_path}.tmp-{os.getpid()}"
+    os.makedirs(staging)
+    for name, array in columns.items():
+        np.save(os.path.join(staging, f"{name}.npy"), array)
+    with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    # Swap directories; workers still mapping the old files keep them until they reopen
+    retired = f"{output_path}.old-{os.getpid()}"
+    if os.path.exists(output_path):
+        os.rename(output_path, retired)
+    os.rename(staging, output_path)
+    shutil.rmtree(retired, ignore_errors=True)
+
+    size = sum(array.nbytes for array in columns.values())
+    print(f"[OK] Wrote shared index ({size / 1e6:.1f} MB, {len(columns['movie_id'])} movies) "
+          f"to {output_path} ({time.perf_counter() - start:.1f}s)")
+    return output_path
+
+
+# ---------- Attach ----------
+
+class SharedIndex:
+    """Read-only memory-mapped view of a built index."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.kb_version = self.meta["kb_version"]
+        self.columns = {
+            name[:-len(".npy")]: np.load(os.path.join(path, name), mmap_mode="r")
+            for name in os.listdir(path) if name.endswith(".npy")
+        }
+        self.strings = self.columns["strings"]
+        self.string_offsets = self.columns["string_offsets"]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id < 0:
+            return None
+        start, end = self.string_offsets[string_id], self.string_offsets[string_id + 1]
+        return self.strings[start:end].tobytes().decode("utf-8")
+
+    @classmethod
+    def open(cls, path: str, kb_version: Optional[str] = None) -> Optional['SharedIndex']:
+        """Map an index; None if missing, of another format, or built for another KB version."""
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            return None
+        if kb_version is not None and meta.get("kb_version") != kb_version:
+            print(f"♻️  Ignoring stale shared index in {path} (rebuild with shared_index.py)")
+            return None
+        return cls(path)
+
+
+class _StringColumn(Sequence):
+    """List-like view of a string-id column."""
+
+    def __init__(self, index: SharedIndex, column: np.ndarray):
+        self.index = index
+        self.column = column
+
+    def __len__(self) -> int:
+        return len(self.column)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.index.string(int(s)) for s in self.column[i]]
+        return self.index.string(int(self.column[i]))
+
+
+class _SortedIndex(Mapping):
+    """movie_id -> position over the sorted movie_key column, by binary search (no per-worker dict)."""
+
+    def __init__(self, ids: _StringColumn, keys: np.ndarray):
+        self.ids = ids
+        self.keys = keys
+
+    def __getitem__(self, movie_id: str) -> int:
+        key = movie_id.encode("utf-8")
+        i = int(np.searchsorted(self.keys, key))
+        if i < len(self.keys) and self.keys[i] == key:
+            return i
+        raise KeyError(movie_id)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class SharedRecommender:
+    """SPARQLRecommender's read API served from a SharedIndex."""
+
+    def __init__(self, index: SharedIndex):
+        self.index = index
+        self.kb_version = index.kb_version
+        self.movie_ids = _StringColumn(index, index["movie_id"])
+        self.movie_index = _SortedIndex(self.movie_ids, index["movie_key"])
+        self.emotions = {emotion: i for i, emotion in enumerate(index.meta["emotions"])}
+        self.categories = {category: i for i, category in enumerate(index.meta["categories"])}
+
+    @classmethod
+    def open(cls, ttl_path: str) -> 'SharedRecommender':
+        """Attach to the KB's index, building it first if it is missing or stale."""
+        path = shared_index_path(ttl_path)
+        index = SharedIndex.open(path, compute_kb_version(ttl_path))
+        if index is None:
+            build_shared_index(ttl_path, path)
+            index = SharedIndex(path)
+        print(f"[OK] Attached shared index for {len(index['movie_id'])} movies from {path}")
+        return cls(index)
+
+    def _movie(self, i: int) -> Dict:
+        cast = [self.index.string(int(s)) for s in self.index["cast"][i] if s >= 0]
+        return {
+            'movie_id': self.movie_ids[i],
+            'title': self.index.string(int(self.index["title"][i])),
+            'director': self.index.string(int(self.index["director"][i])),
+            'cast': cast
+        }
+
+    def _ranking(self, prefix: str, group: int, name: str, intensity_threshold: float, limit: Optional[int]) -> List[Dict]:
+        start, end = self.index[f"{prefix}_offsets"][group:group + 2]
+        intensities = self.index[f"{prefix}_intensity"][start:end]
+        rows = np.flatnonzero(intensities >= intensity_threshold)[:limit]
+
+        movies = self.index[f"{prefix}_movie"][start:end]
+        confidences = self.index[f"{prefix}_confidence"][start:end]
+        return [
+            {
+                **self._movie(int(movies[row])),
+                'emotion': name,
+                'intensity': float(intensities[row]),
+                'confidence': float(confidences[row])
+            }
+            for row in rows.tolist()
+        ]
+
+    def get_movies_by_emotion(self, emotion: str, intensity_threshold: float = 0.0, limit: Optional[int] = 10) -> List[Dict]:
+        if emotion not in self.emotions:
+            return []
+        return self._ranking("emotion", self.emotions[emotion], emotion, intensity_threshold, limit)
+
+    def get_movies_by_category(self, category: str, intensity_threshold: float = 0.0, limit: int = 10) -> List[Dict]:
+        if category not in self.categories:
+            return []
+        return self._ranking("category", self.categories[category], category, intensity_threshold, limit)
+
+    def get_all_emotions_for_movie(self, movie_id: str) -> Dict:
+        i = self.movie_index.get(movie_id)
+        rows = []
+        if i is not None:
+            start, end = self.index["movie_emotion_offsets"][i:i + 2]
+            rows = self.index["movie_emotion_rows"][start:end].tolist()
+
+        # Emotion of a row = the group its position falls in
+        emotion_offsets = self.index["emotion_offsets"]
+        names = self.index.meta["emotions"]
+        emotions = [
+            {
+                'emotion': names[int(np.searchsorted(emotion_offsets, row, side="right")) - 1],
+                'intensity': float(self.index["emotion_intensity"][row]),
+                'confidence': float(self.index["emotion_confidence"][row])
+            }
+            for row in rows
+        ]
+        return {
+            'movie_id': movie_id,
+            'title': self._movie(i)['title'] if rows else None,
+            'emotions': emotions
+        }
+
+    def get_emotion_provenance(self, movie_id: str) -> List[Dict]:
+        i = self.movie_index.get(movie_id)
+        if i is None:
+            return []
+        provenance = json.loads(self.index.string(int(self.index["provenance"][i])))
+        for node in provenance:
+            node['triples'] = [tuple(triple) for triple in node['triples']]
+        return provenance
+
+    def get_top_movies_overall(self, limit: Optional[int] = 10) -> List[Dict]:
+        movies = self.index["top_movie"][:limit].tolist()
+        confidences = self.index["top_confidence"][:limit].tolist()
+        return [
+            {'movie_id': self.movie_ids[i], 'title': self._movie(i)['title'], 'confidence': confidence}
+            for i, confidence in zip(movies, confidences)
+        ]
+
+    def get_movie_metadata(self) -> List[Dict]:
+        years = self.index["year"]
+        return [
+            {**self._movie(i), 'year': int(years[i]) if years[i] != NO_YEAR else None}
+            for i in range(len(self.movie_ids))
+        ]
+
+    def get_all_movies(self) -> List[Dict]:
+        return [
+            {'movie_id': self.movie_ids[i], 'title': self.index.string(int(self.index["title"][i]))}
+            for i in range(len(self.movie_ids))
+        ]
+
+
+# ===== ENTRY POINT =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the shared serving index of a KB.")
+    parser.add_argument("kb", nargs="?", default=os.path.join(os.path.dirname(__file__), "..", "movie-emotions.ttl"))
+    parser.add_argument("--workers", type=int, default=1, help="Processes to parse the KB with")
+    args = parser.parse_args()
+
+    if os.path.exists(args.kb):
+        build_shared_index(args.kb, workers=args.workers)
+    else:
+        print(f"❌ TTL file not found at {args.kb}")
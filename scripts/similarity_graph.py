@@ -0,0 +1,225 @@
+"""
+SIMILARITY GRAPH
+
+Offline movie-to-movie nearest neighbours for "because you liked X".
+
+Built after generate_kb / enrich_movie_data, beside the TTL
+(movie-emotions.similarity.npz), tagged with the KB version. Similarity
+of two movies blends:
+- cosine similarity of their emotion vectors (strongest intensity per
+  emotion, as RecommendationEngine.emotion_profile)
+- a shared director
+- cast overlap (Jaccard of the cast lists)
+
+Rows are computed in blocks of movies against the whole catalog with NumPy
+(block x n at a time, never the full n x n matrix), and only each movie's
+top NEIGHBOURS are kept. The result is stored as CSR arrays (indptr,
+neighbour indices, scores), so a movie's neighbours are one slice: O(M).
+
+Usage:
+    python similarity_graph.py [path/to/movie-emotions.ttl] [--neighbours 50]
+"""
+
+import argparse
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+# Neighbours kept per movie
+NEIGHBOURS = 50
+
+# Weights of the blended similarity (sum to 1)
+EMOTION_WEIGHT = 0.7
+DIRECTOR_WEIGHT = 0.15
+CAST_WEIGHT = 0.15
+
+# Similarity cells computed per block (block rows x catalog size)
+BLOCK_CELLS = 1 << 22
+
+EMOTIONS = ["joy", "sadness", "fear", "anger", "disgust", "surprise", "trust"]
+
+
+def similarity_path(ttl_path: str) -> str:
+    """movie-emotions.ttl -> movie-emotions.similarity.npz"""
+    root, _ = os.path.splitext(ttl_path)
+    return f"{root}.similarity.npz"
+
+
+def _people_ids(names: List[List[str]], width: int) -> np.ndarray:
+    """n x width matrix of interned person ids, -1 padded (and for 'Unknown')."""
+    ids = {}
+    matrix = np.full((len(names), width), -1, dtype=np.int32)
+    for row, people in enumerate(names):
+        for col, name in enumerate(people[:width]):
+            if name and name != 'Unknown':
+                matrix[row, col] = ids.setdefault(name, len(ids))
+    return matrix
+
+
+def top_neighbours(
+    vectors: np.ndarray,
+    directors: np.ndarray,
+    cast: np.ndarray,
+    neighbours: int = NEIGHBOURS,
+    block_cells: int = BLOCK_CELLS
+):
+    """
+    CSR (indptr, indices, scores) of each movie's top neighbours by blended
+    similarity, best first; movies with zero similarity are left out.
+
+    vectors: n x emotions intensities; directors: n x 1 and cast: n x k
+    person ids (-1 = none).
+    """
+    n = len(vectors)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0).astype(np.float32)
+    cast_sizes = (cast >= 0).sum(axis=1)
+
+    keep = min(neighbours, max(0, n - 1))
+    block = max(1, block_cells // max(1, n))
+    indptr = [0]
+    indices, scores = [], []
+
+    for start in range(0, n, block):
+        end = min(n, start + block)
+
+        # Emotion cosine for this block of rows against every movie
+        similarity = EMOTION_WEIGHT * (unit[start:end] @ unit.T)
+
+        same_director = (directors[start:end, :1] == directors[:, 0][None, :]) & (directors[start:end, :1] >= 0)
+        similarity += DIRECTOR_WEIGHT * same_director
+
+        shared = np.zeros((end - start, n), dtype=np.float32)
+        for a in range(cast.shape[1]):
+            mine = cast[start:end, a:a + 1]
+            for b in range(cast.shape[1]):
+                shared += (mine == cast[:, b][None, :]) & (mine >= 0)
+        union = cast_sizes[start:end, None] + cast_sizes[None, :] - shared
+        similarity += CAST_WEIGHT * np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+
+        # A movie is not its own neighbour
+        similarity[np.arange(end - start), np.arange(start, end)] = -1.0
+
+        if keep:
+            top = np.argpartition(-similarity, keep - 1, axis=1)[:, :keep]
+            top_scores = np.take_along_axis(similarity, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+        for row in range(end - start):
+            if keep:
+                positive = top_scores[row] > 0
+                indices.append(top[row][positive])
+                scores.append(top_scores[row][positive])
+            indptr.append(indptr[-1] + (len(indices[-1]) if keep else 0))
+
+    concat = lambda parts, dtype: np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype)
+    return np.array(indptr, dtype=np.int64), concat(indices, np.int32), concat(scores, np.float32)
+
+
+class SimilarityGraph:
+    """Top-M neighbour lists per movie, stored as CSR."""
+
+    def __init__(self, kb_version: str, movie_ids: List[str], indptr: np.ndarray, indices: np.ndarray, scores: np.ndarray):
+        self.kb_version = kb_version
+        self.movie_ids = movie_ids
+        self.movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+
+    def neighbours(self, movie_id: str) -> List[Dict]:
+        """[{movie_id, score}] most similar first (empty for unknown movies)."""
+        row = self.movie_index.get(movie_id)
+        if row is None:
+            return []
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return [
+            {'movie_id': self.movie_ids[i], 'score': score}
+            for i, score in zip(self.indices[start:end].tolist(), self.scores[start:end].tolist())
+        ]
+
+    @classmethod
+    def build(cls, recommender, neighbours: int = NEIGHBOURS) -> 'SimilarityGraph':
+        """Compute the graph from a SPARQLRecommender's KB."""
+        movie_ids = recommender.movie_ids
+        index = recommender.movie_index
+
+        vectors = np.zeros((len(movie_ids), len(EMOTIONS)), dtype=np.float32)
+        for col, emotion in enumerate(EMOTIONS):
+            for movie in recommender.get_movies_by_emotion(emotion, limit=None):
+                row = index.get(movie['movie_id'])
+                if row is not None:
+                    vectors[row, col] = max(vectors[row, col], movie['intensity'])
+
+        metadata = {movie['movie_id']: movie for movie in recommender.get_movie_metadata()}
+        people = [metadata.get(movie_id, {}) for movie_id in movie_ids]
+        directors = _people_ids([[movie.get('director')] for movie in people], 1)
+        cast = _people_ids([movie.get('cast', []) for movie in people], 3)
+
+        indptr, indices, scores = top_neighbours(vectors, directors, cast, neighbours)
+        return cls(recommender.kb_version, list(movie_ids), indptr, indices, scores)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                format=np.array(FORMAT_VERSION),
+                kb_version=np.array(self.kb_version),
+                movie_ids=np.array(self.movie_ids),
+                indptr=self.indptr,
+                indices=self.indices,
+                scores=self.scores
+            )
+
+    @classmethod
+    def load(cls, path: str, kb_version: Optional[str] = None) -> Optional['SimilarityGraph']:
+        """Read a saved graph; None if missing, of another format, or built for another KB version."""
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as saved:
+            if int(saved["format"]) != FORMAT_VERSION:
+                return None
+            if kb_version is not None and str(saved["kb_version"]) != kb_version:
+                print(f"♻️  Ignoring stale similarity graph in {path} (rebuild with similarity_graph.py)")
+                return None
+            return cls(
+                str(saved["kb_version"]),
+                saved["movie_ids"].tolist(),
+                saved["indptr"],
+                saved["indices"],
+                saved["scores"]
+            )
+
+
+def build_similarity(ttl_path: str, neighbours: int = NEIGHBOURS, output_path: Optional[str] = None) -> SimilarityGraph:
+    """Build and write the similarity graph of a KB."""
+    from sparql_recommender import SPARQLRecommender
+
+    start = time.perf_counter()
+    graph = SimilarityGraph.build(SPARQLRecommender(ttl_path), neighbours)
+    output_path = output_path or similarity_path(ttl_path)
+    graph.save(output_path)
+
+    print(f"[OK] Wrote {len(graph.indices)} neighbour links for {len(graph.movie_ids)} movies "
+          f"to {output_path} ({time.perf_counter() - start:.1f}s)")
+    return graph
+
+
+# ===== ENTRY POINT =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the movie similarity graph.")
+    parser.add_argument("kb", nargs="?", default=os.path.join(os.path.dirname(__file__), "..", "movie-emotions.ttl"))
+    parser.add_argument("--neighbours", type=int, default=NEIGHBOURS)
+    args = parser.parse_args()
+
+    if os.path.exists(args.kb):
+        build_similarity(args.kb, args.neighbours)
+    else:
+        print(f"❌ TTL file not found at {args.kb}")
@@ -5,8 +5,15 @@ Builds and executes SPARQL queries against the RDF knowledge base.
 Queries movies by emotion categories with configurable filters.
 """
 
+import hashlib
+import os
+import threading
 from rdflib import Graph, Namespace, URIRef
-from typing import List, Dict, Optional
+from rdflib.plugins.sparql import prepareQuery
+from typing import List, Dict, Optional, Tuple
+from rule_engine import derived_path, category_uri, category_name
+from compact_store import load_compact_graph
+from parallel_loader import load_graph_parallel
 
 
 # ===== NAMESPACES =====
@@ -16,22 +23,97 @@ EMOTION = Namespace("http://example.org/emotion/")
 RDF = Namespace("http://www.w3.org/1999/02/22-rdf-syntax-ns#")
 RDFS = Namespace("http://www.w3.org/2000/01/rdf-schema#")
 XSD = Namespace("http://www.w3.org/2001/XMLSchema#")
+DBPEDIA = Namespace("http://dbpedia.org/ontology/")
+
+
+def compute_kb_version(ttl_path: str) -> str:
+    """Content hash of the KB and its derived graph; changes whenever either file does."""
+    digest = hashlib.sha1()
+    for path in (ttl_path, derived_path(ttl_path)):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def kb_file_stamp(ttl_path: str) -> Tuple:
+    """(size, mtime) of the KB and its derived graph: a cheap check before compute_kb_version."""
+    stamp = []
+    for path in (ttl_path, derived_path(ttl_path)):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stamp.append(None)
+        else:
+            stamp.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(stamp)
+
+
+# rdflib's SPARQL parser (pyparsing) is not thread-safe; parsing is serialized,
+# evaluation of the parsed query is not
+_PARSE_LOCK = threading.Lock()
+
+
+def load_graph(path: str, store: str = "memory", workers: Optional[int] = 1) -> Graph:
+    """
+    Parse a Turtle file into rdflib's Memory store or a read-only CompactStore.
+    
+    workers other than 1 parses byte ranges in a process pool (parallel_loader.py;
+    None = one per CPU).
+    """
+    if store not in ("memory", "compact"):
+        raise ValueError(f"Unknown store: {store} (expected 'memory' or 'compact')")
+    if workers != 1:
+        return load_graph_parallel(path, workers, store)
+    if store == "compact":
+        return load_compact_graph(path)
+    graph = Graph()
+    graph.parse(path, format="turtle")
+    return graph
+
+
+def _limit_clause(limit: Optional[int]) -> str:
+    return f"LIMIT {int(limit)}" if limit is not None else ""
 
 
 class SPARQLRecommender:
     """Query movie-emotions.ttl using SPARQL."""
     
-    def __init__(self, ttl_path: str):
-        """Load RDF graph from TTL file."""
-        self.graph = Graph()
-        self.graph.parse(ttl_path, format="turtle")
+    def __init__(self, ttl_path: str, store: str = "memory", workers: Optional[int] = 1):
+        """
+        Load RDF graph from TTL file.
+        
+        store "compact" serves from an interned, read-only CompactStore
+        (compact_store.py) instead of rdflib's Memory store; workers > 1
+        (None = one per CPU) parses the file in parallel.
+        """
+        self.graph = load_graph(ttl_path, store, workers)
         print(f"[OK] Loaded {len(self.graph)} RDF triples from {ttl_path}")
+        
+        # Inferred triples materialized at KB build time (see rule_engine.py)
+        self.derived = Graph()
+        if os.path.exists(derived_path(ttl_path)):
+            self.derived = load_graph(derived_path(ttl_path), store, workers)
+            print(f"[OK] Loaded {len(self.derived)} inferred triples")
+        
+        self.kb_version = compute_kb_version(ttl_path)
+        
+        # Internal integer ids (0..n-1) for compact per-session structures
+        self.movie_ids = [movie['movie_id'] for movie in self.get_all_movies()]
+        self.movie_index = {movie_id: i for i, movie_id in enumerate(self.movie_ids)}
+    
+    def _query(self, query: str):
+        """Run a SPARQL query on the KB graph; safe to call from several threads."""
+        with _PARSE_LOCK:
+            prepared = prepareQuery(query)
+        return self.graph.query(prepared)
     
     def get_movies_by_emotion(
         self, 
         emotion: str, 
         intensity_threshold: float = 0.0,
-        limit: int = 10
+        limit: Optional[int] = 10
     ) -> List[Dict]:
         """
         Find movies with specific emotion category.
@@ -39,7 +121,7 @@ class SPARQLRecommender:
         Args:
             emotion: Emotion category (joy, sadness, fear, anger, disgust, surprise, trust)
             intensity_threshold: Minimum intensity (0.0-1.0)
-            limit: Max results
+            limit: Max results (None = all)
         
         Returns:
             List of movie dicts with {movie_id, title, director, cast, emotion, intensity, confidence}
@@ -59,8 +141,7 @@ class SPARQLRecommender:
                ?cast0 ?cast1 ?cast2
                ?intensity ?confidence
         WHERE {{
-            ?movie a onyx:Movie ;
-                rdfs:label ?title ;
+            ?movie rdfs:label ?title ;
                 onyx:hasEmotionSet ?emotionSet .
             
             ?emotionSet onyx:hasEmotion ?emotion .
@@ -75,14 +156,18 @@ class SPARQLRecommender:
             
             BIND(STRAFTER(STR(?movie), "movie/") AS ?movieId)
             
+            # A type check inside the pattern would be evaluated first, next to the
+            # category triple, as a movies x emotions cross product (rdflib orders
+            # triple patterns by bound terms); as a filter it is one lookup per row
+            FILTER EXISTS {{ ?movie a onyx:Movie }}
             FILTER (?intensity >= {intensity_threshold})
         }}
-        ORDER BY DESC(?intensity) DESC(?confidence)
-        LIMIT {limit}
+        ORDER BY DESC(?intensity) DESC(?confidence) ?movieId
+        {_limit_clause(limit)}
         """
         
         results = []
-        for row in self.graph.query(query):
+        for row in self._query(query):
             cast = []
             if row.cast0:
                 cast.append(str(row.cast0))
@@ -103,6 +188,57 @@ class SPARQLRecommender:
         
         return results
     
+    def get_movies_by_category(
+        self,
+        category: str,
+        intensity_threshold: float = 0.0,
+        limit: int = 10
+    ) -> List[Dict]:
+        """
+        Find movies whose emotions have an inferred category.
+        
+        Categories come from the derived graph (e.g. "cathartic", "positive"),
+        so this is a set of plain triple lookups rather than a SPARQL query.
+        
+        Returns:
+            List of movie dicts with {movie_id, title, director, cast, emotion, intensity, confidence}
+        """
+        best = {}
+        for emotion_node in self.derived.subjects(ONYX.hasEmotionCategory, category_uri(category)):
+            intensity = self.graph.value(emotion_node, ONYX.hasEmotionIntensity)
+            confidence = self.graph.value(emotion_node, ONYX.algorithmConfidence)
+            if intensity is None or float(intensity) < intensity_threshold:
+                continue
+            
+            for holder in self.graph.subjects(ONYX.hasEmotion, emotion_node):
+                if (holder, RDF.type, ONYX.Movie) not in self.graph:
+                    continue
+                key = (float(intensity), float(confidence or 0.0))
+                if holder not in best or key > best[holder]:
+                    best[holder] = key
+        
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
+        
+        results = []
+        for movie_uri, (intensity, confidence) in ranked:
+            director = self.graph.value(movie_uri, DBPEDIA.director)
+            cast = []
+            for i in range(3):
+                actor = self.graph.value(movie_uri, DBPEDIA[f"cast_member_{i}"])
+                if actor:
+                    cast.append(str(actor))
+            results.append({
+                'movie_id': str(movie_uri).split("movie/")[-1],
+                'title': str(self.graph.value(movie_uri, RDFS.label)),
+                'director': str(director) if director else 'Unknown',
+                'cast': cast,
+                'emotion': category,
+                'intensity': intensity,
+                'confidence': confidence
+            })
+        
+        return results
+    
     def get_all_emotions_for_movie(self, movie_id: str) -> Dict:
         """Get all emotions associated with a specific movie."""
         
@@ -127,7 +263,7 @@ class SPARQLRecommender:
         
         emotions = []
         title = None
-        for row in self.graph.query(query):
+        for row in self._query(query):
             title = str(row.title)
             emotion_name = str(row.emotionCategory).split('#')[-1].lower()
             emotions.append({
@@ -142,42 +278,127 @@ class SPARQLRecommender:
             'emotions': emotions
         }
     
-    def get_top_movies_overall(self, limit: int = 10) -> List[Dict]:
-        """Get highest confidence movies regardless of emotion."""
+    def get_emotion_provenance(self, movie_id: str) -> List[Dict]:
+        """
+        Get the emotion nodes behind a movie, with the triples that state them.
+        
+        Returns:
+            List of {node, emotion, intensity, confidence, inferred_categories, triples}
+            where triples are (subject, predicate, object) in N3 notation.
+        """
+        movie_uri = MOVIE[movie_id]
+        nodes = set(self.graph.objects(movie_uri, ONYX.hasEmotion))
+        for emotion_set in self.graph.objects(movie_uri, ONYX.hasEmotionSet):
+            nodes.update(self.graph.objects(emotion_set, ONYX.hasEmotion))
+        
+        provenance = []
+        for node in sorted(nodes):
+            category = self.graph.value(node, ONYX.hasEmotionCategory)
+            intensity = self.graph.value(node, ONYX.hasEmotionIntensity)
+            if category is None or intensity is None:
+                continue
+            confidence = self.graph.value(node, ONYX.algorithmConfidence)
+            
+            triples = []
+            if (movie_uri, ONYX.hasEmotion, node) in self.graph:
+                triples.append((movie_uri, ONYX.hasEmotion, node))
+            for p in (ONYX.hasEmotionCategory, ONYX.hasEmotionIntensity, ONYX.algorithmConfidence):
+                triples.extend((node, p, o) for o in self.graph.objects(node, p))
+            
+            inferred = [category_name(c) for c in self.derived.objects(node, ONYX.hasEmotionCategory)]
+            
+            provenance.append({
+                'node': str(node),
+                'emotion': str(category).split('#')[-1].lower(),
+                'intensity': float(intensity),
+                'confidence': float(confidence) if confidence is not None else 0.0,
+                'inferred_categories': sorted(name for name in inferred if name),
+                'triples': [tuple(term.n3(self.graph.namespace_manager) for term in t) for t in triples]
+            })
+        
+        return provenance
+    
+    def get_top_movies_overall(self, limit: Optional[int] = 10) -> List[Dict]:
+        """Get highest confidence movies regardless of emotion (limit None = all)."""
         
+        # One row per movie (its most confident emotion) before LIMIT, so
+        # `limit` movies come back however many emotions each one has
         query = f"""
         PREFIX onyx: <{str(ONYX)}>
         PREFIX movie: <{str(MOVIE)}>
         PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
         
-        SELECT DISTINCT ?movieId ?title ?confidence
+        SELECT ?movieId (SAMPLE(?label) AS ?title) (MAX(?emotionConfidence) AS ?confidence)
         WHERE {{
             ?movie a onyx:Movie ;
-                rdfs:label ?title ;
+                rdfs:label ?label ;
                 onyx:hasEmotionSet ?emotionSet .
             
             ?emotionSet onyx:hasEmotion ?emotion .
-            ?emotion onyx:algorithmConfidence ?confidence .
+            ?emotion onyx:algorithmConfidence ?emotionConfidence .
             
             BIND(STRAFTER(STR(?movie), "movie/") AS ?movieId)
         }}
-        ORDER BY DESC(?confidence)
-        LIMIT {limit}
+        GROUP BY ?movieId
+        ORDER BY DESC(?confidence) ?movieId
+        {_limit_clause(limit)}
         """
         
-        results = []
-        seen = set()
-        for row in self.graph.query(query):
+        return [
+            {
+                'movie_id': str(row.movieId),
+                'title': str(row.title),
+                'confidence': float(row.confidence)
+            }
+            for row in self._query(query)
+        ]
+    
+    def get_movie_metadata(self) -> List[Dict]:
+        """Get title, director, cast and release year of every movie (for facet indexes)."""
+        
+        query = f"""
+        PREFIX onyx: <{str(ONYX)}>
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        PREFIX dbpedia: <{str(DBPEDIA)}>
+        
+        SELECT ?movieId ?title ?director ?cast0 ?cast1 ?cast2 ?year
+        WHERE {{
+            ?movie a onyx:Movie ;
+                rdfs:label ?title .
+            
+            OPTIONAL {{ ?movie dbpedia:director ?director }}
+            OPTIONAL {{ ?movie dbpedia:cast_member_0 ?cast0 }}
+            OPTIONAL {{ ?movie dbpedia:cast_member_1 ?cast1 }}
+            OPTIONAL {{ ?movie dbpedia:cast_member_2 ?cast2 }}
+            OPTIONAL {{ ?movie dbpedia:releaseDate ?year }}
+            
+            BIND(STRAFTER(STR(?movie), "movie/") AS ?movieId)
+        }}
+        """
+        
+        movies = {}
+        for row in self._query(query):
             movie_id = str(row.movieId)
-            if movie_id not in seen:
-                results.append({
-                    'movie_id': movie_id,
-                    'title': str(row.title),
-                    'confidence': float(row.confidence)
-                })
-                seen.add(movie_id)
+            if movie_id in movies:
+                continue
+            
+            cast = [str(c) for c in (row.cast0, row.cast1, row.cast2) if c]
+            year = None
+            if row.year is not None:
+                try:
+                    year = int(str(row.year)[:4])
+                except ValueError:
+                    pass
+            
+            movies[movie_id] = {
+                'movie_id': movie_id,
+                'title': str(row.title),
+                'director': str(row.director) if row.director else 'Unknown',
+                'cast': cast,
+                'year': year
+            }
         
-        return results
+        return list(movies.values())
     
     def get_all_movies(self) -> List[Dict]:
         """Get all movies in knowledge base."""
@@ -198,7 +419,7 @@ class SPARQLRecommender:
         """
         
         results = []
-        for row in self.graph.query(query):
+        for row in self._query(query):
             results.append({
                 'movie_id': str(row.movieId),
                 'title': str(row.title)
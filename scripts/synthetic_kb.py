@@ -0,0 +1,141 @@
+"""
+SYNTHETIC KB GENERATOR
+
+Writes movie-emotions.ttl-shaped knowledge bases of any size for load and
+memory testing: movies with title, director, three cast members and a
+release year, an emotion set, one to three per-emotion nodes and an
+aggregated emotion node, all in the Onyx vocabulary.
+
+The Turtle is written directly, block per subject in the same layout
+rdflib serializes (movies, then emotion sets, then emotions), so a
+100k-movie KB takes seconds rather than an rdflib round trip.
+
+Usage:
+    python synthetic_kb.py 10000 /tmp/kb-10k.ttl [--seed 0] [--materialize]
+"""
+
+import argparse
+import os
+import random
+from typing import Optional
+
+
+EMOTIONS = ["joy", "sadness", "fear", "anger", "disgust", "surprise", "trust"]
+
+PREFIXES = """@prefix emotion: <http://example.org/emotion/> .
+@prefix movie: <http://example.org/movie/> .
+@prefix ns1: <http://dbpedia.org/ontology/> .
+@prefix onyx: <http://www.gsi.dit.upm.es/ontologies/onyx/ns#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+"""
+
+TITLE_WORDS = [
+    "night", "river", "city", "shadow", "heart", "stranger", "storm", "garden",
+    "last", "silent", "golden", "broken", "dark", "long", "red", "blue", "lost",
+    "summer", "winter", "road", "house", "train", "sea", "king", "dream", "war",
+    "love", "fire", "glass", "window", "mirror", "island", "mountain", "letter"
+]
+FIRST_NAMES = [
+    "James", "Mary", "John", "Grace", "Orson", "Ingrid", "Akira", "Sophia",
+    "Federico", "Liv", "Sergio", "Jeanne", "Billy", "Gloria", "Marcello", "Toshiro"
+]
+LAST_NAMES = [
+    "Stewart", "Novak", "Welles", "Bergman", "Kurosawa", "Loren", "Fellini",
+    "Ullmann", "Leone", "Moreau", "Wilder", "Swanson", "Mastroianni", "Mifune",
+    "Hitchcock", "Ford", "Hawks", "Huston", "Lang", "Ray"
+]
+
+
+def _literal(text: str) -> str:
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _float(value: float) -> str:
+    return f'"{round(value, 2)}"^^xsd:float'
+
+
+def generate_synthetic_kb(n_movies: int, path: str, seed: int = 0) -> str:
+    """Write an n_movies synthetic KB to path and return path."""
+    rng = random.Random(seed)
+    directors = [f"{f} {l}" for f in FIRST_NAMES for l in LAST_NAMES]
+    actors = [f"{f} {l}" for f in FIRST_NAMES for l in reversed(LAST_NAMES)]
+
+    movies = []
+    for i in range(n_movies):
+        movie_id = f"{i:07d}"
+        emotions = rng.sample(EMOTIONS, rng.randint(1, 3))
+        movies.append({
+            "id": movie_id,
+            "title": " ".join(rng.sample(TITLE_WORDS, rng.randint(1, 4))).title(),
+            "director": rng.choice(directors),
+            "cast": rng.sample(actors, 3),
+            "year": rng.randint(1920, 2020),
+            "emotions": {e: (rng.uniform(0.1, 1.0), rng.choice([0.7, 0.85, 0.9])) for e in emotions},
+            "aggregated": emotions[0]
+        })
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(PREFIXES)
+
+        for m in movies:
+            nodes = [f"emotion:{m['id']}_{e}" for e in m["emotions"]] + [f"emotion:agg_{m['id']}"]
+            f.write(
+                f"movie:{m['id']} a onyx:Movie ;\n"
+                f"    rdfs:label {_literal(m['title'])} ;\n"
+                + "".join(f"    ns1:cast_member_{k} {_literal(a)} ;\n" for k, a in enumerate(m["cast"]))
+                + f"    ns1:director {_literal(m['director'])} ;\n"
+                f"    ns1:releaseDate {m['year']} ;\n"
+                f"    onyx:hasEmotion {(',' + chr(10) + '        ').join(nodes)} ;\n"
+                f"    onyx:hasEmotionSet emotion:set_{m['id']} .\n\n"
+            )
+
+        for m in movies:
+            nodes = [f"emotion:{m['id']}_{e}" for e in m["emotions"]] + [f"emotion:agg_{m['id']}"]
+            f.write(
+                f"emotion:set_{m['id']} a onyx:AggregatedEmotionSet ;\n"
+                f"    onyx:algorithm \"keyword-based classification\" ;\n"
+                f"    onyx:hasEmotion {(',' + chr(10) + '        ').join(nodes)} ;\n"
+                f"    onyx:usesEmotionModel \"Naïve Bayes with NRC Lexicon\" .\n\n"
+            )
+
+        for m in movies:
+            for emotion, (intensity, confidence) in m["emotions"].items():
+                f.write(
+                    f"emotion:{m['id']}_{emotion} a onyx:AggregatedEmotion ;\n"
+                    f"    onyx:algorithmConfidence {_float(confidence)} ;\n"
+                    f"    onyx:hasEmotionCategory onyx:{emotion.capitalize()} ;\n"
+                    f"    onyx:hasEmotionIntensity {_float(intensity)} .\n\n"
+                )
+            intensity, confidence = m["emotions"][m["aggregated"]]
+            f.write(
+                f"emotion:agg_{m['id']} a onyx:AggregatedEmotion ;\n"
+                f"    onyx:algorithmConfidence {_float(confidence)} ;\n"
+                f"    onyx:hasEmotionCategory onyx:{m['aggregated'].capitalize()} ;\n"
+                f"    onyx:hasEmotionIntensity {_float(intensity)} .\n\n"
+            )
+
+    return path
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic movie-emotions KB.")
+    parser.add_argument("movies", type=int, help="Number of movies")
+    parser.add_argument("output", help="Output .ttl path")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--materialize", action="store_true",
+                        help="Also write the derived graph (rule_engine.materialize_kb)")
+    args = parser.parse_args(argv)
+
+    generate_synthetic_kb(args.movies, args.output, args.seed)
+    print(f"[OK] Wrote {args.movies} synthetic movies to {args.output} "
+          f"({os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+    if args.materialize:
+        from rule_engine import materialize_kb
+        materialize_kb(args.output)
+
+
+if __name__ == "__main__":
+    main()
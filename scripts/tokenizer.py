@@ -0,0 +1,142 @@
+"""
+TOKENIZER
+
+Shared text normalization for the emotion parser, the review classifier and
+the model trainer, so "Amazing!", "amazing" and "AMAZING." are the same token
+everywhere.
+
+- tokenize(): lowercase word tokens, punctuation stripped (hyphenated words
+  and contractions such as "jaw-dropping" / "don't" stay whole)
+- stem_token(): optional light suffix stripping, memoized in a bounded LRU
+- Vocabulary: interns tokens to dense integer ids; VOCABULARY is the combined
+  vocabulary the parser and classifier lexicons are registered in, so both
+  score on int arrays instead of hashing strings per word
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+# Word characters, keeping inner hyphens and apostrophes
+WORD_PATTERN = re.compile(r"\w+(?:[-'’]\w+)*")
+
+# Max memoized stems (distinct surface forms) per process
+STEM_CACHE_SIZE = 65536
+
+# Light stemming: (suffix, replacement), first match wins; only applied
+# when the remaining stem keeps at least MIN_STEM_LENGTH characters
+SUFFIX_RULES = [
+    ("ies", "y"),
+    ("ied", "y"),
+    ("ing", ""),
+    ("edly", ""),
+    ("ed", ""),
+    ("es", ""),
+    ("s", ""),
+]
+MIN_STEM_LENGTH = 3
+
+# Id returned for tokens that are not in a vocabulary
+UNKNOWN_ID = -1
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem_token(word: str) -> str:
+    """Strip one common inflectional suffix ("terrifying" -> "terrify", "tears" -> "tear")."""
+    if word.endswith("ss"):
+        return word
+    for suffix, replacement in SUFFIX_RULES:
+        if word.endswith(suffix) and len(word) - len(suffix) + len(replacement) >= MIN_STEM_LENGTH:
+            return word[:len(word) - len(suffix)] + replacement
+    return word
+
+
+def tokenize(text: str, stem: bool = False) -> List[str]:
+    """Lowercased word tokens with punctuation removed (optionally stemmed)."""
+    words = WORD_PATTERN.findall(text.lower().replace("’", "'"))
+    if stem:
+        return [stem_token(w) for w in words]
+    return words
+
+
+class Vocabulary:
+    """Interned token -> dense integer id mapping."""
+
+    def __init__(self, tokens: Iterable[str] = (), stem: bool = False):
+        self.stem = stem
+        self.ids: Dict[str, int] = {}
+        self.tokens: List[str] = []
+        for token in tokens:
+            self.intern(token)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def __contains__(self, token: str) -> bool:
+        return self._key(token) in self.ids
+
+    def _key(self, token: str) -> str:
+        token = token.lower()
+        return stem_token(token) if self.stem else token
+
+    def intern(self, token: str) -> int:
+        """Id of token, adding it if new."""
+        key = self._key(token)
+        if key not in self.ids:
+            self.ids[key] = len(self.tokens)
+            self.tokens.append(key)
+        return self.ids[key]
+
+    def get(self, token: str) -> int:
+        """Id of token, or UNKNOWN_ID."""
+        return self.ids.get(self._key(token), UNKNOWN_ID)
+
+    def intern_phrases(self, phrases: Iterable[str]) -> Dict[str, int]:
+        """Intern single-token phrases; returns phrase -> id (multi-word phrases are skipped)."""
+        interned = {}
+        for phrase in phrases:
+            words = tokenize(phrase)
+            if len(words) == 1:
+                interned[phrase] = self.intern(words[0])
+        return interned
+
+    def encode(self, text: str, known_only: bool = True) -> np.ndarray:
+        """
+        Tokenize text into an int32 id array.
+
+        known_only drops tokens outside the vocabulary; otherwise they are
+        kept as UNKNOWN_ID so positions line up with tokenize(text).
+        """
+        ids = np.fromiter(
+            (self.ids.get(w, UNKNOWN_ID) for w in tokenize(text, self.stem)),
+            dtype=np.int32
+        )
+        return ids[ids != UNKNOWN_ID] if known_only else ids
+
+
+# Combined vocabulary shared by emotion_state_parser and emotion_classifier
+VOCABULARY = Vocabulary()
+
+
+def lookup_table(mapping: Dict[int, int], vocabulary: Optional[Vocabulary] = None, default: int = -1) -> np.ndarray:
+    """Dense id -> value array for array-based scoring (ids beyond it are unmapped)."""
+    vocabulary = VOCABULARY if vocabulary is None else vocabulary
+    table = np.full(len(vocabulary), default, dtype=np.int32)
+    for token_id, value in mapping.items():
+        table[token_id] = value
+    return table
+
+
+# ===== TEST =====
+if __name__ == "__main__":
+    for text in ["Amazing! Simply AMAZING.", "A jaw-dropping, terrifying ride; I don't regret it"]:
+        print(f"{text!r}")
+        print(f"  tokens:  {tokenize(text)}")
+        print(f"  stemmed: {tokenize(text, stem=True)}")
+
+    vocabulary = Vocabulary(["amazing", "terrifying"])
+    print(f"  ids:     {vocabulary.encode('Amazing and terrifying, amazing!')}")
+    print(f"[OK] stem cache: {stem_token.cache_info()}")
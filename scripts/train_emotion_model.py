@@ -0,0 +1,180 @@
+"""
+EMOTION MODEL TRAINING
+
+Trains the Naïve Bayes emotion classifier on a labeled review corpus.
+
+- Streams the corpus in fixed-size chunks (never holds it in memory)
+- Hashes tokens into a fixed number of feature columns
+- Accumulates per-emotion feature counts incrementally
+- Writes a versioned model (JSON header + NumPy log-prob matrix) that
+  emotion_classifier memory-maps at load
+
+Corpus formats:
+    JSONL: one {"text": "...", "label": "joy"} object per line
+    CSV/TSV: header row with "text" and "label" columns
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import numpy as np
+
+from emotion_classifier import (
+    EMOTIONS, MODEL_FORMAT, MODEL_FORMAT_VERSION, DEFAULT_MODEL_PATH,
+    tokenize, hash_tokens
+)
+
+
+# ---------- DEFAULTS ----------
+DEFAULT_FEATURES = 2 ** 18
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_ALPHA = 1.0
+
+
+# ===== CORPUS READING =====
+def iter_corpus(path, text_field="text", label_field="label"):
+    """Yield (text, label) pairs from a JSONL, CSV or TSV corpus."""
+    ext = os.path.splitext(path)[1].lower()
+
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if ext in (".jsonl", ".ndjson"):
+            for line in f:
+                line = line.strip()
+                if line:
+                    row = json.loads(line)
+                    yield row[text_field], row[label_field]
+        else:
+            csv.field_size_limit(sys.maxsize)
+            delimiter = "\t" if ext == ".tsv" else ","
+            for row in csv.DictReader(f, delimiter=delimiter):
+                yield row[text_field], row[label_field]
+
+
+def iter_chunks(pairs, chunk_size):
+    """Group an iterable of pairs into lists of at most chunk_size."""
+    chunk = []
+    for pair in pairs:
+        chunk.append(pair)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ===== TRAINING =====
+class EmotionModelTrainer:
+    """Incremental feature-count accumulator for the hashed Naïve Bayes model."""
+
+    def __init__(self, n_features: int = DEFAULT_FEATURES, alpha: float = DEFAULT_ALPHA):
+        self.n_features = n_features
+        self.alpha = alpha
+        self.emotion_index = {e: i for i, e in enumerate(EMOTIONS)}
+        self.feature_counts = np.zeros((len(EMOTIONS), n_features), dtype=np.float64)
+        self.doc_counts = np.zeros(len(EMOTIONS), dtype=np.float64)
+        self.skipped = 0
+
+    def partial_fit(self, chunk):
+        """Add one chunk of (text, label) pairs to the running counts."""
+        rows, columns = [], []
+
+        for text, label in chunk:
+            emotion = self.emotion_index.get(str(label).strip().lower())
+            if emotion is None:
+                self.skipped += 1
+                continue
+
+            buckets = hash_tokens(tokenize(text), self.n_features)
+            rows.append(np.full(len(buckets), emotion, dtype=np.int64))
+            columns.append(buckets)
+            self.doc_counts[emotion] += 1
+
+        if rows:
+            flat = np.concatenate(rows) * self.n_features + np.concatenate(columns)
+            counts = np.bincount(flat, minlength=self.feature_counts.size)
+            self.feature_counts += counts.reshape(self.feature_counts.shape)
+
+    @property
+    def documents(self) -> int:
+        return int(self.doc_counts.sum())
+
+    def log_priors(self):
+        smoothed = self.doc_counts + 1.0
+        return np.log(smoothed / smoothed.sum())
+
+    def log_probs(self):
+        smoothed = self.feature_counts + self.alpha
+        return np.log(smoothed / smoothed.sum(axis=1, keepdims=True)).astype(np.float32)
+
+    def save(self, model_path: str = DEFAULT_MODEL_PATH) -> dict:
+        """Write the header and log-prob matrix; return the header."""
+        log_priors = self.log_priors()
+        log_probs = self.log_probs()
+
+        digest = hashlib.sha1()
+        digest.update(json.dumps([EMOTIONS, self.n_features, self.alpha]).encode("utf-8"))
+        digest.update(log_priors.tobytes())
+        digest.update(log_probs.tobytes())
+
+        stem = os.path.splitext(os.path.abspath(model_path))[0]
+        matrix_path = stem + ".npy"
+        np.save(matrix_path, log_probs)
+
+        header = {
+            "format": MODEL_FORMAT,
+            "formatVersion": MODEL_FORMAT_VERSION,
+            "modelVersion": digest.hexdigest()[:16],
+            "emotions": EMOTIONS,
+            "logPriors": log_priors.tolist(),
+            "nFeatures": self.n_features,
+            "hashing": "crc32",
+            "alpha": self.alpha,
+            "documents": self.documents,
+            "documentsPerEmotion": dict(zip(EMOTIONS, self.doc_counts.astype(int).tolist())),
+            "matrix": os.path.basename(matrix_path)
+        }
+
+        with open(model_path, "w", encoding="utf-8") as f:
+            json.dump(header, f, indent=2)
+
+        return header
+
+
+def train(
+    corpus_path: str,
+    model_path: str = DEFAULT_MODEL_PATH,
+    n_features: int = DEFAULT_FEATURES,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    alpha: float = DEFAULT_ALPHA
+) -> dict:
+    """Stream corpus_path in chunks, then write the model to model_path."""
+    trainer = EmotionModelTrainer(n_features=n_features, alpha=alpha)
+
+    for i, chunk in enumerate(iter_chunks(iter_corpus(corpus_path), chunk_size), 1):
+        trainer.partial_fit(chunk)
+        print(f"   ➤ Chunk {i}: {trainer.documents} documents")
+
+    if trainer.documents == 0:
+        raise ValueError(f"❌ No labeled documents with known emotions in {corpus_path}")
+
+    header = trainer.save(model_path)
+
+    print(f"\n✅ Trained on {trainer.documents} documents ({trainer.skipped} skipped)")
+    print(f"📄 Model {header['modelVersion']} written to: {model_path}")
+    return header
+
+
+# ---------- ENTRY POINT ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the emotion classifier model.")
+    parser.add_argument("corpus", help="Labeled corpus (.jsonl, .csv or .tsv)")
+    parser.add_argument("--output", default=DEFAULT_MODEL_PATH, help="Model header path (.json)")
+    parser.add_argument("--features", type=int, default=DEFAULT_FEATURES, help="Hashed feature columns")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Documents per chunk")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help="Laplace smoothing")
+    args = parser.parse_args()
+
+    train(args.corpus, args.output, args.features, args.chunk_size, args.alpha)